@@ -7,34 +7,133 @@ from flask_cors import CORS
 
 from .config import Config
 from .models import db # Import db instance from models.py
+from .game_engine import GameRegistry
+from .sessions import SessionRegistry
+from .state_store import StateStore, SharedDict
+from .lobby import LobbyBroadcaster
+from .matchmaking import Matchmaker
+from .leaderboard import Leaderboard
+from .presence import PresenceService
+from .bot import OpponentBot
+from .instrumentation import Metrics
+from .logs import configure_logging
+from .database import engine_options, configure_engine
+from .token_cache import TokenCache
+from .spectators import SnapshotCache, PacketJSON
+from .timers import Scheduler
+from .reconnect import ReconnectGrace
+from .maintenance import Maintenance
+from .public_rooms import PublicRoomIndex
 
 # Initialize extensions without app context first
 # db = SQLAlchemy() # Already done in models.py
 migrate = Migrate()
-socketio = SocketIO(cors_allowed_origins="*") # Allow all for dev, restrict in prod
+# PacketJSON lets pre-serialized spectator snapshots go out without re-encoding
+socketio = SocketIO(cors_allowed_origins="*", json=PacketJSON) # Allow all for dev, restrict in prod
 jwt = JWTManager()
 cors = CORS()
+# Shared state backend (in-process or Redis), chosen from STATE_STORE_URL
+state_store = StateStore()
+# Timer wheel for deadlines, expired in batches on a background task
+scheduler = Scheduler()
+# Active games, held in the state store and flushed to the DB in the background
+live_games = GameRegistry(state_store, scheduler)
 
-# In-memory store for online users and users ready for public games
-# {user_id: sid}
-online_users_sids = {} 
+# Store for online users and users ready for public games
+# user_id <-> socket sids, see SessionRegistry
+sessions = SessionRegistry(state_store)
 # {user_id: username}
-ready_to_play_users = {} 
+ready_to_play_users = SharedDict(state_store, 'lobby:ready', key_type=int)
+# Changes to ready_to_play_users go through the lobby so they are broadcast as deltas
+lobby = LobbyBroadcaster(ready_to_play_users, state_store)
+# Automatic pairing for /api/play/queue
+matchmaker = Matchmaker(state_store)
+# Users ranked by wins, served from the state store
+leaderboard = Leaderboard(state_store)
+# Cached friend lists of online users, for presence fan-out
+presence = PresenceService(state_store, sessions)
+# Computer opponent for games created with vs_bot
+bot = OpponentBot()
+# Handler latency and query histograms, served on /metrics
+metrics = Metrics()
+# Verified socket tokens -> principals
+token_cache = TokenCache()
+# Serialized game snapshots for late-joining spectators
+spectator_snapshots = SnapshotCache(live_games)
+# Grace period before a disconnected player's games are forfeited
+reconnects = ReconnectGrace(state_store, scheduler)
+# Expires stale pending rooms and archives finished games
+maintenance = Maintenance()
+# Public pending rooms for /api/rooms/public, with deltas for subscribed sockets
+public_rooms = PublicRoomIndex(state_store)
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    configure_logging(app)
+
+    # Pool and driver settings (explicit SQLALCHEMY_ENGINE_OPTIONS win)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(
+        engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI']),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
 
     # Initialize extensions with app
     db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        metrics.watch_pool('sync', db.engine)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    state_store.init_app(app)
+    scheduler.init_app(app)
+    live_games.init_app(app)
+    if app.config.get('TURN_SECONDS') or app.config.get('GAME_CLOCK_SECONDS'):
+        # Clocks of games nobody has loaded run from the first request, not from first use
+        app.before_request(live_games.start)
+    lobby.init_app(app)
+    matchmaker.init_app(app)
+    bot.init_app(app)
+    token_cache.init_app(app)
+    spectator_snapshots.init_app(app)
+    reconnects.init_app(app)
+    maintenance.init_app(app)
+    public_rooms.init_app(app)
+    metrics.init_app(app)
+    metrics.collect('ttt_connected_sockets', 'Authenticated sockets.',
+                    lambda: state_store.hlen(SessionRegistry.USERS))
+    metrics.collect('ttt_live_games', 'Games held in the live game registry.', live_games.count)
+    metrics.collect('ttt_lobby_messages_total', 'Lobby broadcasts sent.',
+                    lambda: {(kind,): lobby.stats[kind + 's'] for kind in ('delta', 'snapshot')},
+                    kind='counter', label_names=('kind',))
+    metrics.collect('ttt_lobby_bytes_total', 'Bytes of lobby broadcasts sent.',
+                    lambda: {(kind,): lobby.stats[kind + '_bytes'] for kind in ('delta', 'snapshot')},
+                    kind='counter', label_names=('kind',))
+    metrics.collect('ttt_token_cache_lookups_total', 'Socket token cache lookups.',
+                    lambda: {('hit',): token_cache.stats['hits'], ('miss',): token_cache.stats['misses']},
+                    kind='counter', label_names=('result',))
+    metrics.collect('ttt_spectator_snapshots_total', 'Spectator snapshots served from cache or serialized.',
+                    lambda: {('hit',): spectator_snapshots.stats['hits'],
+                             ('build',): spectator_snapshots.stats['builds']},
+                    kind='counter', label_names=('result',))
+    metrics.collect('ttt_timers_pending', 'Timers waiting in the timer wheel.', scheduler.pending)
+    metrics.collect('ttt_reconnect_held', 'Disconnected players within their reconnect grace period.',
+                    lambda: state_store.hlen(ReconnectGrace.HELD))
+    metrics.collect('ttt_maintenance_rows_total', 'Game rows handled by the maintenance job.',
+                    lambda: {('expired',): maintenance.stats['expired'],
+                             ('archived',): maintenance.stats['archived']},
+                    kind='counter', label_names=('action',))
+    metrics.collect('ttt_maintenance_last_pass_seconds', 'Duration of the last maintenance pass.',
+                    lambda: maintenance.stats['last_pass_seconds'])
+    metrics.collect('ttt_public_rooms_messages_total', 'Public room pages, snapshots and deltas served.',
+                    lambda: {(kind,): public_rooms.stats[kind + 's'] for kind in ('page', 'snapshot', 'delta')},
+                    kind='counter', label_names=('kind',))
     
     # Important: SocketIO must be initialized AFTER app.config is set
     # and if using message queue, after that config is set.
-    # socketio.init_app(app, message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'))
-    socketio.init_app(app) # Simpler init if not using external message queue
+    # With a message queue (e.g. Redis), emits reach sockets held by other workers.
+    socketio.init_app(app, message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'),
+                      async_mode=app.config.get('SOCKETIO_ASYNC_MODE'))
     
     cors.init_app(app, resources={r"/*": {"origins": "*"}}) # Allow all origins for dev
 
@@ -48,5 +147,12 @@ def create_app(config_class=Config):
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(room_bp, url_prefix='/api')
     app.register_blueprint(friend_bp, url_prefix='/api')
+
+    from .export import export_games_command
+    from .simulation import simulate_command
+    from .maintenance import maintain_command
+    app.cli.add_command(export_games_command)
+    app.cli.add_command(simulate_command)
+    app.cli.add_command(maintain_command)
     
     return app
\ No newline at end of file
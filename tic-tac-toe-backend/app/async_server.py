@@ -0,0 +1,407 @@
+"""
+ASGI mode (see asgi.py): the Socket.IO events of game_events.py served by
+python-socketio's AsyncServer, with every DB read and write awaited on
+SQLAlchemy's asyncio engine, so a process is not limited by how many
+handlers can block on the DB at once. The synchronous state store and game
+registry calls are run on threads (GameNamespace._call).
+
+The rest is shared with the WSGI mode:
+  - live games, sessions, the lobby, presence and the leaderboard are the
+    same state store objects, so both modes can run against one Redis;
+  - the REST blueprints and /metrics are the Flask app, run on a pool of
+    ASGI_HTTP_THREADS threads by a2wsgi;
+  - the write-behind flush, lobby deltas and matchmaking keep running as
+    Flask-SocketIO background tasks (threads, see AsgiConfig).
+Emits made by that synchronous code go through Flask-SocketIO. Without a
+message queue they are handed to the AsyncServer by ForwardingManager;
+with SOCKETIO_MESSAGE_QUEUE set, the AsyncServer listens on the same queue.
+"""
+import asyncio
+
+import socketio
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from . import socketio as flask_socketio, sessions, lobby, live_games, leaderboard, presence, bot, metrics, \
+    token_cache, spectator_snapshots, reconnects, public_rooms
+from .models import db, Game, User, accepted_friends_select
+from .database import engine_options, configure_engine
+from .game_engine import MoveError
+from .game_events import active_game_sids
+from .sessions import user_room, spectator_room, game_audience
+from .spectators import PacketJSON
+from .token_cache import Principal
+
+# Sync driver -> asyncio driver for the default ASYNC_DATABASE_URL
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_database_url(url):
+    """The app's database URL with an asyncio driver."""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+class ForwardingManager(socketio.Manager):
+    """
+    Client manager for Flask-SocketIO's server in ASGI mode. That server has
+    no clients of its own, so every emit is scheduled on the AsyncServer's
+    event loop instead (safe to call from any thread).
+    """
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+        self.loop = None  # Set on startup
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None, **kwargs):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(
+            self.target.emit(event, data, to=room, namespace=namespace, skip_sid=skip_sid),
+            self.loop)
+
+
+async def fetch_usernames(session, user_ids):
+    """Async load_usernames(): {user_id: username} with a single IN query."""
+    user_ids = {uid for uid in user_ids if uid}
+    if not user_ids:
+        return {}
+    rows = await session.execute(select(User.id, User.username).where(User.id.in_(user_ids)))
+    return dict(rows.all())
+
+
+class GameNamespace(socketio.AsyncNamespace):
+    """The events of game_events.py, with the same payloads."""
+
+    def __init__(self, app, session_factory):
+        super().__init__('/')
+        self.app = app
+        self.db = session_factory
+
+    async def trigger_event(self, event, *args):
+        if not hasattr(self, 'on_' + (event or '')):
+            return None  # Unknown events would add a label per name to the metrics
+        with self.app.app_context(), metrics.track('event', event):
+            return await super().trigger_event(event, *args)
+
+    def _warm_up(self):
+        # Synchronous first-use work (journal recovery, leaderboard, public
+        # room index and bot table loading), done once on a thread before
+        # sockets are served
+        with self.app.app_context():
+            live_games._ensure_started()
+            leaderboard._ensure_loaded()
+            public_rooms._ensure_loaded()
+            bot._ensure_loaded()
+
+    async def start(self):
+        await asyncio.to_thread(self._warm_up)
+
+    # --- Helpers ---
+
+    async def _call(self, fn, *args):
+        """
+        Runs fn(*args) on a thread in its own app context. For the synchronous
+        state store and game registry calls (Redis round trips, room locks,
+        journal fsyncs, write-behind flushes) so they never block the loop.
+        """
+        def run():
+            with self.app.app_context():
+                return fn(*args)
+        return await asyncio.to_thread(run)
+
+    async def _remember_friends(self, session, user_id, username):
+        """Fills the presence cache so presence calls below never query synchronously."""
+        if await self._call(presence.cached_friends, user_id) is None:
+            rows = await session.execute(accepted_friends_select(user_id))
+            await self._call(presence.remember, user_id, username, dict(rows.all()))
+
+    async def _track(self, session, game):
+        """Async GameRegistry.track(): the live game for an active row, or None."""
+        live = await self._call(live_games.get_cached, game.room_id)
+        if live or game.status != 'active':
+            return live
+        return await self._call(live_games.track, game, await fetch_usernames(session, game.user_ids()))
+
+    async def _resolve(self, session, token):
+        """Async TokenCache.resolve(): the principal for a token, or None for unknown users."""
+        principal = token_cache.get(token)
+        if principal:
+            return principal
+        decoded = decode_token(token)
+        user = await session.get(User, int(decoded['sub']))
+        if not user:
+            return None
+        principal = Principal(user.id, user.username)
+        token_cache.put(token, principal, decoded.get('exp'))
+        return principal
+
+    async def _user_id(self, sid):
+        principal = (await self.get_session(sid)).get('principal')
+        return principal.user_id if principal else None
+
+    async def _authenticate(self, sid, token, error_event=None):
+        async with self.db() as session:
+            try:
+                principal = await self._resolve(session, token)
+            except Exception as e:
+                if error_event:
+                    await self.emit(error_event, {'message': f'Token validation failed: {e}'}, to=sid)
+                return
+            if not principal:
+                if error_event:
+                    await self.emit(error_event, {'message': 'User not found from token'}, to=sid)
+                return
+            user_id = principal.user_id
+            await self.save_session(sid, {'principal': principal})
+            came_online = await self._call(sessions.add, user_id, sid)
+            await self.enter_room(sid, user_room(user_id))
+            await self._remember_friends(session, user_id, principal.username)
+        if came_online:
+            await self._call(presence.announce, user_id, principal.username, True)
+            await self._resume_games(sid, user_id)
+        await self.emit('friend_list_update', await self._call(presence.friend_list, user_id), to=sid)
+
+    async def _resume_games(self, sid, user_id):
+        for room_id in await self._call(reconnects.resume, user_id) or ():
+            live = await self._call(live_games.get_cached, room_id)
+            if not live or live.status != 'active':
+                continue
+            await self.enter_room(sid, room_id)
+            await self._call(active_game_sids.set, room_id,
+                             'player_x_sid' if live.player_x_id == user_id else 'player_o_sid', sid)
+            await self.emit('game_resumed', {'game': live.to_dict(user_id)}, to=sid)
+            await self.emit('opponent_reconnected', {'room_id': room_id, 'user_id': user_id},
+                            room=game_audience(room_id), skip_sid=sid)
+
+    async def _announce_move(self, game, index, user_id, winner_symbol):
+        audience = game_audience(game.room_id)
+        await self.emit('move_applied', game.move_delta(index, game.symbol_for(user_id)), room=audience)
+        if winner_symbol:
+            await self._call(leaderboard.add_win, game.winner_id)
+            await self.emit('game_over', {'game': game.to_dict(), 'winner': winner_symbol}, room=audience)
+        elif game.status == 'draw':
+            await self.emit('game_over', {'game': game.to_dict(), 'draw': True}, room=audience)
+
+        if game.status not in ['active']:
+            await self._call(active_game_sids.discard, game.room_id)
+
+    # --- Events ---
+
+    async def on_connect(self, sid, environ, auth=None):
+        await self.enter_room(sid, 'lobby')
+        await self.emit('available_players_snapshot', await self._call(lobby.snapshot), to=sid)
+        token = auth.get('token') if isinstance(auth, dict) else None
+        if token:
+            await self._authenticate(sid, token)
+
+    async def on_request_lobby_snapshot(self, sid, data=None):
+        await self.emit('available_players_snapshot', await self._call(lobby.snapshot), to=sid)
+
+    async def on_authenticate_socket(self, sid, data):
+        token = (data or {}).get('token')
+        if not token:
+            await self.emit('auth_error', {'message': 'Token not provided for authentication'}, to=sid)
+            return
+        await self._authenticate(sid, token, error_event='auth_error')
+
+    async def on_disconnect(self, sid, reason=None):
+        user_id, went_offline = await self._call(sessions.remove, sid)
+        rooms = self.rooms(sid)
+        game_rooms = await self._call(
+            lambda: [room_id for room_id in rooms if active_game_sids.clear_sid(room_id, sid)])
+        if went_offline:
+            await self._call(lobby.remove, user_id)
+            username = await self._call(presence.username, user_id)
+            if not username:
+                async with self.db() as session:
+                    user = await session.get(User, user_id)
+                    username = user.username if user else None
+                    if username:
+                        await self._remember_friends(session, user_id, username)
+            if username:
+                await self._call(presence.announce, user_id, username, False)
+
+            await self._call(reconnects.hold, user_id, game_rooms)
+            for room_id in game_rooms:
+                await self.emit('opponent_disconnected',
+                                {'room_id': room_id, 'user_id': user_id, 'grace_seconds': reconnects.grace},
+                                room=game_audience(room_id))
+
+    async def on_join_game_room(self, sid, data):
+        user_id = await self._user_id(sid)
+        if not user_id:
+            await self.emit('error', {'message': 'User not authenticated or not found for this session.'}, to=sid)
+            return
+        room_id = (data or {}).get('room_id')
+        if not room_id:
+            await self.emit('error', {'message': 'Room ID is required.'}, to=sid)
+            return
+
+        async with self.db() as session:
+            game = await session.scalar(select(Game).where(Game.room_id == room_id))
+            if not game:
+                await self.emit('error', {'message': 'Game room not found.'}, to=sid)
+                return
+            if game.player_x_id != user_id and game.player_o_id != user_id:
+                if game.is_public and game.status == 'pending' and game.player_o_id is None:
+                    game.player_o_id = user_id
+                    game.status = 'active'
+                    await session.commit()
+                    await self._call(public_rooms.remove, game.room_id)
+                else:
+                    await self.emit('error', {'message': 'You are not a player in this game.'}, to=sid)
+                    return
+            live = await self._track(session, game)
+            usernames = None if live else await fetch_usernames(session, game.user_ids())
+        game = live or game
+
+        await self.enter_room(sid, game.room_id)
+        if game.player_x_id == user_id:
+            await self._call(active_game_sids.set, game.room_id, 'player_x_sid', sid)
+        elif game.player_o_id == user_id:
+            await self._call(active_game_sids.set, game.room_id, 'player_o_sid', sid)
+        room_sids = await self._call(active_game_sids.get, game.room_id)
+
+        await self.emit('game_joined_successfully', {'game': game.to_dict(user_id, usernames)}, to=sid)
+        if game.status == 'active' and room_sids.get('player_x_sid') and room_sids.get('player_o_sid'):
+            await self.emit('game_update', game.to_dict(usernames=usernames), room=game_audience(game.room_id))
+        elif game.status == 'pending' and game.player_x_id == user_id:
+            await self.emit('game_update', game.to_dict(user_id, usernames), to=sid)
+
+    async def on_make_move(self, sid, data):
+        user_id = await self._user_id(sid)
+        if not user_id:
+            await self.emit('error', {'message': 'User not authenticated or not found for this session.'}, to=sid)
+            return
+        room_id = (data or {}).get('room_id')
+        index = (data or {}).get('index')
+        if room_id is None or index is None:
+            await self.emit('error', {'message': 'Room ID and move index are required.'}, to=sid)
+            return
+
+        row = None
+        if not await self._call(live_games.get_cached, room_id):
+            async with self.db() as session:
+                row = await session.scalar(select(Game).where(Game.room_id == room_id))
+                if row:
+                    await self._track(session, row)
+        try:
+            game, winner_symbol = await self._call(live_games.apply_move, room_id, user_id, index)
+        except MoveError as e:
+            message = str(e)
+            if message == 'Game not found.' and row:
+                message = 'Game is not active.'
+            await self.emit('error', {'message': message}, to=sid)
+            return
+
+        await self._announce_move(game, index, user_id, winner_symbol)
+        if game.is_bot_turn():
+            bot_move = bot.choose_move(game.board, 'O', game.bot_level)
+            game, winner_symbol = await self._call(live_games.apply_move, game.room_id, game.player_o_id, bot_move)
+            await self._announce_move(game, bot_move, game.player_o_id, winner_symbol)
+
+    async def on_request_game_snapshot(self, sid, data):
+        user_id = await self._user_id(sid)
+        if not user_id:
+            await self.emit('error', {'message': 'User not authenticated or not found for this session.'}, to=sid)
+            return
+        room_id = (data or {}).get('room_id')
+        game = await self._call(live_games.get_cached, room_id)
+        usernames = None
+        if not game:
+            async with self.db() as session:
+                game = await session.scalar(select(Game).where(Game.room_id == room_id))
+                if game:
+                    usernames = await fetch_usernames(session, game.user_ids())
+        if not game:
+            await self.emit('error', {'message': 'Game not found.'}, to=sid)
+            return
+        await self.emit('game_snapshot', {'game': game.to_dict(user_id, usernames)}, to=sid)
+
+    async def on_leave_game_room(self, sid, data):
+        user_id = await self._user_id(sid)
+        room_id = (data or {}).get('room_id')
+        if not user_id or not room_id:
+            return
+        await self.leave_room(sid, room_id)
+        await self._call(active_game_sids.clear_sid, room_id, sid)
+
+    async def on_spectate_game(self, sid, data):
+        room_id = (data or {}).get('room_id')
+        if not room_id:
+            await self.emit('error', {'message': 'Room ID is required.'}, to=sid)
+            return
+        await self.enter_room(sid, spectator_room(room_id))
+        snapshot = await self._call(spectator_snapshots.cached, room_id)
+        if snapshot is None:
+            async with self.db() as session:
+                game = await session.scalar(select(Game).where(Game.room_id == room_id))
+                if game:
+                    live = await self._track(session, game)
+                    usernames = None if live else await fetch_usernames(session, game.user_ids())
+                    snapshot = spectator_snapshots.put(live or game, usernames)
+        if snapshot is None:
+            await self.leave_room(sid, spectator_room(room_id))
+            await self.emit('error', {'message': 'Game not found.'}, to=sid)
+            return
+        await self.emit('spectate_snapshot', snapshot, to=sid)
+
+    async def on_stop_spectating(self, sid, data):
+        room_id = (data or {}).get('room_id')
+        if room_id:
+            await self.leave_room(sid, spectator_room(room_id))
+
+    async def on_subscribe_public_rooms(self, sid, data=None):
+        await self.enter_room(sid, public_rooms.ROOM)
+        snapshot = await self._call(public_rooms.snapshot, self.app.config.get('PUBLIC_ROOMS_PAGE_SIZE', 50))
+        await self.emit('public_rooms_snapshot', snapshot, to=sid)
+
+    async def on_unsubscribe_public_rooms(self, sid, data=None):
+        await self.leave_room(sid, public_rooms.ROOM)
+
+
+def create_asgi_app(app):
+    """Wraps a Flask app created with AsgiConfig into the ASGI application."""
+    queue = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    manager = socketio.AsyncRedisManager(queue, channel='flask-socketio') if queue else None
+    sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', client_manager=manager,
+                               json=PacketJSON)
+
+    url = app.config.get('ASYNC_DATABASE_URL')
+    if not url:
+        with app.app_context():
+            url = async_database_url(db.engine.url)
+    engine = create_async_engine(url, **engine_options(app.config, url, use_async=True))
+    configure_engine(engine, app.config)
+    metrics.watch_pool('async', engine)
+    namespace = GameNamespace(app, async_sessionmaker(engine, expire_on_commit=False))
+    sio.register_namespace(namespace)
+
+    forwarding = None
+    if not queue:
+        forwarding = ForwardingManager(sio)
+        forwarding.set_server(flask_socketio.server)
+        flask_socketio.server.manager = forwarding
+
+    async def on_startup():
+        if forwarding:
+            forwarding.loop = asyncio.get_running_loop()
+        await namespace.start()
+
+    async def on_shutdown():
+        await engine.dispose()
+
+    rest = WSGIMiddleware(app, workers=app.config.get('ASGI_HTTP_THREADS', 10))
+    return socketio.ASGIApp(sio, other_asgi_app=rest,
+                            on_startup=on_startup, on_shutdown=on_shutdown)
+
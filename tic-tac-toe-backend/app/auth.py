@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from werkzeug.security import check_password_hash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from .models import db, User
+from . import leaderboard, bot
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -15,13 +16,14 @@ def register():
     if not username or not password:
         return jsonify({"msg": "Username and password required"}), 400
 
-    if User.query.filter_by(username=username).first():
+    if User.query.filter_by(username=username).first() or bot.is_reserved(username):
         return jsonify({"msg": "Username already exists"}), 409
 
     new_user = User(username=username)
     new_user.set_password(password)
     db.session.add(new_user)
     db.session.commit()
+    leaderboard.add_user(new_user.id, new_user.username)
 
     return jsonify({
         "msg": "User created successfully",
@@ -62,10 +64,17 @@ def get_me():
 
 @auth_bp.route('/scoreboard', methods=['GET'])
 def scoreboard():
-    # Get top 10 players by wins, or all if fewer than 10
-    top_players = User.query.order_by(User.wins.desc()).limit(10).all()
-    scoreboard_data = [{
-        "username": user.username,
-        "wins": user.wins
-    } for user in top_players]
-    return jsonify(scoreboard_data), 200
+    # Top players by wins, 10 per page by default: ?offset=0&limit=10
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    return jsonify(leaderboard.page(offset, limit)), 200
+
+
+@auth_bp.route('/scoreboard/me', methods=['GET'])
+@jwt_required()
+def my_rank():
+    current_user_id = get_jwt_identity()
+    rank, wins = leaderboard.rank(current_user_id)
+    if rank is None:
+        return jsonify({"msg": "User not found"}), 404
+    return jsonify({"rank": rank, "wins": wins}), 200
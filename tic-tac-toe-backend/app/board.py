@@ -0,0 +1,146 @@
+"""
+Bitboard representation of an N x N board with K in a row to win.
+
+Each player is a mask (a Python int, so any size fits) where bit i is set if
+the player holds cell i, cells numbered row by row from 0, same as the
+`Game.board` string. The classic game is N = K = 3.
+"""
+import math
+from functools import lru_cache
+
+WIN_LINES = (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),  # Rows
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),  # Columns
+    (0, 4, 8), (2, 4, 6)              # Diagonals
+)
+WIN_MASKS = tuple((1 << a) | (1 << b) | (1 << c) for a, b, c in WIN_LINES)
+FULL_MASK = 0x1FF
+
+# WIN_TABLE[mask] is 1 if the mask contains a complete line, for all 512 masks
+WIN_TABLE = bytes(
+    any(mask & line == line for line in WIN_MASKS) for mask in range(512))
+
+DRAW = 'draw'
+
+DEFAULT_SIZE = 3
+MAX_SIZE = 20  # `Game.board` holds up to 400 cells
+# (row step, column step) of the four line directions through a cell
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def default_win_length(size):
+    """K used when a game does not set one: the full row up to 5x5, then 5 in a row."""
+    return min(size, 5)
+
+
+# str.translate tables turning a reversed board string into a binary literal
+_X_BITS = str.maketrans({'X': '1', 'O': '0', ' ': '0'})
+_O_BITS = str.maketrans({'X': '0', 'O': '1', ' ': '0'})
+
+
+class Board:
+    """An N x N board stored as one bitmask per player."""
+
+    __slots__ = ('x', 'o', 'size', 'win_length')
+
+    def __init__(self, x=0, o=0, size=DEFAULT_SIZE, win_length=None):
+        self.x = x
+        self.o = o
+        self.size = size
+        self.win_length = win_length or default_win_length(size)
+
+    @classmethod
+    def from_string(cls, board_str, win_length=None):
+        """Builds a board from the N*N-char `Game.board` format."""
+        reversed_str = board_str[::-1]  # Cell 0 becomes the lowest bit
+        return cls(int(reversed_str.translate(_X_BITS), 2),
+                   int(reversed_str.translate(_O_BITS), 2),
+                   math.isqrt(len(board_str)), win_length)
+
+    @property
+    def cells(self):
+        return self.size * self.size
+
+    @property
+    def full_mask(self):
+        return (1 << self.cells) - 1
+
+    def to_string(self):
+        """Returns the `Game.board` format: size*size chars, row by row."""
+        return "".join(self.to_list())
+
+    def to_list(self):
+        x, o = self.x, self.o
+        return ['X' if x >> i & 1 else 'O' if o >> i & 1 else ' ' for i in range(self.cells)]
+
+    def is_empty(self, index):
+        return not (self.x | self.o) >> index & 1
+
+    def ply(self):
+        """Number of moves played so far."""
+        return bin(self.x | self.o).count('1')
+
+    def play(self, index, symbol):
+        """Places `symbol` ('X' or 'O') on an empty cell."""
+        if symbol == 'X':
+            self.x |= 1 << index
+        else:
+            self.o |= 1 << index
+
+    def outcome(self):
+        """
+        Returns 'X' or 'O' for a win, DRAW for a full board, or None if the
+        game goes on. Looks at the whole board; after a move, outcome_after()
+        only needs the lines through the cell just played.
+        """
+        if self.size == 3 and self.win_length == 3:
+            if WIN_TABLE[self.x]:
+                return 'X'
+            if WIN_TABLE[self.o]:
+                return 'O'
+            if self.x | self.o == FULL_MASK:
+                return DRAW
+            return None
+        for symbol, mask in (('X', self.x), ('O', self.o)):
+            if any(mask >> i & 1 and self._wins_through(mask, i) for i in range(self.cells)):
+                return symbol
+        return DRAW if self.x | self.o == self.full_mask else None
+
+    def outcome_after(self, index):
+        """outcome() for a board whose last move was at `index`, in O(K) time."""
+        if self.size == 3 and self.win_length == 3:
+            return self.outcome()  # Already a table lookup
+        symbol, mask = ('X', self.x) if self.x >> index & 1 else ('O', self.o)
+        if self._wins_through(mask, index):
+            return symbol
+        return DRAW if self.x | self.o == self.full_mask else None
+
+    def _wins_through(self, mask, index):
+        """True if `mask` has win_length in a row on a line through `index`."""
+        size, needed = self.size, self.win_length - 1
+        row, col = divmod(index, size)
+        for dr, dc in DIRECTIONS:
+            run = 0
+            for sign in (1, -1):
+                r, c = row + sign * dr, col + sign * dc
+                while run < needed and 0 <= r < size and 0 <= c < size and \
+                        mask >> (r * size + c) & 1:
+                    run += 1
+                    r += sign * dr
+                    c += sign * dc
+            if run >= needed:
+                return True
+        return False
+
+    def __eq__(self, other):
+        return isinstance(other, Board) and self.x == other.x and self.o == other.o and \
+            self.size == other.size and self.win_length == other.win_length
+
+    def __repr__(self):
+        return f'<Board {self.to_string()!r}>'
+
+
+@lru_cache(maxsize=3 ** 9)
+def outcome_of(board_str):
+    """Board.outcome() for a 3x3 board string, memoised over all 3^9 positions."""
+    return Board.from_string(board_str).outcome()
@@ -0,0 +1,180 @@
+"""
+Computer opponent for "play vs bot" games.
+
+Every position reachable from the empty board (5,478 of them) is solved
+once with minimax and alpha-beta pruning, and the results are kept in a
+packed table with one signed byte per position: the score for the side to
+move, positive for a win, with faster wins and slower losses scoring
+higher. Positions are indexed by their base-3 encoding (cell i contributes
+3**i for X, 2 * 3**i for O), so the table holds 3**9 bytes and a bot move
+costs a lookup per empty cell.
+
+The table is written to BOT_TABLE_PATH the first time it is needed and
+memory-mapped from there afterwards.
+"""
+import mmap
+import os
+import random
+import threading
+
+from sqlalchemy.exc import IntegrityError
+
+from .board import WIN_TABLE, FULL_MASK
+from .models import db, User
+
+TABLE_SIZE = 3 ** 9
+# Score of a position the solver never reached (not a valid game state)
+UNREACHABLE = -128
+
+# TERNARY[mask] is the sum of 3**i over the bits of mask
+TERNARY = tuple(sum(3 ** i for i in range(9) if mask >> i & 1) for mask in range(512))
+
+# Chance of picking a random move instead of a best one
+LEVELS = {'easy': 0.6, 'medium': 0.25, 'hard': 0.0}
+DEFAULT_LEVEL = 'hard'
+
+
+def position_index(x, o):
+    return TERNARY[x] + 2 * TERNARY[o]
+
+
+def move_scores(table, board, symbol):
+    """Returns {cell: score} for every legal move of `symbol`, from its point of view."""
+    taken = board.x | board.o
+    base = position_index(board.x, board.o)
+    digit = 1 if symbol == 'X' else 2
+    return {cell: -table[base + digit * 3 ** cell]
+            for cell in range(9) if not taken >> cell & 1}
+
+
+def solve():
+    """Scores every reachable position. Returns a bytearray of TABLE_SIZE signed bytes."""
+    table = bytearray((UNREACHABLE & 0xFF,)) * TABLE_SIZE
+    solved = {}
+
+    def search(mover, other, alpha, beta):
+        # mover/other: masks of the side to move and of its opponent.
+        # Fail-soft alpha-beta; only scores inside the window are exact and cached.
+        key = (mover, other)
+        if key in solved:
+            return solved[key]
+        taken = mover | other
+        if WIN_TABLE[other]:
+            best = -(10 - bin(taken).count('1'))  # Lost; the later the better
+        elif taken == FULL_MASK:
+            best = 0
+        else:
+            best = -10
+            for cell in range(9):
+                if taken >> cell & 1:
+                    continue
+                best = max(best, -search(other, mover | 1 << cell, -beta, -max(alpha, best)))
+                if best >= beta:
+                    return best
+        if alpha < best < beta:
+            solved[key] = best
+        return best
+
+    def fill(x, o):
+        # Walk every reachable position and store its exact score
+        index = position_index(x, o)
+        if table[index] != UNREACHABLE & 0xFF:
+            return
+        x_to_move = bin(x).count('1') == bin(o).count('1')
+        mover, other = (x, o) if x_to_move else (o, x)
+        table[index] = search(mover, other, -10, 10) & 0xFF
+        taken = x | o
+        if WIN_TABLE[x] or WIN_TABLE[o] or taken == FULL_MASK:
+            return
+        for cell in range(9):
+            if not taken >> cell & 1:
+                if x_to_move:
+                    fill(x | 1 << cell, o)
+                else:
+                    fill(x, o | 1 << cell)
+
+    fill(0, 0)
+    return table
+
+
+class OpponentBot:
+    """Chooses moves for the bot player from the precomputed table."""
+
+    def __init__(self):
+        self._table = None
+        self._path = None
+        self._username = 'TicTacBot'
+        self._user_id = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._path = app.config.get('BOT_TABLE_PATH') or \
+            os.path.join(app.instance_path, 'bot_table.bin')
+        self._username = app.config.get('BOT_USERNAME', 'TicTacBot')
+
+    def _ensure_loaded(self):
+        if self._table is not None:
+            return
+        with self._lock:
+            if self._table is not None:
+                return
+            if not os.path.exists(self._path):
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                tmp_path = self._path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(solve())
+                os.replace(tmp_path, self._path)  # Other workers never see a partial file
+            with open(self._path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._table = memoryview(mapped).cast('b')
+
+    @property
+    def user_id(self):
+        """Id of the bot's `User` row, created on first use."""
+        if self._user_id is None:
+            bot = User.query.filter_by(is_bot=True).first() or self._create_user()
+            self._user_id, self._username = bot.id, bot.username
+        return self._user_id
+
+    def _create_user(self):
+        # /auth/register reserves BOT_USERNAME, but a player may have taken it
+        # before the bot existed; the bot then gets the first free "<name> N"
+        taken = {name for name, in db.session.query(User.username).filter(
+            User.username.startswith(self._username))}
+        username, n = self._username, 1
+        while username in taken:
+            n += 1
+            username = f'{self._username} {n}'
+        bot = User(username=username, is_bot=True, password_hash='!')  # Cannot log in
+        db.session.add(bot)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Created by another worker meanwhile (or the name was just taken): use theirs, or retry
+            db.session.rollback()
+            return User.query.filter_by(is_bot=True).first() or self._create_user()
+        return bot
+
+    def is_reserved(self, username):
+        """Whether `username` would pass for the bot's."""
+        return username.strip().lower() == self._username.lower()
+
+    @property
+    def username(self):
+        return self._username
+
+    def score(self, board):
+        """Score of a position for the side to move."""
+        self._ensure_loaded()
+        return self._table[position_index(board.x, board.o)]
+
+    def choose_move(self, board, symbol, level=DEFAULT_LEVEL):
+        """Picks a move: a best one, or at lower levels sometimes any legal one."""
+        self._ensure_loaded()
+        scores = move_scores(self._table, board, symbol)
+        if not scores:
+            return None
+        if random.random() < LEVELS.get(level, 0.0):
+            return random.choice(list(scores))
+        best = max(scores.values())
+        return random.choice([cell for cell, score in scores.items() if score == best])
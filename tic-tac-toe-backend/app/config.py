@@ -3,13 +3,110 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _env_bool(name):
+    value = os.environ.get(name)
+    return value.lower() in ('1', 'true', 'yes') if value else None
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'super-secret-jwt'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///site.db' # Fallback to SQLite if DB_URL not set
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool per environment (see app/database.py); pools are not used
+    # for in-memory SQLite. DB_POOL_* override single values of the profile.
+    DB_PROFILE = os.environ.get('DB_PROFILE') or 'development'
+    DB_PROFILES = {
+        'development': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30,
+                        'pool_recycle': 1800, 'pool_pre_ping': True},
+        'production': {'pool_size': 20, 'max_overflow': 20, 'pool_timeout': 5,
+                       'pool_recycle': 1800, 'pool_pre_ping': True},
+        'test': {'pool_size': 2, 'max_overflow': 0, 'pool_timeout': 5,
+                 'pool_recycle': -1, 'pool_pre_ping': False},
+    }
+    DB_POOL_SIZE = _env_int('DB_POOL_SIZE')
+    DB_MAX_OVERFLOW = _env_int('DB_MAX_OVERFLOW')
+    DB_POOL_TIMEOUT = _env_int('DB_POOL_TIMEOUT')
+    DB_POOL_RECYCLE = _env_int('DB_POOL_RECYCLE')
+    DB_POOL_PRE_PING = _env_bool('DB_POOL_PRE_PING')
+    # Pragmas set on every SQLite connection; the busy timeout is in milliseconds
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
     # For Flask-SocketIO with eventlet or gevent
     # For production, you might use a message queue like Redis
     # For development, default is fine, but eventlet is more robust
-    # SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
\ No newline at end of file
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    # Flask-SocketIO async mode (None: eventlet if installed); see AsgiConfig
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE')
+    # Where sessions, the lobby and live games are kept: 'memory://' for a single
+    # worker, or a redis:// URL so several workers share them (see app/state_store.py)
+    STATE_STORE_URL = os.environ.get('STATE_STORE_URL') or 'memory://'
+    # Live games are flushed to the DB in batches every GAME_FLUSH_INTERVAL seconds.
+    # Moves not yet flushed are kept in a journal (default: instance/moves.journal)
+    GAME_FLUSH_INTERVAL = float(os.environ.get('GAME_FLUSH_INTERVAL', 0.5))
+    GAME_JOURNAL_PATH = os.environ.get('GAME_JOURNAL_PATH')
+    # Lobby changes within this many seconds are sent as one available_players_delta
+    LOBBY_BROADCAST_WINDOW = float(os.environ.get('LOBBY_BROADCAST_WINDOW', 0.25))
+    # /api/play/queue pairs players every MATCHMAKING_TICK seconds, within bands of
+    # MATCHMAKING_BAND wins (0 = no banding); after MATCHMAKING_MAX_WAIT seconds anyone goes
+    MATCHMAKING_TICK = float(os.environ.get('MATCHMAKING_TICK', 0.2))
+    MATCHMAKING_BAND = int(os.environ.get('MATCHMAKING_BAND', 0))
+    MATCHMAKING_MAX_WAIT = float(os.environ.get('MATCHMAKING_MAX_WAIT', 10))
+    # Solved positions for the bot opponent, built on first use (default: instance/bot_table.bin)
+    BOT_TABLE_PATH = os.environ.get('BOT_TABLE_PATH')
+    BOT_USERNAME = os.environ.get('BOT_USERNAME') or 'TicTacBot'
+    # Verified socket tokens are cached until their exp claim, or TOKEN_CACHE_TTL
+    # seconds at most, keeping up to TOKEN_CACHE_SIZE of them (see app/token_cache.py)
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 300))
+    # Serialized snapshots of up to SPECTATOR_CACHE_SIZE watched games; snapshots of
+    # games that are neither live nor finished are reloaded after SPECTATOR_SNAPSHOT_TTL
+    # seconds (see app/spectators.py)
+    SPECTATOR_CACHE_SIZE = int(os.environ.get('SPECTATOR_CACHE_SIZE', 1000))
+    SPECTATOR_SNAPSHOT_TTL = float(os.environ.get('SPECTATOR_SNAPSHOT_TTL', 1.0))
+    # Timer wheel resolution in seconds and number of buckets (see app/timers.py)
+    TIMER_TICK = float(os.environ.get('TIMER_TICK', 0.25))
+    TIMER_SLOTS = int(os.environ.get('TIMER_SLOTS', 512))
+    # Seconds a player who lost their connection has to come back before their
+    # active games are forfeited (see app/reconnect.py)
+    RECONNECT_GRACE_SECONDS = float(os.environ.get('RECONNECT_GRACE_SECONDS', 30))
+    # Time control: seconds for a single move, and each player's budget for the
+    # whole game; a player who runs out loses the game. 0 disables either clock
+    # (both are off unless set). Active games nobody has loaded are checked every
+    # TURN_SWEEP_INTERVAL seconds (see GameRegistry.sweep_clocks)
+    TURN_SECONDS = float(os.environ.get('TURN_SECONDS', 0))
+    GAME_CLOCK_SECONDS = float(os.environ.get('GAME_CLOCK_SECONDS', 0))
+    TURN_SWEEP_INTERVAL = float(os.environ.get('TURN_SWEEP_INTERVAL', 5))
+    # Maintenance job (see app/maintenance.py): seconds between passes (0 disables
+    # the background loop), age in seconds after which unjoined pending rooms are
+    # deleted and finished games archived, and rows per transaction
+    MAINTENANCE_INTERVAL = float(os.environ.get('MAINTENANCE_INTERVAL', 300))
+    PENDING_ROOM_TTL = int(os.environ.get('PENDING_ROOM_TTL', 3600))
+    ARCHIVE_AFTER = int(os.environ.get('ARCHIVE_AFTER', 86400))
+    MAINTENANCE_CHUNK = int(os.environ.get('MAINTENANCE_CHUNK', 500))
+    # Rooms per page of /api/rooms/public and of the public_rooms_snapshot event,
+    # unless the request asks for fewer (?limit, at most 100)
+    PUBLIC_ROOMS_PAGE_SIZE = int(os.environ.get('PUBLIC_ROOMS_PAGE_SIZE', 50))
+    # Log level of the `app` loggers, and the fraction of per-connection messages
+    # (connect, join, leave, disconnect) that are written (see app/logs.py)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1))
+
+
+class AsgiConfig(Config):
+    """Settings for asgi.py, where sockets are served by python-socketio's AsyncServer."""
+    # Flask-SocketIO then only runs the background tasks (as threads) and forwards emits
+    SOCKETIO_ASYNC_MODE = 'threading'
+    # Async driver URL for the socket handlers; by default DATABASE_URL with its
+    # driver swapped (sqlite -> aiosqlite, postgresql -> asyncpg)
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+    # Threads running the (synchronous) REST routes
+    ASGI_HTTP_THREADS = int(os.environ.get('ASGI_HTTP_THREADS', 10))
@@ -0,0 +1,114 @@
+"""
+Engine settings shared by the sync engine (Flask-SQLAlchemy) and the async
+engine of asgi.py.
+
+SQLite connections are set up with connect-event pragmas: WAL journaling,
+so readers no longer block the writer; synchronous=NORMAL, which only syncs
+at checkpoints and is safe with WAL; and a busy timeout, so concurrent
+writers wait for the lock instead of failing with "database is locked".
+
+Pool size, overflow, timeout, pre-ping and recycle come from the DB_PROFILE
+entry of DB_PROFILES, each overridable on its own (DB_POOL_SIZE, ...). The
+pools report to `metrics` how long each checkout waited for a free
+connection and, separately, how long opening new connections took.
+"""
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Engine argument -> Config key that overrides the profile value
+POOL_OVERRIDES = {
+    'pool_size': 'DB_POOL_SIZE',
+    'max_overflow': 'DB_MAX_OVERFLOW',
+    'pool_timeout': 'DB_POOL_TIMEOUT',
+    'pool_recycle': 'DB_POOL_RECYCLE',
+    'pool_pre_ping': 'DB_POOL_PRE_PING',
+}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records checkout waits and connect times."""
+
+    label = 'sync'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the queue get is a wait; opening an overflow connection is timed on its own
+        self._pool.get = self._timed_get(self._pool.get)
+
+    def _timed_get(self, get):
+        def timed_get(block=True, timeout=None):
+            from . import metrics
+            started = time.perf_counter()
+            try:
+                return get(block, timeout)
+            finally:
+                metrics.pool_wait.observe(time.perf_counter() - started, self.label)
+        return timed_get
+
+    def _create_connection(self):
+        from . import metrics
+        started = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            metrics.pool_connect.observe(time.perf_counter() - started, self.label)
+
+    def connect(self):
+        from . import metrics
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            metrics.pool_timeouts.inc(self.label)
+            raise
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    label = 'async'
+
+
+def is_memory_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and \
+        (url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory')
+
+
+def pool_options(config):
+    """Pool arguments of the configured profile, with single-value overrides applied."""
+    profile = config.get('DB_PROFILE', 'development')
+    try:
+        options = dict(config['DB_PROFILES'][profile])
+    except KeyError:
+        raise ValueError(f"Unknown DB_PROFILE {profile!r}.")
+    for option, key in POOL_OVERRIDES.items():
+        if config.get(key) is not None:
+            options[option] = config[key]
+    return options
+
+
+def engine_options(config, url, use_async=False):
+    """create_engine() arguments for `url`. In-memory SQLite keeps its static pool."""
+    if is_memory_sqlite(url):
+        return {}
+    return dict(pool_options(config), poolclass=TimedAsyncQueuePool if use_async else TimedQueuePool)
+
+
+def configure_engine(engine, config):
+    """Adds the SQLite pragmas to every new connection of `engine` (sync or async)."""
+    engine = getattr(engine, 'sync_engine', engine)
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = [
+        f"PRAGMA journal_mode={config.get('SQLITE_JOURNAL_MODE', 'WAL')}",
+        f"PRAGMA synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT', 5000))}",
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -0,0 +1,136 @@
+"""
+Bulk export of finished games and their move history, for analytics jobs.
+
+    flask --app run.py export-games -f ndjson -o games.ndjson
+    flask --app run.py export-games -f packed -o games.bin
+
+Games are read in keyset-paginated batches (id > last id seen) and the moves
+of each batch come from one query, so memory use depends on the batch size
+and not on the size of the `game` table.
+"""
+import array
+import datetime
+import json
+import struct
+import sys
+
+import click
+from flask.cli import with_appcontext
+
+from .models import db, Game, GameMove, ArchivedGame, ArchivedGameMove
+
+FINISHED_STATUSES = ('finished_x_wins', 'finished_o_wins', 'draw')
+RESULTS = {'draw': 0, 'finished_x_wins': 1, 'finished_o_wins': 2}
+
+# Packed format: PACKED_MAGIC, then per game a PACKED_HEADER followed by one
+# little-endian uint16 per move (the cell played, in order). Missing players
+# are stored as 0.
+PACKED_MAGIC = b'TTTG\x02'
+# id, player X, player O, created_at, result, size, win_length, moves
+PACKED_HEADER = struct.Struct('<IIIIBBBH')
+
+
+def iter_finished_games(batch_size=1000):
+    """
+    Yields finished games as dicts, each with its list of moves: archived
+    games first (see maintenance.py), then those still in `game`, each in id order.
+    """
+    yield from _iter_games(ArchivedGame, ArchivedGameMove, batch_size)
+    yield from _iter_games(Game, GameMove, batch_size)
+
+
+def _iter_games(model, move_model, batch_size):
+    last_id = 0
+    while True:
+        games = db.session.query(
+            model.id, model.room_id, model.player_x_id, model.player_o_id,
+            model.board, model.size, model.win_length, model.status, model.winner_id,
+            model.created_at)\
+            .filter(model.id > last_id, model.status.in_(FINISHED_STATUSES))\
+            .order_by(model.id).limit(batch_size).all()
+        if not games:
+            return
+
+        moves = {}
+        for game_id, cell in db.session.query(move_model.game_id, move_model.cell)\
+                .filter(move_model.game_id.in_([game.id for game in games]))\
+                .order_by(move_model.game_id, move_model.ply):
+            moves.setdefault(game_id, []).append(cell)
+
+        for game in games:
+            yield {
+                'id': game.id,
+                'room_id': game.room_id,
+                'player_x_id': game.player_x_id,
+                'player_o_id': game.player_o_id,
+                'board': game.board,
+                'size': game.size,
+                'win_length': game.win_length,
+                'status': game.status,
+                'winner_id': game.winner_id,
+                'created_at': game.created_at,
+                'moves': moves.get(game.id, []),  # Empty for games older than the move log
+            }
+        last_id = games[-1].id
+
+
+def write_ndjson(games, fp):
+    """Writes one JSON object per line to a binary file. Returns the number of games."""
+    count = 0
+    for game in games:
+        game = dict(game, created_at=game['created_at'].isoformat())
+        fp.write(json.dumps(game, separators=(',', ':')).encode() + b'\n')
+        count += 1
+    return count
+
+
+def write_packed(games, fp):
+    """Writes games in the packed binary format. Returns the number of games."""
+    fp.write(PACKED_MAGIC)
+    count = 0
+    for game in games:
+        created_at = game['created_at'].replace(tzinfo=datetime.timezone.utc)
+        fp.write(PACKED_HEADER.pack(
+            game['id'], game['player_x_id'] or 0, game['player_o_id'] or 0,
+            int(created_at.timestamp()), RESULTS[game['status']],
+            game['size'], game['win_length'], len(game['moves'])))
+        fp.write(_pack_moves(game['moves']))
+        count += 1
+    return count
+
+
+def _pack_moves(moves):
+    cells = array.array('H', moves)
+    if sys.byteorder == 'big':
+        cells.byteswap()
+    return cells.tobytes()
+
+
+def read_packed(fp):
+    """
+    Yields (id, player_x_id, player_o_id, created_at, result, size, win_length,
+    moves) from a packed file.
+    """
+    if fp.read(len(PACKED_MAGIC)) != PACKED_MAGIC:
+        raise ValueError('Not a packed game export.')
+    while True:
+        header = fp.read(PACKED_HEADER.size)
+        if not header:
+            return
+        *fields, count = PACKED_HEADER.unpack(header)
+        cells = array.array('H', fp.read(2 * count))
+        if sys.byteorder == 'big':
+            cells.byteswap()
+        yield (*fields, cells.tolist())
+
+
+@click.command('export-games')
+@click.option('-f', '--format', 'fmt', type=click.Choice(['ndjson', 'packed']), default='ndjson')
+@click.option('-o', '--output', type=click.File('wb'), default='-')
+@click.option('--batch-size', type=int, default=1000)
+@with_appcontext
+def export_games_command(fmt, output, batch_size):
+    """Export finished games with their moves."""
+    writer = write_packed if fmt == 'packed' else write_ndjson
+    count = writer(iter_finished_games(batch_size), output)
+    click.echo(f"Exported {count} game(s).", err=True)
@@ -1,58 +1,61 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.orm import aliased
-from sqlalchemy import or_
-from .models import db, User, Friendship
-from . import socketio, online_users_sids
+from sqlalchemy import func, or_
+from .models import db, User, Friendship, accepted_friends_query
+from . import socketio, sessions, presence
+from .sessions import user_room
 
 friend_bp = Blueprint('friends', __name__)
 
-def get_user_friends_data(user_id):
-    user = User.query.get(user_id)
-    if not user:
-        return []
-
-    # Friendships where user is requester and status is 'accepted'
-    sent_accepted = db.session.query(Friendship, User.username.label('friend_username'))\
-        .join(User, Friendship.addressee_id == User.id)\
-        .filter(Friendship.requester_id == user_id, Friendship.status == 'accepted').all()
-
-    # Friendships where user is addressee and status is 'accepted'
-    received_accepted = db.session.query(Friendship, User.username.label('friend_username'))\
-        .join(User, Friendship.requester_id == User.id)\
-        .filter(Friendship.addressee_id == user_id, Friendship.status == 'accepted').all()
-    
-    friends_data = []
-    processed_friend_ids = set()
-
-    for friendship, friend_username in sent_accepted:
-        friend_id = friendship.addressee_id
-        if friend_id not in processed_friend_ids:
-            friends_data.append({
-                "id": friend_id, 
-                "username": friend_username, 
-                "online": friend_id in online_users_sids
-            })
-            processed_friend_ids.add(friend_id)
-
-    for friendship, friend_username in received_accepted:
-        friend_id = friendship.requester_id
-        if friend_id not in processed_friend_ids:
-            friends_data.append({
-                "id": friend_id, 
-                "username": friend_username, 
-                "online": friend_id in online_users_sids
-            })
-            processed_friend_ids.add(friend_id)
-            
-    return friends_data
+def get_user_friends_data(user_id, offset=0, limit=None):
+    """Returns [{"id", "username", "online"}] of accepted friends, ordered by username."""
+    return friends_page(user_id, offset, limit)[0]
+
+
+def friends_page(user_id, offset=0, limit=None):
+    """(a page of get_user_friends_data(), number of friends). Uncached lists are paged in SQL."""
+    user_id = int(user_id)
+    # Online users' friend lists are already cached for presence updates
+    friends = presence.cached_friends(user_id)
+    if friends is not None:
+        items = sorted(friends.items(), key=lambda item: item[1].lower())
+        total = len(items)
+        items = items[offset:offset + limit] if limit else items[offset:]
+    else:
+        query = accepted_friends_query(user_id)
+        total = query.count()
+        query = query.order_by(func.lower(User.username)).offset(offset)
+        items = (query.limit(limit) if limit else query).all()
+    return [{
+        "id": friend_id,
+        "username": username,
+        "online": friend_id in sessions
+    } for friend_id, username in items], total
 
 
 @friend_bp.route('/friends', methods=['GET'])
 @jwt_required()
 def list_friends():
+    # Optional paging: ?offset=0&limit=50. Polling clients send If-None-Match
+    # and get an empty 304 while the page is unchanged.
     current_user_id = get_jwt_identity()
-    return jsonify(get_user_friends_data(current_user_id)), 200
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = request.args.get('limit', type=int)
+    limit = min(max(limit, 1), 100) if limit else None
+
+    # Checked before the list is built: the version moves with every change to it
+    etag = f'friends-{current_user_id}-{presence.list_version(current_user_id)}-{offset}-{limit or "all"}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    page, total = friends_page(current_user_id, offset, limit)
+    response = jsonify(page)
+    response.headers['X-Total-Count'] = str(total)
+    response.set_etag(etag)
+    return response
 
 
 @friend_bp.route('/friends/requests', methods=['GET'])
@@ -111,14 +114,13 @@ def send_friend_request(addressee_user_id):
     db.session.commit()
 
     # Notify the addressee via WebSocket if they are online
-    addressee_sid = online_users_sids.get(addressee_user_id)
     requester_user = User.query.get(requester_id)
-    if addressee_sid and requester_user:
+    if addressee_user_id in sessions and requester_user:
         socketio.emit('friend_request_received', {
             "request_id": new_request.id,
             "requester_id": requester_id,
             "requester_username": requester_user.username
-        }, room=addressee_sid)
+        }, room=user_room(addressee_user_id))
 
     return jsonify({"msg": f"Friend request sent to {addressee.username}"}), 201
 
@@ -126,7 +128,7 @@ def send_friend_request(addressee_user_id):
 @friend_bp.route('/friends/respond_request/<int:request_id>', methods=['POST'])
 @jwt_required()
 def respond_friend_request(request_id):
-    current_user_id = get_jwt_identity()
+    current_user_id = int(get_jwt_identity())
     data = request.get_json()
     response_status = data.get('status') # 'accepted' or 'declined'
 
@@ -146,27 +148,28 @@ def respond_friend_request(request_id):
 
     friend_request.status = response_status
     db.session.commit()
+    # Both friend lists changed; cached ones are reloaded on next use
+    presence.friends_changed(friend_request.requester_id, friend_request.addressee_id)
 
     # Notify the original requester about the response
-    requester_sid = online_users_sids.get(friend_request.requester_id)
+    requester_room = user_room(friend_request.requester_id)
     addressee_user = User.query.get(current_user_id)
 
-    if requester_sid and addressee_user:
+    if friend_request.requester_id in sessions and addressee_user:
         socketio.emit('friend_request_responded', {
             "request_id": friend_request.id,
             "addressee_id": current_user_id,
             "addressee_username": addressee_user.username,
             "status": response_status
-        }, room=requester_sid)
+        }, room=requester_room)
         
         # If accepted, also notify both to update their friend lists
         if response_status == 'accepted':
             # Notify requester
-            socketio.emit('friend_list_update', get_user_friends_data(friend_request.requester_id), room=requester_sid)
+            socketio.emit('friend_list_update', get_user_friends_data(friend_request.requester_id), room=requester_room)
             # Notify addressee (self)
-            self_sid = online_users_sids.get(current_user_id)
-            if self_sid:
-                socketio.emit('friend_list_update', get_user_friends_data(current_user_id), room=self_sid)
+            if current_user_id in sessions:
+                socketio.emit('friend_list_update', get_user_friends_data(current_user_id), room=user_room(current_user_id))
 
 
     return jsonify({"msg": f"Friend request {response_status}"}), 200
@@ -0,0 +1,756 @@
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import case, insert, select, update
+
+from .models import db, Game, GameMove, User, load_usernames
+from .board import Board, DRAW
+
+log = logging.getLogger(__name__)
+
+
+class MoveError(Exception):
+    """Raised when a move is rejected by the live game engine."""
+
+
+class LiveGame:
+    """
+    In-memory state of an active game.
+    While a game is live this object is the source of truth; the `Game` row
+    is only brought up to date by the background writer.
+    """
+
+    def __init__(self, game_id, room_id, player_x_id, player_o_id, board,
+                 current_turn_player_id, status, winner_id, is_public,
+                 created_at, usernames, seq=None, bot_level=None, win_length=3,
+                 clock=None, turn_started_at=None, turn_deadline=None):
+        self.game_id = game_id
+        self.room_id = room_id
+        self.player_x_id = player_x_id
+        self.player_o_id = player_o_id
+        self.board = Board.from_string(board, win_length)
+        self.current_turn_player_id = current_turn_player_id
+        self.status = status
+        self.winner_id = winner_id
+        self.is_public = is_public
+        self.created_at = created_at
+        self.usernames = usernames  # {user_id: username}, loaded once
+        self.bot_level = bot_level  # Player O is the bot when set
+        # Per-room move sequence number sent with every move_applied event;
+        # starts from the number of moves already on the board
+        self.seq = self.board.ply() if seq is None else seq
+        # Time control, see start_turn(): seconds left per symbol with a game
+        # clock, when the current turn started, and the Unix time the player to
+        # move loses on (None without clocks or once the game is over)
+        self.clock = clock
+        self.turn_started_at = turn_started_at
+        self.turn_deadline = turn_deadline
+
+    @classmethod
+    def from_model(cls, game, usernames=None):
+        if usernames is None:
+            usernames = load_usernames(game.user_ids())
+        clock = None if game.time_left_x is None else {'X': game.time_left_x, 'O': game.time_left_o}
+        return cls(game.id, game.room_id, game.player_x_id, game.player_o_id,
+                   game.board, game.current_turn_player_id, game.status,
+                   game.winner_id, game.is_public, game.created_at, usernames,
+                   bot_level=game.bot_level, win_length=game.win_length,
+                   clock=clock, turn_started_at=game.turn_started_at)
+
+    def to_state(self):
+        """JSON snapshot kept in a shared state store."""
+        return json.dumps({
+            'game_id': self.game_id, 'room_id': self.room_id,
+            'player_x_id': self.player_x_id, 'player_o_id': self.player_o_id,
+            'board': self.board_str,
+            'current_turn_player_id': self.current_turn_player_id,
+            'status': self.status, 'winner_id': self.winner_id,
+            'is_public': self.is_public, 'created_at': self.created_at.isoformat(),
+            'usernames': self.usernames, 'seq': self.seq,
+            'bot_level': self.bot_level, 'win_length': self.board.win_length,
+            'clock': self.clock, 'turn_started_at': self.turn_started_at,
+            'turn_deadline': self.turn_deadline,
+        })
+
+    @classmethod
+    def from_state(cls, state):
+        data = json.loads(state)
+        data['created_at'] = datetime.datetime.fromisoformat(data['created_at'])
+        # JSON object keys are strings
+        data['usernames'] = {int(uid): name for uid, name in data['usernames'].items()}
+        return cls(**data)
+
+    @property
+    def board_str(self):
+        return self.board.to_string()
+
+    def symbol_for(self, user_id):
+        if user_id == self.player_x_id:
+            return 'X'
+        if user_id == self.player_o_id:
+            return 'O'
+        return None
+
+    def apply_move(self, user_id, index):
+        """Validates and applies a move. Returns the winning symbol, if any."""
+        if self.status != 'active':
+            raise MoveError('Game is not active.')
+        if self.current_turn_player_id != user_id:
+            raise MoveError('Not your turn.')
+        if not (isinstance(index, int) and 0 <= index < self.board.cells and self.board.is_empty(index)):
+            raise MoveError('Invalid move.')
+
+        self.board.play(index, self.symbol_for(user_id))
+        self.seq += 1
+
+        # Only the lines through the new mark can have changed
+        outcome = self.board.outcome_after(index)
+        winner_symbol = None
+        if outcome == DRAW:
+            self.status = 'draw'
+        elif outcome:
+            winner_symbol = outcome
+            self.winner_id = self.player_x_id if winner_symbol == 'X' else self.player_o_id
+            self.status = f"finished_{winner_symbol.lower()}_wins"
+        else:
+            # Switch turn
+            self.current_turn_player_id = self.player_o_id if user_id == self.player_x_id else self.player_x_id
+        return winner_symbol
+
+    def forfeit(self, user_id):
+        """Ends the game in favour of the opponent of `user_id`."""
+        if self.player_x_id == user_id:
+            self.status = 'finished_o_wins'  # Player O wins by forfeit
+            self.winner_id = self.player_o_id
+        else:
+            self.status = 'finished_x_wins'  # Player X wins by forfeit
+            self.winner_id = self.player_x_id
+
+    def start_turn(self, now, turn_seconds, game_seconds, moved=None):
+        """
+        Starts the clock of the player to move. `moved` is the symbol whose move
+        ended the previous turn; that time is charged to their game clock. The
+        deadline is the nearer of the per-move limit and the game clock.
+        """
+        if game_seconds and self.clock is None:
+            self.clock = {'X': float(game_seconds), 'O': float(game_seconds)}
+        if moved and self.clock is not None and self.turn_started_at is not None:
+            self.clock[moved] = round(max(0.0, self.clock[moved] - (now - self.turn_started_at)), 3)
+        self.turn_started_at = now
+        limits = []
+        if self.status == 'active':
+            if turn_seconds:
+                limits.append(turn_seconds)
+            if self.clock is not None:
+                limits.append(self.clock[self.symbol_for(self.current_turn_player_id)])
+        self.turn_deadline = round(now + min(limits), 3) if limits else None
+        return self.turn_deadline
+
+    def time_out(self, now):
+        """Ends the game against the player to move, whose time ran out. Returns their id."""
+        loser = self.current_turn_player_id
+        symbol = self.symbol_for(loser)
+        self.forfeit(loser)
+        self.start_turn(now, 0, 0, moved=symbol)
+        return loser
+
+    def clock_state(self):
+        """Time control fields of the game payloads."""
+        return {'turn_deadline': self.turn_deadline, 'time_left': self.clock}
+
+    def is_bot_turn(self):
+        return bool(self.bot_level) and self.status == 'active' and \
+            self.current_turn_player_id == self.player_o_id
+
+    def to_row(self):
+        """Column values for a bulk UPDATE of the `Game` table."""
+        return {
+            'id': self.game_id,
+            'board': self.board_str,
+            'current_turn_player_id': self.current_turn_player_id,
+            'status': self.status,
+            'winner_id': self.winner_id,
+            'turn_started_at': self.turn_started_at,
+            'time_left_x': self.clock['X'] if self.clock else None,
+            'time_left_o': self.clock['O'] if self.clock else None,
+        }
+
+    def user_ids(self):
+        return set(self.usernames)
+
+    def to_dict(self, current_user_id=None, usernames=None):
+        # Same payload as Game.to_dict; usernames are cached on the live game
+        if usernames is None:
+            usernames = self.usernames
+        return {
+            'id': self.game_id,
+            'room_id': self.room_id,
+            'player_x_id': self.player_x_id,
+            'player_x_username': usernames.get(self.player_x_id),
+            'player_o_id': self.player_o_id,
+            'player_o_username': usernames.get(self.player_o_id),
+            'board': self.board.to_list(),
+            'size': self.board.size,
+            'win_length': self.board.win_length,
+            'current_turn_player_id': self.current_turn_player_id,
+            'current_turn_username': usernames.get(self.current_turn_player_id),
+            'current_player_symbol': self.symbol_for(current_user_id) if current_user_id else None,
+            'status': self.status,
+            'is_public': self.is_public,
+            'winner_id': self.winner_id,
+            'winner_username': usernames.get(self.winner_id),
+            'bot_level': self.bot_level,
+            'created_at': self.created_at.isoformat(),
+            'seq': self.seq,
+            **self.clock_state()
+        }
+
+    def move_delta(self, index, symbol):
+        """Compact payload of the `move_applied` event for the move just played."""
+        return {
+            'room_id': self.room_id,
+            'seq': self.seq,
+            'index': index,
+            'symbol': symbol,
+            'next_turn_player_id': self.current_turn_player_id,
+            'status': self.status,
+            'winner_id': self.winner_id,
+            **self.clock_state()
+        }
+
+
+class GameRegistry:
+    """
+    Registry of live games keyed by room_id.
+
+    With a process-local state store, games are kept as objects in memory
+    and every move is appended to a journal file. A background writer flushes
+    dirty games to the `Game` table, and new moves to the `GameMove` log, in
+    one batch every GAME_FLUSH_INTERVAL seconds. Journal entries written before a successful flush are
+    discarded; anything left over after a crash is replayed into the
+    database the next time the registry is used.
+
+    With a shared store (Redis), the game snapshot, the dirty set and pending
+    win credits live in the store instead, so any worker can apply a move or
+    run the flush:
+        games:live   hash  {room_id: LiveGame.to_state()}
+        games:dirty  set   of room_ids
+        games:wins   hash  {user_id: wins to credit}
+        games:moves  hash  {"<game_id>:<ply>": cell} not yet in the move log
+    The store already outlives a worker crash, so no journal is written.
+
+    Turn clocks: every live game has at most one timer in the shared
+    scheduler, re-armed on each move (O(1) on the timer wheel), for the
+    deadline set by LiveGame.start_turn(). TURN_SECONDS limits a single move
+    and GAME_CLOCK_SECONDS is each player's budget for the whole game (0
+    disables either). Timers that expire in a tick are resolved together by
+    expire_turns(); the forfeits reach the DB with the next batched flush.
+    Games that are active in the DB but not live (activated over HTTP or by
+    matchmaking and never joined, or not reloaded since a restart) are
+    covered by sweep_clocks(), run when the registry starts and every
+    TURN_SWEEP_INTERVAL seconds.
+    """
+
+    LIVE = 'games:live'
+    DIRTY = 'games:dirty'
+    WINS = 'games:wins'
+    MOVES = 'games:moves'
+    TIMEOUT = 'turn_timeout'  # Timer kind, also the metrics task name
+    SWEEP = 'turn_sweep'  # Store lock, so one worker sweeps at a time
+
+    def __init__(self, store, scheduler):
+        self._store = store
+        self._scheduler = scheduler
+        self._games = {}  # {room_id: LiveGame}, local store only
+        self._dirty = set()  # room_ids with unflushed changes
+        self._pending_wins = {}  # {user_id: wins to credit on next flush}
+        self._pending_moves = []  # GameMove rows to insert on next flush
+        self._lock = threading.RLock()
+        self._journal = None
+        self._journal_path = None
+        self._flush_interval = 0.5
+        self._turn_seconds = 0
+        self._game_seconds = 0
+        self._sweep_interval = 5
+        self._app = None
+        self._started = False
+
+    def init_app(self, app):
+        self._app = app
+        self._flush_interval = app.config.get('GAME_FLUSH_INTERVAL', 0.5)
+        self._turn_seconds = app.config.get('TURN_SECONDS', 0)
+        self._game_seconds = app.config.get('GAME_CLOCK_SECONDS', 0)
+        self._sweep_interval = app.config.get('TURN_SWEEP_INTERVAL', 5)
+        self._scheduler.handler(self.TIMEOUT, self._on_timeouts)
+        self._journal_path = app.config.get('GAME_JOURNAL_PATH') or \
+            os.path.join(app.instance_path, 'moves.journal')
+
+    def _clocks_on(self):
+        return bool(self._turn_seconds or self._game_seconds)
+
+    def start(self):
+        """Starts the registry now rather than on first use, e.g. for the turn clock sweep."""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        # Deferred until first use so CLI commands (e.g. `flask db upgrade`)
+        # never touch the game tables or spawn the writer.
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            if not self._store.shared:
+                self.recover()
+                os.makedirs(os.path.dirname(self._journal_path), exist_ok=True)
+                self._journal = open(self._journal_path, 'a')
+            from . import socketio
+            socketio.start_background_task(self._run_writer)
+            if self._clocks_on() and self._sweep_interval:
+                socketio.start_background_task(self._run_sweeper)
+
+    # --- Game access ---
+
+    def _room_lock(self, room_id):
+        if self._store.shared:
+            return self._store.lock(f'game:{room_id}')
+        return self._lock
+
+    def _load(self, room_id):
+        if self._store.shared:
+            state = self._store.hget(self.LIVE, room_id)
+            return LiveGame.from_state(state) if state else None
+        return self._games.get(room_id)
+
+    def _save(self, live):
+        if self._store.shared:
+            self._store.hset(self.LIVE, live.room_id, live.to_state())
+        else:
+            self._games[live.room_id] = live
+
+    def _load_or_track(self, room_id, game=None, usernames=None):
+        live = self._load(room_id)
+        if live:
+            return live
+        if game is None:
+            game = Game.query.filter_by(room_id=room_id).first()
+        if not game or game.status != 'active':
+            return None
+        with self._room_lock(room_id):
+            # Another handler may have loaded it while we were querying
+            live = self._load(room_id)
+            if not live:
+                live = LiveGame.from_model(game, usernames)
+                # A game unloaded mid-turn (restart) resumes the turn and clocks it had
+                live.start_turn(live.turn_started_at or time.time(), self._turn_seconds, self._game_seconds)
+                self._save(live)
+        self._arm(live)
+        return live
+
+    def get(self, room_id):
+        """Returns the live game for room_id, loading it if it is active in the DB."""
+        self._ensure_started()
+        return self._load_or_track(room_id)
+
+    def track(self, game, usernames=None):
+        """
+        Returns the live game for an already loaded `Game` row, registering it
+        if the row is active. Returns None for pending or finished games.
+        Passing the players' usernames avoids a query.
+        """
+        self._ensure_started()
+        if not game:
+            return None
+        return self._load_or_track(game.room_id, game, usernames)
+
+    def get_cached(self, room_id):
+        """Returns the live game only if it is already registered."""
+        return self._load(room_id)
+
+    def count(self):
+        """Number of live games (in this worker, with a local store)."""
+        if self._store.shared:
+            return self._store.hlen(self.LIVE)
+        return len(self._games)
+
+    def apply_move(self, room_id, user_id, index):
+        """
+        Applies a move to a live game. Returns (live_game, winner_symbol).
+        Raises MoveError if the move is not allowed.
+        """
+        if not self.get(room_id):
+            raise MoveError('Game not found.')
+        with self._room_lock(room_id):
+            live = self._load(room_id)  # Fresh copy, another worker may have moved
+            if live is None:
+                raise MoveError('Game is not active.')  # Finished and evicted since get()
+            winner_symbol = live.apply_move(user_id, index)
+            live.start_turn(time.time(), self._turn_seconds, self._game_seconds, moved=live.symbol_for(user_id))
+            self._record(live, move={'game_id': live.game_id, 'ply': live.seq, 'cell': index})
+        self._arm(live)
+        return live, winner_symbol
+
+    def forfeit(self, room_id, user_id, game=None):
+        """
+        Ends the live game in room_id in favour of user_id's opponent.
+        Passing the already loaded `Game` row saves a query if it is not live yet.
+        """
+        if not (self.track(game) if game is not None else self.get(room_id)):
+            return None
+        with self._room_lock(room_id):
+            live = self._load(room_id)
+            if live is None or live.status != 'active':
+                return None
+            live.forfeit(user_id)
+            live.start_turn(time.time(), 0, 0, moved=live.symbol_for(user_id))
+            self._record(live)
+        self._arm(live)
+        return live
+
+    # --- Turn clocks ---
+
+    def _arm(self, live):
+        """Points the game's timer at its current deadline, or drops it."""
+        if live.turn_deadline is None:
+            self._scheduler.cancel(self.TIMEOUT, live.room_id)
+        else:
+            self._scheduler.schedule(self.TIMEOUT, live.room_id, live.turn_deadline - time.time())
+
+    def expire_turns(self, room_ids, now=None):
+        """
+        Ends every game in room_ids whose player to move is past their
+        deadline. Timers that fired early (the game moved on in another
+        worker) are re-armed. Returns the games that timed out.
+        """
+        now = time.time() if now is None else now
+        timed_out = []
+        for room_id in room_ids:
+            with self._room_lock(room_id):
+                live = self._load(room_id)
+                if not live or live.status != 'active' or live.turn_deadline is None:
+                    continue
+                if live.turn_deadline > now:
+                    self._arm(live)
+                    continue
+                live.time_out(now)
+                self._record(live)
+            timed_out.append(live)
+        return timed_out
+
+    def _run_sweeper(self):
+        from . import socketio, metrics
+        while True:
+            try:
+                with self._app.app_context(), metrics.track('task', self.SWEEP):
+                    self.sweep_clocks()
+            except Exception:
+                log.exception('Turn clock sweep failed')
+            socketio.sleep(self._sweep_interval)
+
+    def sweep_clocks(self, now=None):
+        """
+        Runs the turn clocks of games that are active in the DB but not live.
+        Games never loaded start their turn now; games past their deadline are
+        ended with one UPDATE; games due before the next sweep are loaded, which
+        arms their timer. Returns (expired, armed) room_ids.
+        """
+        if not self._clocks_on():
+            return [], []
+        now = time.time() if now is None else now
+        with self._store.lock(self.SWEEP):
+            db.session.execute(
+                update(Game).where(Game.status == 'active', Game.turn_started_at.is_(None))
+                .values(turn_started_at=now, time_left_x=self._game_seconds or None,
+                        time_left_o=self._game_seconds or None)
+                .execution_options(synchronize_session=False))
+            rows = db.session.execute(select(
+                Game.id, Game.room_id, Game.player_x_id, Game.player_o_id, Game.current_turn_player_id,
+                Game.bot_level, Game.turn_started_at, Game.time_left_x, Game.time_left_o)
+                .where(Game.status == 'active')).all()
+            if self._store.shared:
+                live = self._store.hmget(self.LIVE, [row.room_id for row in rows]) if rows else []
+            else:
+                live = [self._games.get(row.room_id) for row in rows]
+            expired, due = [], []
+            for row, state in zip(rows, live):
+                if state or (row.bot_level and row.current_turn_player_id == row.player_o_id):
+                    continue  # Live games have their own timer; the bot moves at once
+                limits = [self._turn_seconds] if self._turn_seconds else []
+                time_left = row.time_left_x if row.current_turn_player_id == row.player_x_id else row.time_left_o
+                if time_left is not None:
+                    limits.append(time_left)
+                deadline = row.turn_started_at + min(limits)
+                if deadline <= now:
+                    expired.append(row)
+                elif deadline <= now + self._sweep_interval:
+                    due.append(row)
+            if expired and not self._expire_rows(expired):
+                db.session.rollback()  # One moved on meanwhile; the next sweep reads them again
+                expired = []
+            db.session.commit()
+        if expired:
+            self._announce_timeouts([row.id for row in expired])
+        if due:
+            games = Game.query.filter(Game.id.in_([row.id for row in due])).all()
+            usernames = load_usernames({uid for game in games for uid in game.user_ids()})
+            for game in games:
+                self.track(game, {uid: usernames.get(uid) for uid in game.user_ids()})
+        return [row.room_id for row in expired], [row.room_id for row in due]
+
+    @staticmethod
+    def _expire_rows(rows):
+        """
+        Ends the games of `rows` against their player to move and credits the
+        winners. Returns False, with nothing credited, if one is no longer active.
+        """
+        x_loses = Game.current_turn_player_id == Game.player_x_id
+        # Re-checks the status, so a game is only ended (and credited) once across workers
+        result = db.session.execute(
+            update(Game).where(Game.id.in_([row.id for row in rows]), Game.status == 'active')
+            .values(status=case((x_loses, 'finished_o_wins'), else_='finished_x_wins'),
+                    winner_id=case((x_loses, Game.player_o_id), else_=Game.player_x_id))
+            .execution_options(synchronize_session=False))
+        if result.rowcount != len(rows):
+            return False
+        wins = {}
+        for row in rows:
+            winner = row.player_o_id if row.current_turn_player_id == row.player_x_id else row.player_x_id
+            wins[winner] = wins.get(winner, 0) + 1
+        by_count = {}
+        for user_id, count in wins.items():
+            by_count.setdefault(count, []).append(user_id)
+        for count, user_ids in by_count.items():
+            db.session.execute(update(User).where(User.id.in_(user_ids)).values(wins=User.wins + count))
+        return True
+
+    def _announce_timeouts(self, game_ids):
+        from . import socketio, leaderboard
+        from .game_events import active_game_sids
+        from .sessions import game_audience
+
+        games = Game.query.filter(Game.id.in_(game_ids)).all()
+        usernames = load_usernames({uid for game in games for uid in game.user_ids()})
+        for game in games:
+            leaderboard.add_win(game.winner_id)
+            symbol = 'X' if game.winner_id == game.player_x_id else 'O'
+            socketio.emit('game_over', {'game': game.to_dict(usernames=usernames), 'winner': symbol,
+                                        'timeout': True}, to=game_audience(game.room_id))
+            active_game_sids.discard(game.room_id)
+        log.info('Unloaded games lost on time', extra={'games': len(games)})
+
+    def _on_timeouts(self, room_ids):
+        from . import socketio, leaderboard
+        from .game_events import active_game_sids
+        from .sessions import game_audience
+
+        for live in self.expire_turns(room_ids):
+            leaderboard.add_win(live.winner_id)
+            socketio.emit('game_over', {'game': live.to_dict(), 'winner': live.symbol_for(live.winner_id),
+                                        'timeout': True}, to=game_audience(live.room_id))
+            active_game_sids.discard(live.room_id)
+            log.info('Game lost on time', extra={'room_id': live.room_id, 'winner_id': live.winner_id})
+
+    def pending_moves(self, game_id):
+        """Moves of a game that are not in the `GameMove` table yet, as row dicts."""
+        if self._store.shared:
+            prefix = f'{game_id}:'
+            moves = [{'game_id': game_id, 'ply': int(key[len(prefix):]), 'cell': int(cell)}
+                     for key, cell in self._store.hgetall(self.MOVES).items()
+                     if key.startswith(prefix)]
+        else:
+            with self._lock:
+                moves = [move for move in self._pending_moves if move['game_id'] == game_id]
+        return sorted(moves, key=lambda move: move['ply'])
+
+    def _record(self, live, move=None):
+        # Caller holds the room lock
+        credit = live.winner_id if live.status != 'active' else None
+        if self._store.shared:
+            self._save(live)
+            self._store.sadd(self.DIRTY, live.room_id)
+            if move:
+                self._store.hset(self.MOVES, f"{move['game_id']}:{move['ply']}", str(move['cell']))
+            if credit:
+                self._store.hincrby(self.WINS, str(credit), 1)
+            return
+        with self._lock:
+            if credit:
+                self._pending_wins[credit] = self._pending_wins.get(credit, 0) + 1
+            if move:
+                self._pending_moves.append(move)
+            self._dirty.add(live.room_id)
+            entry = dict(live.to_row(), room_id=live.room_id, credit=credit, move=move)
+            self._journal.write(json.dumps(entry) + '\n')
+            self._journal.flush()
+
+    # --- Write-behind persistence ---
+
+    def _run_writer(self):
+        from . import socketio, metrics
+        while True:
+            socketio.sleep(self._flush_interval)
+            try:
+                with self._app.app_context(), metrics.track('task', 'game_flush'):
+                    self.flush()
+            except Exception:
+                log.exception('Live game flush failed')
+
+    def _take_pending(self):
+        """Claims the dirty games, win credits and new moves for one flush."""
+        if self._store.shared:
+            room_ids = list(self._store.spopall(self.DIRTY))
+            if not room_ids:
+                return [], {}, []
+            wins = {int(uid): int(count) for uid, count in self._store.hpopall(self.WINS).items()}
+            moves = []
+            for key, cell in self._store.hpopall(self.MOVES).items():
+                game_id, ply = key.split(':')
+                moves.append({'game_id': int(game_id), 'ply': int(ply), 'cell': int(cell)})
+            states = self._store.hmget(self.LIVE, room_ids)
+            return [LiveGame.from_state(state) for state in states if state], wins, moves
+        with self._lock:
+            if not self._dirty:
+                return [], {}, []
+            games = [self._games[room_id] for room_id in self._dirty]
+            wins, moves = self._pending_wins, self._pending_moves
+            self._dirty = set()
+            self._pending_wins = {}
+            self._pending_moves = []
+            self._rotate_journal()
+            return games, wins, moves
+
+    def _restore_pending(self, games, wins, moves):
+        """Puts claimed work back after a failed flush, to retry on the next pass."""
+        if self._store.shared:
+            self._store.sadd(self.DIRTY, *[live.room_id for live in games])
+            for user_id, count in wins.items():
+                self._store.hincrby(self.WINS, str(user_id), count)
+            if moves:
+                self._store.hsetmany(self.MOVES, {f"{m['game_id']}:{m['ply']}": str(m['cell'])
+                                                  for m in moves})
+            return
+        with self._lock:
+            # The rotated journal is kept until a flush succeeds
+            self._dirty.update(live.room_id for live in games)
+            for user_id, count in wins.items():
+                self._pending_wins[user_id] = self._pending_wins.get(user_id, 0) + count
+            self._pending_moves[:0] = moves
+
+    def _complete_flush(self, games):
+        """Drops the flushed journal and evicts finished games."""
+        finished = [live.room_id for live in games if live.status != 'active']
+        if self._store.shared:
+            if finished:
+                self._store.hdel(self.LIVE, *finished)
+            return
+        with self._lock:
+            os.remove(self._journal_path + '.flushing')
+            for room_id in finished:
+                if room_id not in self._dirty:
+                    self._games.pop(room_id, None)
+
+    def flush(self):
+        """Writes all dirty games, new moves and pending win credits to the DB in one transaction."""
+        games, wins, moves = self._take_pending()
+        if not games:
+            return 0
+        rows = [live.to_row() for live in games]
+        try:
+            db.session.execute(update(Game), rows)
+            if moves:
+                db.session.execute(insert(GameMove), moves)
+            for user_id, count in wins.items():
+                db.session.execute(
+                    update(User).where(User.id == user_id).values(wins=User.wins + count))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._restore_pending(games, wins, moves)
+            raise
+        self._complete_flush(games)
+        return len(rows)
+
+    def _rotate_journal(self):
+        # Caller holds the lock. Entries covered by the flush in progress move
+        # to `<journal>.flushing`; if a previous flush failed, they are appended
+        # to the file that is still waiting there.
+        self._journal.close()
+        flushing_path = self._journal_path + '.flushing'
+        if os.path.exists(flushing_path):
+            with open(self._journal_path) as src, open(flushing_path, 'a') as dst:
+                dst.write(src.read())
+            os.remove(self._journal_path)
+        else:
+            os.replace(self._journal_path, flushing_path)
+        self._journal = open(self._journal_path, 'a')
+
+    def recover(self):
+        """Replays journal entries that never reached the DB."""
+        latest = {}  # {room_id: last journaled state}
+        credits = {}  # {room_id: winner to credit}
+        moves = {}  # {(game_id, ply): cell}
+        paths = [self._journal_path + '.flushing', self._journal_path]
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path) as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn write at the end of the file
+                    latest[entry['room_id']] = entry
+                    if entry.get('credit'):
+                        credits[entry['room_id']] = entry['credit']
+                    if entry.get('move'):
+                        move = entry['move']
+                        moves[(move['game_id'], move['ply'])] = move['cell']
+        if not latest:
+            return 0
+
+        from . import leaderboard
+        if credits:
+            # Loaded before the credits below, so a rebuild never counts them twice
+            leaderboard._ensure_loaded()
+        games = {g.id: g for g in Game.query.filter(
+            Game.id.in_([e['id'] for e in latest.values()])).all()}
+        credited = []  # Winners credited here, to mirror on the leaderboard
+        for room_id, entry in latest.items():
+            game = games.get(entry['id'])
+            if not game:
+                continue
+            # The win was only credited if the finished state was flushed
+            if game.status == 'active' and room_id in credits:
+                winner = User.query.get(credits[room_id])
+                if winner:
+                    winner.wins += 1
+                    credited.append(winner.id)
+            game.board = entry['board']
+            game.current_turn_player_id = entry['current_turn_player_id']
+            game.status = entry['status']
+            game.winner_id = entry['winner_id']
+            game.turn_started_at = entry.get('turn_started_at')
+            game.time_left_x = entry.get('time_left_x')
+            game.time_left_o = entry.get('time_left_o')
+        # The last flush may have committed before its journal was dropped
+        logged = set(db.session.query(GameMove.game_id, GameMove.ply).filter(
+            GameMove.game_id.in_(list(games))).all())
+        new_moves = [{'game_id': game_id, 'ply': ply, 'cell': cell}
+                     for (game_id, ply), cell in moves.items()
+                     if game_id in games and (game_id, ply) not in logged]
+        if new_moves:
+            db.session.execute(insert(GameMove), new_moves)
+        db.session.commit()
+        for winner_id in credited:
+            leaderboard.add_win(winner_id)
+
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        log.info('Recovered games from the move journal', extra={'games': len(latest)})
+        return len(latest)
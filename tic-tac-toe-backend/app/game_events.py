@@ -1,57 +1,65 @@
-from flask import request
-from flask_socketio import emit, join_room, leave_room
-from flask_jwt_extended import jwt_required, get_jwt_identity, decode_token
-from . import socketio, online_users_sids, ready_to_play_users # Import from __init__
-from .models import db, Game, User
-from .utils import check_win, check_draw
-from .friend_routes import get_user_friends_data # To update friend lists with online status
+import logging
+
+from flask import current_app, request, session
+from flask_socketio import emit, join_room, leave_room, rooms
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from . import socketio, sessions, lobby, live_games, leaderboard, state_store, presence, bot, metrics, token_cache, \
+    spectator_snapshots, reconnects, public_rooms # Import from __init__
+from .models import db, Game, User, load_usernames
+from .game_engine import MoveError
+from .sessions import user_room, spectator_room, game_audience, GameRoomSids
+from .logs import SampledLogger
+
+log = logging.getLogger(__name__)
+# Per-connection messages, written at LOG_SAMPLE_RATE
+sampled_log = SampledLogger(log)
 
 # Store active games and their players' SIDs: {room_id: {player_x_sid: sid, player_o_sid: sid}}
-# This is for quick broadcast, DB is still source of truth for game state.
-active_game_sids = {}
+# This is for quick broadcast; game state itself lives in `live_games`.
+active_game_sids = GameRoomSids(state_store)
 
-def notify_friends_online_status(user_id, online: bool):
+def current_user_id():
+    """User of the current socket, from the principal saved on its session at authentication."""
+    principal = session.get('principal')
+    return principal.user_id if principal else None
+
+
+def notify_friends_online_status(user_id, online: bool, username=None):
     """Notifies a user's friends about their online status change."""
-    friends_data = get_user_friends_data(user_id) # Get my friend list
-    # This friends_data already contains online status for MY friends
-    # What we need is to iterate MY friends and for each friend, get THEIR sid
-    # and send them an update about ME.
-    
-    user = User.query.get(user_id)
-    if not user: return
-
-    # Get all friendships where this user is involved and status is 'accepted'
-    friendships = Friendship.query.filter(
-        ((Friendship.requester_id == user_id) | (Friendship.addressee_id == user_id)) &
-        (Friendship.status == 'accepted')
-    ).all()
-
-    friend_ids = set()
-    for f in friendships:
-        if f.requester_id == user_id:
-            friend_ids.add(f.addressee_id)
-        else:
-            friend_ids.add(f.requester_id)
-    
-    for friend_id in friend_ids:
-        friend_sid = online_users_sids.get(friend_id)
-        if friend_sid:
-            emit('friend_status_update', {
-                'user_id': user_id, 
-                'username': user.username, 
-                'online': online
-            }, room=friend_sid)
+    username = username or presence.username(user_id)
+    if not username:
+        user = User.query.get(user_id)
+        if not user: return
+        username = user.username
+    presence.announce(user_id, username, online)
+
+
+def resume_games(user_id):
+    """Puts the socket of a player back within their reconnect grace period into their game rooms."""
+    room_ids = reconnects.resume(user_id)
+    for room_id in room_ids or ():
+        live = live_games.get_cached(room_id)
+        if not live or live.status != 'active':
+            continue
+        join_room(room_id)
+        slot = 'player_x_sid' if live.player_x_id == user_id else 'player_o_sid'
+        active_game_sids.set(room_id, slot, request.sid)
+        emit('game_resumed', {'game': live.to_dict(user_id)}, room=request.sid)
+        emit('opponent_reconnected', {'room_id': room_id, 'user_id': user_id},
+             room=game_audience(room_id), skip_sid=request.sid)
 
 
 @socketio.on('connect')
+@metrics.instrument('event', 'connect')
 def handle_connect(auth_data=None):
     # Client should send JWT token in auth_data or connect query string for authentication
     # Example: socket = io({ auth: { token: 'your_jwt_token' } });
     # For simplicity now, we'll assume an authenticated user ID is passed after connection
     # OR, we can try to authenticate here.
-    print(f"Client connected: {request.sid}")
+    sampled_log.info('Socket connected', extra={'sid': request.sid})
     # A general 'lobby' room for global events like available players update
     join_room('lobby', sid=request.sid)
+    emit('available_players_snapshot', lobby.snapshot(), room=request.sid)
 
     # The client should emit an 'authenticate' event with their token
     # Or, it can be passed in connect handshake `auth` field.
@@ -61,118 +69,96 @@ def handle_connect(auth_data=None):
     token = auth_data.get('token') if auth_data else None
     if token:
         try:
-            decoded_token = decode_token(token)
-            user_id = decoded_token['sub'] # 'sub' is the standard claim for identity
-            user = User.query.get(user_id)
-            if user:
-                online_users_sids[user_id] = request.sid
-                print(f"User {user.username} (ID: {user_id}) authenticated and connected with SID {request.sid}")
-                # Notify friends that this user is online
-                notify_friends_online_status(user_id, online=True)
+            # Verified tokens are cached, so reconnects skip the signature check and user query
+            principal = token_cache.resolve(token)
+            if principal:
+                user_id = principal.user_id
+                session['principal'] = principal  # Later events read it from the socket session
+                came_online = sessions.add(user_id, request.sid)
+                join_room(user_room(user_id))
+                sampled_log.info('Socket authenticated on connect',
+                                 extra={'sid': request.sid, 'user_id': user_id})
+                # Notify friends that this user is online (first tab only)
+                if came_online:
+                    notify_friends_online_status(user_id, online=True, username=principal.username)
+                    resume_games(user_id)
                 # Send current friend list with online statuses to the connected user
-                emit('friend_list_update', get_user_friends_data(user_id), room=request.sid)
+                emit('friend_list_update', presence.friend_list(user_id), room=request.sid)
 
             else:
-                print(f"User ID {user_id} from token not found in DB.")
+                log.warning('Token user not found', extra={'sid': request.sid})
         except Exception as e:
-            print(f"Token validation failed on connect for SID {request.sid}: {e}")
+            log.warning('Token validation failed on connect', extra={'sid': request.sid, 'error': str(e)})
     else:
-        print(f"Client {request.sid} connected without token.")
+        log.debug('Socket connected without token', extra={'sid': request.sid})
+
+
+@socketio.on('request_lobby_snapshot')
+@metrics.instrument('event', 'request_lobby_snapshot')
+def on_request_lobby_snapshot(data=None):
+    """Full list of ready players, for clients joining late or missing a delta version."""
+    emit('available_players_snapshot', lobby.snapshot(), room=request.sid)
 
 
 @socketio.on('authenticate_socket') # If client sends token after connect
+@metrics.instrument('event', 'authenticate_socket')
 def authenticate_socket(data):
     token = data.get('token')
     if token:
         try:
-            decoded_token = decode_token(token)
-            user_id = decoded_token['sub']
-            user = User.query.get(user_id)
-            if user:
-                online_users_sids[user_id] = request.sid
-                print(f"User {user.username} (ID: {user_id}) authenticated via event with SID {request.sid}")
-                notify_friends_online_status(user_id, online=True)
-                emit('friend_list_update', get_user_friends_data(user_id), room=request.sid)
+            principal = token_cache.resolve(token)
+            if principal:
+                user_id = principal.user_id
+                session['principal'] = principal
+                came_online = sessions.add(user_id, request.sid)
+                join_room(user_room(user_id))
+                sampled_log.info('Socket authenticated via event',
+                                 extra={'sid': request.sid, 'user_id': user_id})
+                if came_online:
+                    notify_friends_online_status(user_id, online=True, username=principal.username)
+                    resume_games(user_id)
+                emit('friend_list_update', presence.friend_list(user_id), room=request.sid)
             else:
-                print(f"User ID {user_id} from token not found in DB.")
+                log.warning('Token user not found', extra={'sid': request.sid})
                 emit('auth_error', {'message': 'User not found from token'}, room=request.sid)
         except Exception as e:
-            print(f"Token validation failed on event for SID {request.sid}: {e}")
+            log.warning('Token validation failed on event', extra={'sid': request.sid, 'error': str(e)})
             emit('auth_error', {'message': f'Token validation failed: {e}'}, room=request.sid)
     else:
         emit('auth_error', {'message': 'Token not provided for authentication'}, room=request.sid)
 
 
 @socketio.on('disconnect')
+@metrics.instrument('event', 'disconnect')
 def handle_disconnect():
-    print(f"Client disconnected: {request.sid}")
-    disconnected_user_id = None
-    for user_id, sid in list(online_users_sids.items()): # Iterate over a copy
-        if sid == request.sid:
-            disconnected_user_id = user_id
-            del online_users_sids[user_id]
-            # If user was in ready_to_play_users, remove them
-            if user_id in ready_to_play_users:
-                del ready_to_play_users[user_id]
-                # Broadcast updated available players list
-                socketio.emit('available_players_update', 
-                            [{"id": uid, "username": uname} for uid, uname in ready_to_play_users.items()], 
-                            room='lobby')
-            break
-    
+    sampled_log.info('Socket disconnected', extra={'sid': request.sid})
+    user_id, went_offline = sessions.remove(request.sid)
+    # Other tabs of the same user keep them online and in their games
+    disconnected_user_id = user_id if went_offline else None
+
+    # Remove from any game SID tracking (only the rooms this socket is in)
+    game_rooms = [room_id for room_id in rooms() if active_game_sids.clear_sid(room_id, request.sid)]
+
     if disconnected_user_id:
-        print(f"User ID {disconnected_user_id} disconnected.")
+        # If user was ready to play, remove them (broadcast with the next lobby delta)
+        lobby.remove(user_id)
+
+        sampled_log.info('User went offline', extra={'user_id': disconnected_user_id})
         notify_friends_online_status(disconnected_user_id, online=False)
-        # Handle game abandonment if user was in an active game
-        active_games = Game.query.filter(
-            ((Game.player_x_id == disconnected_user_id) | (Game.player_o_id == disconnected_user_id)) &
-            (Game.status == 'active')
-        ).all()
-        for game in active_games:
-            if game.player_x_id == disconnected_user_id:
-                game.status = 'finished_o_wins' # Player O wins by forfeit
-                game.winner_id = game.player_o_id
-                if game.player_o_id:
-                    winner_user = User.query.get(game.player_o_id)
-                    winner_user.wins +=1
-            else: # Player O disconnected
-                game.status = 'finished_x_wins' # Player X wins by forfeit
-                game.winner_id = game.player_x_id
-                if game.player_x_id:
-                    winner_user = User.query.get(game.player_x_id)
-                    winner_user.wins +=1
-            db.session.commit()
-            emit('game_update', game.to_dict(), room=game.room_id) # Notify other player in room
-            print(f"Game {game.room_id} ended due to player {disconnected_user_id} disconnect.")
-            if game.room_id in active_game_sids:
-                del active_game_sids[game.room_id]
-
-
-    # Remove from any game SID tracking
-    for room_id, sids in list(active_game_sids.items()):
-        if request.sid in sids.values():
-            # Potentially complex logic if a player disconnects mid-game
-            # For now, just clean up the SID tracking
-            if sids.get('player_x_sid') == request.sid:
-                sids['player_x_sid'] = None
-            if sids.get('player_o_sid') == request.sid:
-                sids['player_o_sid'] = None
-            if not sids.get('player_x_sid') and not sids.get('player_o_sid'):
-                del active_game_sids[room_id] # Clean up room if both left
-            break
+        # Active games are forfeited only if the user is not back within the grace
+        # period, by a batch job (see app/reconnect.py)
+        reconnects.hold(disconnected_user_id, game_rooms)
+        for room_id in game_rooms:
+            emit('opponent_disconnected',
+                 {'room_id': room_id, 'user_id': disconnected_user_id, 'grace_seconds': reconnects.grace},
+                 room=game_audience(room_id))
 
 
 @socketio.on('join_game_room')
+@metrics.instrument('event', 'join_game_room')
 def on_join_game_room(data):
-    # User ID should be derived from an authenticated socket session
-    # For now, assume 'user_id' is passed if not using authenticated socket connections.
-    # Best practice: use JWT to authenticate socket, then get_jwt_identity() or similar.
-    # Let's find user_id from online_users_sids map
-    user_id = None
-    for uid, sid_val in online_users_sids.items():
-        if sid_val == request.sid:
-            user_id = uid
-            break
+    # The user was resolved from their JWT when the socket authenticated
+    user_id = current_user_id()
     
     if not user_id:
         emit('error', {'message': 'User not authenticated or not found for this session.'})
@@ -195,41 +181,43 @@ def on_join_game_room(data):
             game.player_o_id = user_id
             game.status = 'active'
             db.session.commit()
+            public_rooms.remove(game.room_id)
             # emit('player_joined', {'game': game.to_dict(user_id), 'joining_player_id': user_id}) # HTTP join handles this mostly
         else:
             emit('error', {'message': 'You are not a player in this game.'})
             return
+
+    # Active games are served from memory, the row may lag behind the latest moves
+    game = live_games.track(game) or game
             
     join_room(game.room_id) # SocketIO room
-    print(f"User {user_id} (SID: {request.sid}) joined SocketIO room: {game.room_id}")
+    sampled_log.info('Joined game room',
+                     extra={'sid': request.sid, 'user_id': user_id, 'room_id': game.room_id})
 
     # Update active_game_sids
-    if game.room_id not in active_game_sids:
-        active_game_sids[game.room_id] = {'player_x_sid': None, 'player_o_sid': None}
-    
     if game.player_x_id == user_id:
-        active_game_sids[game.room_id]['player_x_sid'] = request.sid
+        active_game_sids.set(game.room_id, 'player_x_sid', request.sid)
     elif game.player_o_id == user_id:
-        active_game_sids[game.room_id]['player_o_sid'] = request.sid
+        active_game_sids.set(game.room_id, 'player_o_sid', request.sid)
+    room_sids = active_game_sids.get(game.room_id)
 
-    emit('game_joined_successfully', {'game': game.to_dict(user_id)}, room=request.sid) # Send to joining client
+    # One username lookup for every payload below (live games carry their own)
+    usernames = load_usernames(game.user_ids()) if isinstance(game, Game) else None
+    emit('game_joined_successfully', {'game': game.to_dict(user_id, usernames)}, room=request.sid) # Send to joining client
     
     # If both players are now connected via socket to the room, and game is active, send update
     if game.status == 'active' and \
-        active_game_sids[game.room_id].get('player_x_sid') and \
-        active_game_sids[game.room_id].get('player_o_sid'):
-        emit('game_update', game.to_dict(), room=game.room_id) # Broadcast full state to both
+        room_sids.get('player_x_sid') and \
+        room_sids.get('player_o_sid'):
+        emit('game_update', game.to_dict(usernames=usernames), room=game_audience(game.room_id)) # Broadcast full state to both
     elif game.status == 'pending' and game.player_x_id == user_id: # Creator joined, waiting for P2
-        emit('game_update', game.to_dict(user_id), room=request.sid)
+        emit('game_update', game.to_dict(user_id, usernames), room=request.sid)
 
 
 @socketio.on('make_move')
+@metrics.instrument('event', 'make_move')
 def on_make_move(data):
-    user_id = None
-    for uid, sid_val in online_users_sids.items():
-        if sid_val == request.sid:
-            user_id = uid
-            break
+    user_id = current_user_id()
     
     if not user_id:
         emit('error', {'message': 'User not authenticated or not found for this session.'})
@@ -242,73 +230,119 @@ def on_make_move(data):
         emit('error', {'message': 'Room ID and move index are required.'})
         return
 
-    game = Game.query.filter_by(room_id=room_id_param).first()
-
-    if not game:
-        emit('error', {'message': 'Game not found.'})
-        return
-    if game.status != 'active':
-        emit('error', {'message': 'Game is not active.'})
-        return
-    if game.current_turn_player_id != user_id:
-        emit('error', {'message': 'Not your turn.'})
+    try:
+        game, winner_symbol = live_games.apply_move(room_id_param, user_id, index)
+    except MoveError as e:
+        message = str(e)
+        if message == 'Game not found.' and Game.query.filter_by(room_id=room_id_param).first():
+            message = 'Game is not active.' # Row exists but the game is not live
+        emit('error', {'message': message})
         return
 
-    board_list = list(game.board)
-    if not (0 <= index < 9 and board_list[index] == ' '):
-        emit('error', {'message': 'Invalid move.'})
-        return
+    announce_move(game, index, user_id, winner_symbol)
 
-    player_symbol = 'X' if game.player_x_id == user_id else 'O'
-    board_list[index] = player_symbol
-    game.board = "".join(board_list)
+    # The bot answers from its precomputed table within the same event
+    if game.is_bot_turn():
+        bot_move = bot.choose_move(game.board, 'O', game.bot_level)
+        game, winner_symbol = live_games.apply_move(game.room_id, game.player_o_id, bot_move)
+        announce_move(game, bot_move, game.player_o_id, winner_symbol)
 
-    winner_symbol = check_win(game.board)
+
+def announce_move(game, index, user_id, winner_symbol):
+    # Only the changed cell and the next turn go out on every move. Clients that
+    # see a gap in `seq` ask for a full snapshot with 'request_game_snapshot'.
+    # Players and spectators get one emit, encoded once for all of them.
+    audience = game_audience(game.room_id)
+    emit('move_applied', game.move_delta(index, game.symbol_for(user_id)), room=audience)
     if winner_symbol:
-        game.winner_id = game.player_x_id if winner_symbol == 'X' else game.player_o_id
-        game.status = f"finished_{winner_symbol.lower()}_wins"
-        
-        winner_user = User.query.get(game.winner_id)
-        if winner_user: # Should always be true
-            winner_user.wins += 1
-        
-        emit('game_over', {'game': game.to_dict(), 'winner': winner_symbol}, room=game.room_id)
-    elif check_draw(game.board):
-        game.status = 'draw'
-        emit('game_over', {'game': game.to_dict(), 'draw': True}, room=game.room_id)
-    else:
-        # Switch turn
-        game.current_turn_player_id = game.player_o_id if game.current_turn_player_id == game.player_x_id else game.player_x_id
-        emit('game_update', game.to_dict(), room=game.room_id)
+        leaderboard.add_win(game.winner_id)
+        emit('game_over', {'game': game.to_dict(), 'winner': winner_symbol}, room=audience)
+    elif game.status == 'draw':
+        emit('game_over', {'game': game.to_dict(), 'draw': True}, room=audience)
 
-    db.session.commit()
-    
-    if game.status not in ['active'] and game.room_id in active_game_sids: # Game ended
-        del active_game_sids[game.room_id]
+    if game.status not in ['active']: # Game ended
+        active_game_sids.discard(game.room_id)
+
+
+@socketio.on('request_game_snapshot')
+@metrics.instrument('event', 'request_game_snapshot')
+def on_request_game_snapshot(data):
+    """Full game state for a client that missed a move_applied event."""
+    user_id = current_user_id()
+    if not user_id:
+        emit('error', {'message': 'User not authenticated or not found for this session.'})
+        return
+
+    room_id_param = data.get('room_id')
+    game = live_games.get_cached(room_id_param) or \
+        Game.query.filter_by(room_id=room_id_param).first()
+    if not game:
+        emit('error', {'message': 'Game not found.'})
+        return
+    emit('game_snapshot', {'game': game.to_dict(user_id)}, room=request.sid)
 
 
 @socketio.on('leave_game_room')
+@metrics.instrument('event', 'leave_game_room')
 def on_leave_game_room(data):
     # User ID logic as above
-    user_id = None
-    for uid, sid_val in online_users_sids.items():
-        if sid_val == request.sid:
-            user_id = uid
-            break
+    user_id = current_user_id()
     if not user_id: return # Silently fail if not authenticated
 
     room_id_param = data.get('room_id')
     if not room_id_param: return
 
     leave_room(room_id_param)
-    print(f"User {user_id} (SID: {request.sid}) left SocketIO room: {room_id_param}")
+    sampled_log.info('Left game room',
+                     extra={'sid': request.sid, 'user_id': user_id, 'room_id': room_id_param})
     
     # Clean up SID from active_game_sids
-    if room_id_param in active_game_sids:
-        sids_in_room = active_game_sids[room_id_param]
-        if sids_in_room.get('player_x_sid') == request.sid:
-            sids_in_room['player_x_sid'] = None
-        if sids_in_room.get('player_o_sid') == request.sid:
-            sids_in_room['player_o_sid'] = None
-        if not sids_in_room.get('player_x_sid') and not sids_in_room.get('player_o_sid'):
-            del active_game_sids[room_id_param] # Clean up room if both left
\ No newline at end of file
+    active_game_sids.clear_sid(room_id_param, request.sid)
+
+
+@socketio.on('spectate_game')
+@metrics.instrument('event', 'spectate_game')
+def on_spectate_game(data):
+    """
+    Read-only view of a game, open to any socket. The snapshot is sent after
+    joining the spectator room, so no move falls in between; moves with a
+    `seq` the snapshot already has can be ignored.
+    """
+    room_id_param = (data or {}).get('room_id')
+    if not room_id_param:
+        emit('error', {'message': 'Room ID is required.'})
+        return
+
+    join_room(spectator_room(room_id_param))
+    snapshot = spectator_snapshots.get(room_id_param)
+    if snapshot is None:
+        leave_room(spectator_room(room_id_param))
+        emit('error', {'message': 'Game not found.'})
+        return
+    emit('spectate_snapshot', snapshot, room=request.sid)
+
+
+@socketio.on('stop_spectating')
+@metrics.instrument('event', 'stop_spectating')
+def on_stop_spectating(data):
+    room_id_param = (data or {}).get('room_id')
+    if room_id_param:
+        leave_room(spectator_room(room_id_param))
+
+
+@socketio.on('subscribe_public_rooms')
+@metrics.instrument('event', 'subscribe_public_rooms')
+def on_subscribe_public_rooms(data=None):
+    """
+    public_rooms_delta events for this socket, after a snapshot of the first
+    page. Also the way to ask for a new snapshot after missing a version.
+    """
+    join_room(public_rooms.ROOM)
+    emit('public_rooms_snapshot', public_rooms.snapshot(current_app.config.get('PUBLIC_ROOMS_PAGE_SIZE', 50)),
+         room=request.sid)
+
+
+@socketio.on('unsubscribe_public_rooms')
+@metrics.instrument('event', 'unsubscribe_public_rooms')
+def on_unsubscribe_public_rooms(data=None):
+    leave_room(public_rooms.ROOM)
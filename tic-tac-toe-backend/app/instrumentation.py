@@ -0,0 +1,253 @@
+"""
+Latency and DB query histograms for Socket.IO events, HTTP routes and
+background tasks, served in the Prometheus text format on GET /metrics.
+
+Socket.IO handlers are wrapped with @metrics.instrument('event', name) and
+background tasks use `with metrics.track('task', name)`. HTTP requests are
+timed by request hooks installed by init_app and labelled with the
+endpoint name. While a handler is timed, SQLAlchemy cursor events add every
+query it runs to that handler's counters (kept on flask.g, so concurrent
+handlers do not mix).
+
+Values are kept per worker process; with several workers, scrape each one.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Blueprint, Response, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; most events finish in well under a millisecond
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+_STATS = '_metrics_query_stats'  # flask.g attribute: [queries, seconds] of the timed handler
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of labels."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}  # {label values: [count per bucket, then +Inf], sum}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            series = [(labels, counts[:], total) for labels, (counts, total) in self._series.items()]
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        bounds = [_format_number(bound) for bound in self.buckets] + ['+Inf']
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}')
+            suffix = _format_labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{suffix} {_format_number(total)}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}  # {label values: count}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Collected:
+    """A gauge or counter read from elsewhere (e.g. LobbyBroadcaster.stats) at scrape time."""
+
+    def __init__(self, name, help_text, kind, read, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.read = read  # () -> value, or {label values: value} when there are labels
+        self.label_names = label_names
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        value = self.read()
+        values = value.items() if self.label_names else [((), value)]
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}')
+        return lines
+
+
+class Metrics:
+    """Per-handler timings and query counts, plus values collected at scrape time."""
+
+    def __init__(self):
+        labels = ('kind', 'handler')  # kind: event, http or task
+        self.seconds = Histogram(
+            'ttt_handler_seconds', 'Time spent in a handler.', labels, LATENCY_BUCKETS)
+        self.db_seconds = Histogram(
+            'ttt_handler_db_seconds', 'Time spent in DB queries per handler call.', labels, LATENCY_BUCKETS)
+        self.db_queries = Histogram(
+            'ttt_handler_db_queries', 'DB queries per handler call.', labels, QUERY_BUCKETS)
+        self.errors = Counter(
+            'ttt_handler_errors_total', 'Handler calls that raised an exception.', labels)
+        self.responses = Counter(
+            'ttt_http_responses_total', 'HTTP responses by endpoint and status code.', ('handler', 'status'))
+        # Filled by the pools of app/database.py
+        self.pool_wait = Histogram(
+            'ttt_db_pool_wait_seconds', 'Time waited for a DB connection from the pool.',
+            ('engine',), POOL_WAIT_BUCKETS)
+        self.pool_connect = Histogram(
+            'ttt_db_connect_seconds', 'Time spent opening new DB connections.',
+            ('engine',), POOL_WAIT_BUCKETS)
+        self.pool_timeouts = Counter(
+            'ttt_db_pool_timeouts_total', 'Checkouts that gave up after pool_timeout.', ('engine',))
+        self._pools = {}  # {engine label: Engine}, see watch_pool()
+        self._collected = [
+            Collected('ttt_db_pool_checked_out', 'DB connections in use.', 'gauge',
+                      lambda: self._pool_stat('checkedout'), ('engine',)),
+            Collected('ttt_db_pool_overflow', 'DB connections open beyond pool_size.', 'gauge',
+                      lambda: self._pool_stat('overflow'), ('engine',)),
+        ]
+        self._listening = False
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.register_blueprint(metrics_bp)
+        if not self._listening:
+            self._listening = True
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def watch_pool(self, label, engine):
+        """Reports the pool usage of `engine` (a QueuePool) under engine=label."""
+        self._pools[label] = getattr(engine, 'sync_engine', engine)
+
+    def _pool_stat(self, stat):
+        return {(label,): getattr(engine.pool, stat)() for label, engine in self._pools.items()
+                if hasattr(engine.pool, stat)}
+
+    def collect(self, name, help_text, read, kind='gauge', label_names=()):
+        """Registers a value read from `read()` on every scrape."""
+        self._collected.append(Collected(name, help_text, kind, read, label_names))
+
+    def _observe(self, kind, name, elapsed, stats):
+        self.seconds.observe(elapsed, kind, name)
+        self.db_queries.observe(stats[0], kind, name)
+        if stats[0]:
+            self.db_seconds.observe(stats[1], kind, name)
+
+    @contextmanager
+    def track(self, kind, name):
+        """Times the block and counts the queries it runs (needs an app context)."""
+        stats = [0, 0.0]
+        outer = g.get(_STATS)
+        setattr(g, _STATS, stats)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors.inc(kind, name)
+            raise
+        finally:
+            self._observe(kind, name, time.perf_counter() - started, stats)
+            setattr(g, _STATS, outer)
+
+    def instrument(self, kind, name):
+        """Decorator form of track()."""
+        def decorator(f):
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.track(kind, name):
+                    return f(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _start_request(self):
+        g._metrics_started = time.perf_counter()
+        setattr(g, _STATS, [0, 0.0])
+
+    def _finish_request(self, response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'  # Endpoints keep the label set bounded
+            self._observe('http', endpoint, time.perf_counter() - started, g.get(_STATS))
+            self.responses.inc(endpoint, str(response.status_code))
+            if response.status_code >= 500:
+                self.errors.inc('http', endpoint)
+        return response
+
+    def render(self):
+        lines = []
+        for metric in (self.seconds, self.db_seconds, self.db_queries, self.errors, self.responses,
+                       self.pool_wait, self.pool_connect, self.pool_timeouts, *self._collected):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and g.get(_STATS) is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    stats = g.get(_STATS) if has_app_context() else None
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    from . import metrics
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
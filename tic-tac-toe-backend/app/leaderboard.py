@@ -0,0 +1,75 @@
+import threading
+
+from .models import db, User
+
+
+class Leaderboard:
+    """
+    Users ranked by wins, kept as a sorted set in the state store:
+        leaderboard:wins   sorted set  {user_id: wins}
+        leaderboard:names  hash        {user_id: username}
+    Wins are added as games finish, so reads never touch the `user` table.
+    Rank lookups and pages cost O(log n) (a binary search in memory, a
+    skiplist walk in Redis). The set is rebuilt from the DB the first time
+    it is used if the store holds no ranking yet. The bot is not ranked.
+    """
+
+    WINS = 'leaderboard:wins'
+    NAMES = 'leaderboard:names'
+
+    def __init__(self, store):
+        self._store = store
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if not self._store.zcard(self.WINS):
+                self.rebuild()
+            self._loaded = True
+
+    def rebuild(self):
+        """Reloads every user's wins from the DB."""
+        rows = db.session.query(User.id, User.username, User.wins).filter(User.is_bot.is_(False)).all()
+        self._store.delete(self.WINS)
+        self._store.delete(self.NAMES)
+        self._store.zadd(self.WINS, {str(uid): wins or 0 for uid, _, wins in rows})
+        self._store.hsetmany(self.NAMES, {str(uid): username for uid, username, _ in rows})
+        return len(rows)
+
+    def add_user(self, user_id, username):
+        self._ensure_loaded()
+        self._store.hset(self.NAMES, str(user_id), username)
+        self._store.zadd(self.WINS, {str(user_id): 0})
+
+    def add_win(self, user_id, count=1):
+        """Mirrors a `wins += count` on the user row."""
+        if not user_id:
+            return
+        self._ensure_loaded()
+        # Only users added at registration or rebuild are ranked (not the bot)
+        if self._store.zscore(self.WINS, str(user_id)) is not None:
+            self._store.zincrby(self.WINS, count, str(user_id))
+
+    def page(self, offset=0, limit=10):
+        """Returns [{"rank", "username", "wins"}] ordered by wins."""
+        self._ensure_loaded()
+        entries = self._store.zrevrange(self.WINS, offset, offset + limit - 1)
+        names = self._store.hmget(self.NAMES, [member for member, _ in entries])
+        return [{
+            "rank": offset + i + 1,
+            "username": username,
+            "wins": int(wins)
+        } for i, ((member, wins), username) in enumerate(zip(entries, names))]
+
+    def rank(self, user_id):
+        """Returns (rank, wins) for a user, rank starting at 1, or (None, None)."""
+        self._ensure_loaded()
+        position = self._store.zrevrank(self.WINS, str(user_id))
+        if position is None:
+            return None, None
+        return position + 1, int(self._store.zscore(self.WINS, str(user_id)))
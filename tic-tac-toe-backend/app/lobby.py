@@ -0,0 +1,100 @@
+import json
+import threading
+
+
+class LobbyBroadcaster:
+    """
+    Keeps ready_to_play_users and tells the 'lobby' room about changes.
+
+    Changes made within LOBBY_BROADCAST_WINDOW seconds are coalesced into one
+    'available_players_delta' event ({version, added, removed}). Clients apply
+    deltas in version order and ask for an 'available_players_snapshot'
+    (see snapshot()) on join or when they notice a gap.
+    """
+
+    ROOM = 'lobby'
+    VERSION_KEY = 'lobby:meta'
+
+    def __init__(self, players, store):
+        self._players = players  # {user_id: username}, shared
+        self._store = store
+        self._pending = {}  # {user_id: username, or None if removed}
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self._window = 0.25
+        self.stats = {'deltas': 0, 'snapshots': 0, 'delta_bytes': 0, 'snapshot_bytes': 0}
+
+    def init_app(self, app):
+        self._window = app.config.get('LOBBY_BROADCAST_WINDOW', 0.25)
+
+    def __contains__(self, user_id):
+        return user_id in self._players
+
+    def add(self, user_id, username):
+        user_id = int(user_id)
+        self._players[user_id] = username
+        self._queue(user_id, username)
+
+    def remove(self, user_id):
+        """Removes a ready player. Returns False if they were not in the lobby."""
+        user_id = int(user_id)
+        try:
+            del self._players[user_id]
+        except KeyError:
+            return False
+        self._queue(user_id, None)
+        return True
+
+    def players(self, exclude_user_id=None):
+        """Returns [{"id", "username"}] of ready players."""
+        exclude_user_id = int(exclude_user_id) if exclude_user_id is not None else None
+        return [{"id": uid, "username": uname}
+                for uid, uname in self._players.items() if uid != exclude_user_id]
+
+    def version(self):
+        return int(self._store.hget(self.VERSION_KEY, 'version') or 0)
+
+    def snapshot(self):
+        payload = {'version': self.version(), 'players': self.players()}
+        self._count('snapshot', payload)
+        return payload
+
+    def _queue(self, user_id, username):
+        from . import socketio
+        with self._lock:
+            self._pending[user_id] = username
+            if self._scheduled:
+                return
+            self._scheduled = True
+        socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        from . import socketio
+        socketio.sleep(self._window)
+        self.flush()
+
+    def flush(self):
+        """Emits the changes queued since the last flush as one delta."""
+        from . import socketio
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._scheduled = False
+        if not pending:
+            return None
+        payload = {
+            # Shared counter so deltas from every worker are ordered
+            'version': self._store.hincrby(self.VERSION_KEY, 'version', 1),
+            'added': [{"id": uid, "username": uname}
+                      for uid, uname in pending.items() if uname is not None],
+            'removed': [uid for uid, uname in pending.items() if uname is None],
+        }
+        self._count('delta', payload)
+        socketio.emit('available_players_delta', payload, room=self.ROOM)
+        return payload
+
+    def _count(self, kind, payload):
+        size = len(json.dumps(payload, separators=(',', ':')))
+        with self._lock:
+            self.stats[kind + 's'] += 1
+            self.stats[kind + '_bytes'] += size
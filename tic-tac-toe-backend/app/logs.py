@@ -0,0 +1,62 @@
+"""
+Structured logging for the `app` package: one JSON object per line, with any
+`extra={...}` fields of the call as keys.
+
+Per-connection messages (connect, join, leave, disconnect) go through a
+SampledLogger; only a LOG_SAMPLE_RATE fraction of those are written, so a
+busy server does not spend its time on log I/O. The others are dropped
+before a LogRecord is built. Warnings and errors are never sampled.
+"""
+import json
+import logging
+import random
+import sys
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """`logger` keeping only a `rate` fraction of its messages below WARNING."""
+
+    rate = 1.0  # Set from LOG_SAMPLE_RATE by configure_logging()
+
+    def __init__(self, logger):
+        super().__init__(logger, None)
+
+    def log(self, level, msg, *args, **kwargs):
+        # Decided before LoggerAdapter.log, so a dropped message costs no LogRecord
+        if level < logging.WARNING and self.rate < 1 and random.random() >= self.rate:
+            return
+        super().log(level, msg, *args, **kwargs)
+
+    def process(self, msg, kwargs):
+        return msg, kwargs  # Keep the call's `extra`
+
+
+def configure_logging(app):
+    logger = logging.getLogger('app')
+    logger.setLevel(app.config.get('LOG_LEVEL', 'INFO').upper())
+    SampledLogger.rate = app.config.get('LOG_SAMPLE_RATE', 1.0)
+    if any(isinstance(h.formatter, StructuredFormatter) for h in logger.handlers):
+        return  # Already set up by an earlier create_app()
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter())
+    logger.addHandler(handler)
+    logger.propagate = False
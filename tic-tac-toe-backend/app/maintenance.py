@@ -0,0 +1,152 @@
+"""
+Background clean-up of the `game` table, which the game handlers read on
+every call.
+
+Every MAINTENANCE_INTERVAL seconds one pass:
+  - deletes pending rooms older than PENDING_ROOM_TTL seconds that nobody
+    joined, and takes them off the public room index;
+  - moves games finished more than ARCHIVE_AFTER seconds ago (by creation
+    time) to `game_archive`, and their moves to `game_move_archive`.
+Both work through MAINTENANCE_CHUNK rows at a time: pick the ids, copy with
+INSERT ... SELECT, delete by id, commit. Each transaction covers one chunk,
+so no lock is held for long and the game handlers get in between chunks.
+Rows per action and the time of each pass are reported on /metrics.
+
+The loop starts with the first HTTP request of a serving process; the
+`maintain` CLI command runs a single pass, e.g. from cron.
+
+    flask --app run.py maintain
+"""
+import datetime
+import logging
+import threading
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, literal, select
+
+from .models import db, Game, GameMove, ArchivedGame, ArchivedGameMove
+from .export import FINISHED_STATUSES
+
+log = logging.getLogger(__name__)
+
+# Columns copied from `game` to `game_archive`
+ARCHIVED_COLUMNS = ('id', 'room_id', 'player_x_id', 'player_o_id', 'board', 'size', 'win_length',
+                    'current_turn_player_id', 'status', 'is_public', 'winner_id', 'created_at', 'bot_level')
+
+
+class Maintenance:
+    def __init__(self):
+        self._app = None
+        self._interval = 300
+        self._pending_ttl = 3600
+        self._archive_after = 86400
+        self._chunk = 500
+        self._started = False
+        self._lock = threading.Lock()
+        self.stats = {'expired': 0, 'archived': 0, 'passes': 0, 'last_pass_seconds': 0.0}
+
+    def init_app(self, app):
+        self._app = app
+        self._interval = app.config.get('MAINTENANCE_INTERVAL', 300)
+        self._pending_ttl = app.config.get('PENDING_ROOM_TTL', 3600)
+        self._archive_after = app.config.get('ARCHIVE_AFTER', 86400)
+        self._chunk = app.config.get('MAINTENANCE_CHUNK', 500)
+        if self._interval:
+            # Not at startup, so CLI commands (e.g. `flask db upgrade`) never run a pass
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            from . import socketio
+            socketio.start_background_task(self._run)
+
+    def _run(self):
+        from . import socketio
+        while True:
+            socketio.sleep(self._interval)
+            try:
+                with self._app.app_context():
+                    self.run_pass()
+            except Exception:
+                log.exception('Maintenance pass failed')
+
+    def run_pass(self, now=None):
+        """Expires old pending rooms and archives old finished games. Returns (expired, archived)."""
+        from . import metrics
+        now = now or datetime.datetime.utcnow()
+        started = time.perf_counter()
+        with metrics.track('task', 'maintenance'):
+            expired = self._chunked(self._expire_chunk, now - datetime.timedelta(seconds=self._pending_ttl))
+            archived = self._chunked(self._archive_chunk, now - datetime.timedelta(seconds=self._archive_after))
+        elapsed = time.perf_counter() - started
+        self.stats['expired'] += expired
+        self.stats['archived'] += archived
+        self.stats['passes'] += 1
+        self.stats['last_pass_seconds'] = elapsed
+        log.info('Maintenance pass done',
+                 extra={'expired': expired, 'archived': archived, 'seconds': round(elapsed, 3)})
+        return expired, archived
+
+    def _chunked(self, step, cutoff):
+        from . import socketio
+        total = 0
+        while True:
+            picked, count = step(cutoff)
+            total += count
+            if picked < self._chunk:
+                return total
+            socketio.sleep(0)  # Let handlers run between chunks
+
+    def _chunk_ids(self, statuses, cutoff, *columns):
+        return db.session.execute(
+            select(Game.id, *columns)
+            .where(Game.status.in_(statuses), Game.created_at < cutoff)
+            .order_by(Game.id).limit(self._chunk)).all()
+
+    def _expire_chunk(self, cutoff):
+        """(rows picked, rows deleted) for one chunk of old pending rooms."""
+        from . import public_rooms
+        rows = self._chunk_ids(['pending'], cutoff, Game.room_id)
+        deleted = 0
+        if rows:
+            # Re-checks the status, a room may have been joined since it was picked
+            deleted = db.session.execute(
+                delete(Game).where(Game.id.in_([id for id, _ in rows]), Game.status == 'pending')).rowcount
+        db.session.commit()
+        # Joined rooms already left the index, removing them again is a no-op
+        public_rooms.remove(*(room_id for _, room_id in rows))
+        return len(rows), deleted
+
+    def _archive_chunk(self, cutoff):
+        """(rows picked, rows archived) for one chunk of old finished games."""
+        ids = [id for id, in self._chunk_ids(FINISHED_STATUSES, cutoff)]
+        archived = 0
+        if ids:
+            columns = [getattr(Game, name) for name in ARCHIVED_COLUMNS]
+            db.session.execute(insert(ArchivedGame).from_select(
+                ARCHIVED_COLUMNS + ('archived_at',),
+                select(*columns, literal(datetime.datetime.utcnow())).where(Game.id.in_(ids))))
+            db.session.execute(insert(ArchivedGameMove).from_select(
+                ('game_id', 'ply', 'cell'),
+                select(GameMove.game_id, GameMove.ply, GameMove.cell).where(GameMove.game_id.in_(ids))))
+            db.session.execute(delete(GameMove).where(GameMove.game_id.in_(ids)))
+            archived = db.session.execute(delete(Game).where(Game.id.in_(ids))).rowcount
+        db.session.commit()
+        return len(ids), archived
+
+
+@click.command('maintain')
+@with_appcontext
+def maintain_command():
+    """Expire stale pending rooms and archive old finished games once."""
+    from . import maintenance
+    expired, archived = maintenance.run_pass()
+    click.echo(f'Expired {expired} pending rooms, archived {archived} games '
+               f'in {maintenance.stats["last_pass_seconds"]:.2f}s.')
@@ -0,0 +1,215 @@
+import json
+import logging
+import threading
+import time
+
+from .models import db, Game
+from .sessions import user_room
+from .utils import generate_room_code
+
+log = logging.getLogger(__name__)
+
+
+class Matchmaker:
+    """
+    Automatic matchmaking for /api/play/queue.
+
+    Enqueueing is a single write to the `matchmaking:queue` hash in the state
+    store. Every MATCHMAKING_TICK seconds the whole queue is claimed and
+    paired in one batch: players are grouped into bands of
+    MATCHMAKING_BAND wins (0 disables banding) and paired by closest wins
+    within a band. Anyone who has waited MATCHMAKING_MAX_WAIT seconds can be
+    paired across bands, which bounds the time to match. All games of a tick
+    are inserted in one batched INSERT and both players are notified on
+    their personal socket room.
+
+    Claimed entries sit in `matchmaking:claimed` while a tick pairs them.
+    Cancelling one of them leaves a tombstone in `matchmaking:cancelled`,
+    and re-enqueueing puts a fresh entry in the queue; either way the tick
+    drops the claimed entry before creating games, and its partner waits for
+    the next tick. Leftovers only go back if the user has no fresh entry.
+    Paired users stay claimed until their games are committed; if that fails
+    they go back to the queue the same way. Claims, cancels, enqueues and
+    those checks share one store lock.
+    """
+
+    QUEUE = 'matchmaking:queue'
+    CLAIMED = 'matchmaking:claimed'
+    CANCELLED = 'matchmaking:cancelled'
+    LOCK = 'matchmaking'
+
+    def __init__(self, store):
+        self._store = store
+        self._app = None
+        self._tick = 0.2
+        self._band = 0
+        self._max_wait = 10.0
+        self._started = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self._tick = app.config.get('MATCHMAKING_TICK', 0.2)
+        self._band = app.config.get('MATCHMAKING_BAND', 0)
+        self._max_wait = app.config.get('MATCHMAKING_MAX_WAIT', 10.0)
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            from . import socketio
+            socketio.start_background_task(self._run)
+
+    def enqueue(self, user_id, username, wins):
+        self._ensure_started()
+        entry = {'username': username, 'wins': wins or 0, 'queued_at': time.time()}
+        with self._store.lock(self.LOCK):
+            self._store.hset(self.QUEUE, str(int(user_id)), json.dumps(entry))
+
+    def cancel(self, user_id):
+        """Removes a user from the queue. Returns False if they were not queued."""
+        user_id = str(int(user_id))
+        with self._store.lock(self.LOCK):
+            if self._store.hdel(self.QUEUE, user_id):
+                return True
+            # Claimed by a tick in progress, which drops it before pairing
+            if self._store.hexists(self.CLAIMED, user_id):
+                self._store.sadd(self.CANCELLED, user_id)
+                return True
+            return False
+
+    def __contains__(self, user_id):
+        user_id = str(int(user_id))
+        return self._store.hexists(self.QUEUE, user_id) or \
+            (self._store.hexists(self.CLAIMED, user_id) and user_id not in self._store.smembers(self.CANCELLED))
+
+    def _run(self):
+        from . import socketio, metrics
+        while True:
+            socketio.sleep(self._tick)
+            try:
+                with self._app.app_context(), metrics.track('task', 'matchmaking_tick'):
+                    self.tick()
+            except Exception:
+                log.exception('Matchmaking tick failed')
+
+    def tick(self):
+        """Pairs everyone currently queued. Returns the number of games created."""
+        with self._store.lock(self.LOCK):
+            queued = self._store.hpopall(self.QUEUE)
+            self._store.hsetmany(self.CLAIMED, queued)
+        if not queued:
+            return 0
+
+        pairs, leftovers = self.pair(
+            [(int(uid), json.loads(entry)) for uid, entry in queued.items()], time.time())
+        pairs = self._settle(list(queued), pairs, leftovers)
+        if not pairs:
+            return 0
+        paired = [str(user_id) for pair in pairs for user_id, _ in pair]
+        try:
+            self._start_games(pairs)
+        except Exception:
+            db.session.rollback()
+            self._settle(paired, [], [item for pair in pairs for item in pair])
+            raise
+        self._settle(paired, [], [])
+        return len(pairs)
+
+    def pair(self, entries, now):
+        """
+        Splits [(user_id, entry)] into pairs and leftovers. Entries that waited
+        past the max wait go into one shared bucket.
+        """
+        buckets = {}
+        for user_id, entry in entries:
+            overdue = not self._band or now - entry['queued_at'] >= self._max_wait
+            key = None if overdue else entry['wins'] // self._band
+            buckets.setdefault(key, []).append((user_id, entry))
+
+        pairs, leftovers = [], []
+        for key, group in buckets.items():
+            group.sort(key=lambda item: item[1]['wins'])
+            for i in range(0, len(group) - 1, 2):
+                pairs.append((group[i], group[i + 1]))
+            if len(group) % 2:
+                leftovers.append((key, group[-1]))
+
+        # An overdue player left over may take any other leftover
+        overdue = [item for key, item in leftovers if key is None]
+        waiting = [item for key, item in leftovers if key is not None]
+        if overdue and waiting:
+            waiting.sort(key=lambda item: abs(item[1]['wins'] - overdue[0][1]['wins']))
+            pairs.append((overdue.pop(), waiting.pop(0)))
+        return pairs, overdue + waiting
+
+    def _settle(self, user_ids, pairs, leftovers):
+        """
+        Releases the claim on user_ids, except for the users of the returned
+        pairs: `pairs` without users who cancelled or re-enqueued meanwhile.
+        Their partners and the leftovers go back to the queue unless they have
+        a fresh entry.
+        """
+        with self._store.lock(self.LOCK):
+            cancelled = self._store.smembers(self.CANCELLED) & set(user_ids)
+            if cancelled:
+                self._store.srem(self.CANCELLED, *cancelled)
+            fresh = {uid for uid, entry in zip(user_ids, self._store.hmget(self.QUEUE, user_ids)) if entry}
+            gone = {int(uid) for uid in cancelled | fresh}
+
+            kept = []
+            for pair in pairs:
+                if gone.isdisjoint(user_id for user_id, _ in pair):
+                    kept.append(pair)
+                else:
+                    leftovers.extend(item for item in pair if item[0] not in gone)
+            requeue = {str(uid): json.dumps(entry) for uid, entry in leftovers if uid not in gone}
+            self._store.hsetmany(self.QUEUE, requeue)
+            still_claimed = {str(uid) for pair in kept for uid, _ in pair}
+            released = [uid for uid in user_ids if uid not in still_claimed]
+            if released:
+                self._store.hdel(self.CLAIMED, *released)
+        return kept
+
+    def _start_games(self, pairs):
+        from . import socketio
+
+        room_ids = self._unique_room_codes(len(pairs))
+        games = []
+        for room_id, ((x_id, _), (o_id, _)) in zip(room_ids, pairs):
+            games.append(Game(
+                room_id=room_id,
+                player_x_id=x_id,
+                player_o_id=o_id,
+                current_turn_player_id=x_id,  # Player X starts
+                is_public=False,
+                status='active'))
+        db.session.add_all(games)
+        db.session.flush()  # One batched INSERT; ids come back with RETURNING
+
+        # Serialize before commit expires the rows, which would reload each one
+        notifications = []
+        for game, ((x_id, x_entry), (o_id, o_entry)) in zip(games, pairs):
+            usernames = {x_id: x_entry['username'], o_id: o_entry['username']}
+            for user_id in (x_id, o_id):
+                notifications.append((user_id, {
+                    "msg": "Match found!",
+                    "game_details": game.to_dict(current_user_id=user_id, usernames=usernames)
+                }))
+        db.session.commit()
+
+        for user_id, payload in notifications:
+            socketio.emit('match_found', payload, room=user_room(user_id))
+
+    @staticmethod
+    def _unique_room_codes(count):
+        codes = set()
+        while len(codes) < count:
+            candidates = {generate_room_code() for _ in range(count - len(codes))} - codes
+            taken = {room_id for (room_id,) in db.session.query(Game.room_id).filter(
+                Game.room_id.in_(candidates))}
+            codes |= candidates - taken
+        return list(codes)
@@ -8,7 +8,8 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
-    wins = db.Column(db.Integer, default=0)
+    wins = db.Column(db.Integer, default=0, index=True)
+    is_bot = db.Column(db.Boolean, default=False, nullable=False) # The computer opponent, see bot.py
     
     # Relationships for friendships
     # 'friends' relationship will list users who are friends with this user
@@ -47,7 +48,12 @@ class Friendship(db.Model):
     addressee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # User who received the request
     status = db.Column(db.String(20), default='pending') # 'pending', 'accepted', 'declined'
     # Ensure a pair can only have one pending/accepted request in one direction
-    __table_args__ = (db.UniqueConstraint('requester_id', 'addressee_id', name='unique_friend_request'),)
+    __table_args__ = (
+        db.UniqueConstraint('requester_id', 'addressee_id', name='unique_friend_request'),
+        # Cover both sides of the friend list UNION (see accepted_friends_query)
+        db.Index('ix_friendship_requester_status', 'requester_id', 'status', 'addressee_id'),
+        db.Index('ix_friendship_addressee_status', 'addressee_id', 'status', 'requester_id'),
+    )
 
     requester = db.relationship('User', foreign_keys=[requester_id], backref='sent_friend_requests')
     addressee = db.relationship('User', foreign_keys=[addressee_id], backref='received_friend_requests')
@@ -59,9 +65,11 @@ class Game(db.Model):
     player_x_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     player_o_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     
-    # Board state: 9 characters, e.g., "         " for empty, "X O X O  "
+    # Board state: size*size characters row by row, e.g., "X O X O  " on 3x3
     # ' ' for empty, 'X' for player X, 'O' for player O
-    board = db.Column(db.String(9), default=' ' * 9) 
+    board = db.Column(db.String(400), default=' ' * 9) 
+    size = db.Column(db.SmallInteger, default=3, nullable=False) # Board is size x size
+    win_length = db.Column(db.SmallInteger, default=3, nullable=False) # Marks in a row needed to win
     current_turn_player_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Whose turn is it
     
     # 'pending', 'active', 'finished_x_wins', 'finished_o_wins', 'draw'
@@ -69,20 +77,44 @@ class Game(db.Model):
     is_public = db.Column(db.Boolean, default=True)
     winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    bot_level = db.Column(db.String(10), nullable=True) # Set for games against the bot (player O)
+    # Time control of active games (see LiveGame.start_turn), so a reloaded game
+    # resumes its clocks: when the current turn started (Unix time) and each
+    # player's game clock in seconds, as of that moment
+    turn_started_at = db.Column(db.Float, nullable=True)
+    time_left_x = db.Column(db.Float, nullable=True)
+    time_left_o = db.Column(db.Float, nullable=True)
 
     player_x = db.relationship('User', foreign_keys=[player_x_id], backref='games_as_x')
     player_o = db.relationship('User', foreign_keys=[player_o_id], backref='games_as_o')
     current_turn_player = db.relationship('User', foreign_keys=[current_turn_player_id])
     winner = db.relationship('User', foreign_keys=[winner_id])
 
+    __table_args__ = (
+        # Old pending rooms and finished games, for the maintenance job (maintenance.py)
+        db.Index('ix_game_status_created_at', 'status', 'created_at'),
+        # Public rooms waiting for a player by age, for PublicRoomIndex.rebuild();
+        # partial where supported, so it only holds the few rows the listing reads
+        db.Index('ix_game_public_pending', 'is_public', 'status', 'created_at',
+                 postgresql_where=db.text("is_public AND status = 'pending'"),
+                 sqlite_where=db.text("is_public = 1 AND status = 'pending'")),
+        # Ids are kept in game_archive, so SQLite must never hand out an archived game's id again
+        {'sqlite_autoincrement': True},
+    )
+
     def __repr__(self):
         return f'<Game {self.room_id}>'
 
-    def to_dict(self, current_user_id=None):
-        player_x_username = User.query.get(self.player_x_id).username if self.player_x_id else None
-        player_o_username = User.query.get(self.player_o_id).username if self.player_o_id else None
-        current_turn_username = User.query.get(self.current_turn_player_id).username if self.current_turn_player_id else None
-        
+    def user_ids(self):
+        """Ids of every user referenced by this game."""
+        return {uid for uid in (self.player_x_id, self.player_o_id,
+                                self.current_turn_player_id, self.winner_id) if uid}
+
+    def to_dict(self, current_user_id=None, usernames=None):
+        # usernames: {user_id: username}, see load_usernames()/serialize_games()
+        if usernames is None:
+            usernames = load_usernames(self.user_ids())
+
         # Determine player symbol for the current user if in game
         player_symbol = None
         if current_user_id:
@@ -95,16 +127,115 @@ class Game(db.Model):
             'id': self.id,
             'room_id': self.room_id,
             'player_x_id': self.player_x_id,
-            'player_x_username': player_x_username,
+            'player_x_username': usernames.get(self.player_x_id),
             'player_o_id': self.player_o_id,
-            'player_o_username': player_o_username,
+            'player_o_username': usernames.get(self.player_o_id),
             'board': list(self.board), # send as array for easier frontend use
+            'size': self.size,
+            'win_length': self.win_length,
             'current_turn_player_id': self.current_turn_player_id,
-            'current_turn_username': current_turn_username,
+            'current_turn_username': usernames.get(self.current_turn_player_id),
             'current_player_symbol': player_symbol, # X or O for the requesting user
             'status': self.status,
             'is_public': self.is_public,
             'winner_id': self.winner_id,
-            'winner_username': User.query.get(self.winner_id).username if self.winner_id else None,
-            'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+            'winner_username': usernames.get(self.winner_id),
+            'bot_level': self.bot_level,
+            'created_at': self.created_at.isoformat(),
+            'seq': len(self.board) - self.board.count(' '), # Moves played, see move_applied
+            # Clocks only run while the game is live, see LiveGame.clock_state()
+            'turn_deadline': None,
+            'time_left': None
+        }
+
+
+class GameMove(db.Model):
+    """
+    Append-only move log, one row per move in play order. Player X always
+    moves first, so odd plies are X's and even plies are O's.
+    """
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), primary_key=True)
+    ply = db.Column(db.SmallInteger, primary_key=True) # 1 for the first move
+    cell = db.Column(db.SmallInteger, nullable=False) # Board index, 0 to size*size - 1
+
+    def to_dict(self):
+        return move_dict(self.ply, self.cell)
+
+
+class ArchivedGame(db.Model):
+    """
+    Finished game moved out of the `game` table by the maintenance job, with
+    the id it had there. Room codes are free for reuse once archived.
+    """
+    __tablename__ = 'game_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    room_id = db.Column(db.String(10), nullable=False, index=True)
+    player_x_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    player_o_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    board = db.Column(db.String(400), nullable=False)
+    size = db.Column(db.SmallInteger, nullable=False)
+    win_length = db.Column(db.SmallInteger, nullable=False)
+    current_turn_player_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    status = db.Column(db.String(30), nullable=False)
+    is_public = db.Column(db.Boolean)
+    winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime)
+    bot_level = db.Column(db.String(10), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    # Same payloads as live rows
+    user_ids = Game.user_ids
+    to_dict = Game.to_dict
+
+    def __repr__(self):
+        return f'<ArchivedGame {self.room_id}>'
+
+
+class ArchivedGameMove(db.Model):
+    """Move log of archived games, moved along with them."""
+    __tablename__ = 'game_move_archive'
+    game_id = db.Column(db.Integer, db.ForeignKey('game_archive.id'), primary_key=True)
+    ply = db.Column(db.SmallInteger, primary_key=True)
+    cell = db.Column(db.SmallInteger, nullable=False)
+
+    to_dict = GameMove.to_dict
+
+
+def move_dict(ply, cell):
+    return {'ply': ply, 'cell': cell, 'symbol': 'X' if ply % 2 else 'O'}
+
+
+def load_usernames(user_ids):
+    """Returns {user_id: username} for the given ids using a single IN query."""
+    user_ids = {uid for uid in user_ids if uid}
+    if not user_ids:
+        return {}
+    return dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all())
+
+
+def _accepted_friend_ids(user_id):
+    # Both request directions are read in one UNION, each side served by its own index
+    sent = db.select(Friendship.addressee_id.label('friend_id'))\
+        .where(Friendship.requester_id == user_id, Friendship.status == 'accepted')
+    received = db.select(Friendship.requester_id.label('friend_id'))\
+        .where(Friendship.addressee_id == user_id, Friendship.status == 'accepted')
+    return db.union(sent, received).subquery()
+
+
+def accepted_friends_query(user_id):
+    """Query for (id, username) of a user's accepted friends."""
+    friend_ids = _accepted_friend_ids(user_id)
+    return db.session.query(User.id, User.username)\
+        .join(friend_ids, User.id == friend_ids.c.friend_id)
+
+
+def accepted_friends_select(user_id):
+    """accepted_friends_query() as a select(), for the async DB session."""
+    friend_ids = _accepted_friend_ids(user_id)
+    return db.select(User.id, User.username).join(friend_ids, User.id == friend_ids.c.friend_id)
+
+
+def serialize_games(games, current_user_id=None):
+    """Serializes a list of games with one query for all referenced users."""
+    usernames = load_usernames(uid for game in games for uid in game.user_ids())
+    return [game.to_dict(current_user_id, usernames) for game in games]
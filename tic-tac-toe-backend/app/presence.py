@@ -0,0 +1,105 @@
+import uuid
+
+from .models import accepted_friends_query
+from .sessions import user_room
+
+
+class PresenceService:
+    """
+    Friend presence for online users.
+
+    Each online user's accepted friends are cached in the state store as
+    presence:friends:<user_id> {friend_id: username}, loaded with one query
+    the first time the user connects. friend_routes invalidates the cache
+    when a request is accepted or declined. A presence change is sent to
+    all online friends with a single emit addressed to their personal rooms.
+
+    presence:versions {user_id: n} counts changes to each user's friend list
+    payload (friends accepted, or a friend coming online or going offline),
+    so GET /friends can answer If-None-Match without building the list.
+    """
+
+    SELF = '__self__'  # The user's own username; also marks users without friends
+    VERSIONS = 'presence:versions'
+    EPOCH = '__epoch__'  # Set when the versions start, so a reset store never repeats one
+
+    def __init__(self, store, sessions):
+        self._store = store
+        self._sessions = sessions
+
+    @staticmethod
+    def _key(user_id):
+        return f'presence:friends:{int(user_id)}'
+
+    def friends(self, user_id, username=None):
+        """Returns {friend_id: username} of accepted friends, cached."""
+        cached = self.cached_friends(user_id)
+        if cached is not None:
+            return cached
+
+        friends = dict(accepted_friends_query(int(user_id)).all())
+        self.remember(user_id, username, friends)
+        return friends
+
+    def remember(self, user_id, username, friends):
+        """Caches {friend_id: username} loaded elsewhere (e.g. by the async server)."""
+        mapping = {str(fid): name for fid, name in friends.items()}
+        mapping[self.SELF] = username or ''
+        self._store.hsetmany(self._key(user_id), mapping)
+
+    def cached_friends(self, user_id):
+        """Like friends(), but returns None instead of querying on a miss."""
+        cached = self._store.hgetall(self._key(user_id))
+        if not cached:
+            return None
+        cached.pop(self.SELF, None)
+        return {int(fid): name for fid, name in cached.items()}
+
+    def username(self, user_id):
+        """Cached username of an online user, or None."""
+        return self._store.hget(self._key(user_id), self.SELF) or None
+
+    def friend_list(self, user_id):
+        """Friend list payload with online flags, as sent in 'friend_list_update'."""
+        return [{
+            "id": friend_id,
+            "username": username,
+            "online": friend_id in self._sessions
+        } for friend_id, username in self.friends(user_id).items()]
+
+    def invalidate(self, *user_ids):
+        for user_id in user_ids:
+            self._store.delete(self._key(user_id))
+
+    def friends_changed(self, *user_ids):
+        """Drops the cached friends of users whose friend list changed, and bumps their versions."""
+        self.invalidate(*user_ids)
+        self._bump(user_ids)
+
+    def _bump(self, user_ids):
+        for user_id in user_ids:
+            self._store.hincrby(self.VERSIONS, str(int(user_id)), 1)
+
+    def list_version(self, user_id):
+        """Token that changes whenever the friend list payload of user_id may have changed."""
+        epoch, version = self._store.hmget(self.VERSIONS, [self.EPOCH, str(int(user_id))])
+        if epoch is None:
+            epoch = uuid.uuid4().hex[:8]
+            self._store.hset(self.VERSIONS, self.EPOCH, epoch)
+        return f'{epoch}.{version or 0}'
+
+    def announce(self, user_id, username, online):
+        """Tells every online friend of user_id about their new status in one emit."""
+        from . import socketio
+        friends = self.friends(user_id, username)
+        self._bump(friends)  # Their lists show this user's online flag
+        rooms = [user_room(friend_id) for friend_id in friends if friend_id in self._sessions]
+        if rooms:
+            socketio.emit('friend_status_update', {
+                'user_id': int(user_id),
+                'username': username,
+                'online': online
+            }, to=rooms)
+        if not online:
+            self.invalidate(user_id)  # Only online users keep a cached entry
+        return len(rooms)
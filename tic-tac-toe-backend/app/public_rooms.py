@@ -0,0 +1,183 @@
+import datetime
+import json
+import threading
+
+from .models import Game, serialize_games
+from .spectators import Encoded
+
+
+def cursor_score(created_at):
+    """Sort key of a room: its created_at (naive UTC) as Unix time."""
+    return created_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def score_created_at(score):
+    """Inverse of cursor_score(), as the ISO 8601 string clients send back."""
+    return datetime.datetime.fromtimestamp(score, datetime.timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class PublicRoomIndex:
+    """
+    Public rooms waiting for a second player, kept in the state store so
+    /api/rooms/public never touches the `game` table:
+        rooms:public        hash        {room_id: room as JSON}
+        rooms:public:order  sorted set  {room_id: created_at as Unix time}
+        rooms:public:meta   hash        {loaded, version}
+    create_room adds rooms; the HTTP and socket joins and the maintenance job
+    remove them. The index is loaded from the DB (one query on the partial
+    index ix_game_public_pending) the first time it is used if the store does
+    not hold it yet. Pages are walked from a (created_at, room_id) cursor
+    (keyset pagination; rooms created in the same microsecond are ordered by
+    room_id) and the stored JSON is sent as-is.
+
+    Changes made within LOBBY_BROADCAST_WINDOW seconds are sent to the
+    'public_rooms' room as one 'public_rooms_delta' event ({version, added,
+    removed}), like the lobby's ready players (see LobbyBroadcaster).
+    Subscribers get a 'public_rooms_snapshot' of the first page first and
+    ask for a new one when they notice a gap.
+    """
+
+    ROOM = 'public_rooms'
+    ROOMS = 'rooms:public'
+    ORDER = 'rooms:public:order'
+    META = 'rooms:public:meta'
+
+    def __init__(self, store):
+        self._store = store
+        self._loaded = False
+        self._pending = {}  # {room_id: room JSON, or None if removed}
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self._window = 0.25
+        self.stats = {'pages': 0, 'deltas': 0, 'snapshots': 0}
+
+    def init_app(self, app):
+        self._window = app.config.get('LOBBY_BROADCAST_WINDOW', 0.25)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if not self._store.hget(self.META, 'loaded'):
+                self.rebuild()
+            self._loaded = True
+
+    def rebuild(self):
+        """Reloads every public pending room from the DB."""
+        # `== True` rather than is_(True): the partial index's condition must match
+        rooms = Game.query.filter(Game.is_public == True, Game.status == 'pending') \
+            .order_by(Game.created_at).all()
+        self._store.delete(self.ROOMS)
+        self._store.delete(self.ORDER)
+        if rooms:
+            self._store.hsetmany(self.ROOMS, {room['room_id']: self._encode(room)
+                                              for room in serialize_games(rooms)})
+            self._store.zadd(self.ORDER, {room.room_id: cursor_score(room.created_at) for room in rooms})
+        self._store.hset(self.META, 'loaded', '1')
+        return len(rooms)
+
+    @staticmethod
+    def _encode(room):
+        return json.dumps(room, separators=(',', ':'))
+
+    def add(self, game, usernames=None):
+        """Lists a public pending game (a Game row)."""
+        self._ensure_loaded()
+        room = self._encode(game.to_dict(usernames=usernames))
+        self._store.hset(self.ROOMS, game.room_id, room)
+        self._store.zadd(self.ORDER, {game.room_id: cursor_score(game.created_at)})
+        self._queue(game.room_id, room)
+
+    def remove(self, *room_ids):
+        """Unlists rooms that were joined or expired. Returns how many were listed."""
+        self._ensure_loaded()
+        removed = self._store.zrem(self.ORDER, *room_ids)
+        for room_id in room_ids:
+            if self._store.hdel(self.ROOMS, room_id):
+                self._queue(room_id, None)
+        return removed
+
+    def page(self, after=None, after_id=None, limit=50):
+        """
+        {"rooms": [...], "next": cursor or null} with up to `limit` rooms that
+        come after the cursor (`after` a created_at datetime, `after_id` the
+        room_id of the last room seen; None for the first page), oldest first.
+        """
+        rooms, cursor = self._read_page(after, after_id, limit)
+        return Encoded(f'{{"rooms":{rooms},"next":{cursor}}}')
+
+    def _read_page(self, after, after_id, limit):
+        """(rooms as a JSON array, next cursor as JSON)."""
+        self._ensure_loaded()
+        score = float('-inf') if after is None else cursor_score(after)
+        rows = []
+        offset = 0
+        while len(rows) < limit:
+            # Rooms at the cursor's own created_at up to after_id were on earlier pages
+            batch = self._store.zrangebyscore(self.ORDER, score, limit, offset)
+            offset += len(batch)
+            rows += [(room_id, s) for room_id, s in batch
+                     if s > score or (after_id is not None and room_id > after_id)]
+            if len(batch) < limit:
+                break
+        rows = rows[:limit]
+        rooms = self._store.hmget(self.ROOMS, [room_id for room_id, _ in rows]) if rows else []
+        with self._lock:
+            self.stats['pages'] += 1
+        cursor = 'null'
+        if len(rows) == limit:
+            last_id, last_score = rows[-1]
+            cursor = json.dumps({'after': score_created_at(last_score), 'after_id': last_id},
+                                separators=(',', ':'))
+        # A room removed between the two reads is skipped
+        return '[' + ','.join(room for room in rooms if room) + ']', cursor
+
+    def __len__(self):
+        self._ensure_loaded()
+        return self._store.zcard(self.ORDER)
+
+    def version(self):
+        return int(self._store.hget(self.META, 'version') or 0)
+
+    def snapshot(self, limit=50):
+        """First page with the version deltas apply to, encoded once."""
+        version = self.version()
+        rooms, cursor = self._read_page(None, None, limit)
+        with self._lock:
+            self.stats['snapshots'] += 1
+        return Encoded(f'{{"version":{version},"rooms":{rooms},"next":{cursor}}}')
+
+    def _queue(self, room_id, room):
+        from . import socketio
+        with self._lock:
+            self._pending[room_id] = room
+            if self._scheduled:
+                return
+            self._scheduled = True
+        socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        from . import socketio
+        socketio.sleep(self._window)
+        self.flush()
+
+    def flush(self):
+        """Emits the changes queued since the last flush as one delta."""
+        from . import socketio
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._scheduled = False
+        if not pending:
+            return None
+        # Shared counter so deltas from every worker are ordered
+        version = self._store.hincrby(self.META, 'version', 1)
+        added = ','.join(room for room in pending.values() if room is not None)
+        removed = json.dumps([room_id for room_id, room in pending.items() if room is None])
+        payload = Encoded(f'{{"version":{version},"added":[{added}],"removed":{removed}}}')
+        with self._lock:
+            self.stats['deltas'] += 1
+        socketio.emit('public_rooms_delta', payload, room=self.ROOM)
+        return payload
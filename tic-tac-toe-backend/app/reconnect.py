@@ -0,0 +1,96 @@
+"""
+Grace period for players who lose their connection in the middle of a game.
+
+When a user's last socket disconnects, hold() records the game rooms that
+socket was in and schedules a forfeit RECONNECT_GRACE_SECONDS later. If the
+user authenticates a socket before then, resume() cancels the forfeit and
+returns those rooms so the new socket can be put back in them. Nothing is
+read from or written to the DB on either path.
+
+Forfeits that do fall due are resolved in one batch per timer tick: a
+single query for the held rooms of every user whose grace expired that
+still hold an active game, with the results applied to the live games (the
+background writer persists them). A game whose opponent is not online
+either is left alone; there is nobody to hand the win to. The held rooms
+and deadlines live in the state store, so a user may come back on another
+worker:
+    reconnect:held  hash  {user_id: {"deadline": ..., "rooms": [...]}}
+"""
+import json
+import logging
+import time
+
+from .models import Game
+from .sessions import game_audience
+
+log = logging.getLogger(__name__)
+
+
+class ReconnectGrace:
+    HELD = 'reconnect:held'
+    KIND = 'reconnect_forfeit'  # Timer kind, also the metrics task name
+
+    def __init__(self, store, scheduler):
+        self._store = store
+        self._scheduler = scheduler
+        self.grace = 30
+
+    def init_app(self, app):
+        self.grace = app.config.get('RECONNECT_GRACE_SECONDS', 30)
+        self._scheduler.handler(self.KIND, self.forfeit_expired)
+
+    def hold(self, user_id, room_ids):
+        """Starts the grace period of a user who just went offline."""
+        held = {'deadline': time.time() + self.grace, 'rooms': list(room_ids)}
+        self._store.hset(self.HELD, str(int(user_id)), json.dumps(held))
+        self._scheduler.schedule(self.KIND, int(user_id), self.grace)
+
+    def resume(self, user_id):
+        """Ends the grace period. Returns the held game rooms, or None if the user was not held."""
+        held = self._store.hget(self.HELD, str(int(user_id)))
+        if held is None or not self._store.hdel(self.HELD, str(int(user_id))):
+            return None
+        self._scheduler.cancel(self.KIND, int(user_id))
+        return json.loads(held)['rooms']
+
+    def __contains__(self, user_id):
+        return self._store.hexists(self.HELD, str(int(user_id)))
+
+    def forfeit_expired(self, user_ids):
+        """Forfeits the held games of every user in `user_ids` who is still away."""
+        from . import socketio, sessions, live_games, leaderboard
+        from .game_events import active_game_sids
+
+        now = time.time()
+        away = {}  # {user_id: held room_ids}
+        for user_id in user_ids:
+            held = self._store.hget(self.HELD, str(user_id))
+            held = json.loads(held) if held is not None else None
+            if held is None or held['deadline'] > now:
+                continue  # Resumed, or held again with a later deadline
+            # hdel claims the forfeit, should two workers get here at once
+            if self._store.hdel(self.HELD, str(user_id)) and not sessions.is_online(user_id):
+                away[user_id] = set(held['rooms'])
+        room_ids = set().union(*away.values())
+        if not room_ids:
+            return 0
+
+        games = Game.query.filter(Game.status == 'active', Game.room_id.in_(room_ids)).all()
+        forfeited = 0
+        for game in games:
+            loser = next((user_id for user_id in (game.player_x_id, game.player_o_id)
+                          if game.room_id in away.get(user_id, ())), None)
+            if loser is None:
+                continue
+            opponent = game.player_o_id if loser == game.player_x_id else game.player_x_id
+            if not game.bot_level and not sessions.is_online(opponent):
+                continue  # Both players are away
+            live = live_games.forfeit(game.room_id, loser, game)
+            if not live:
+                continue  # Already over in the live registry
+            forfeited += 1
+            leaderboard.add_win(live.winner_id)
+            socketio.emit('game_update', live.to_dict(), to=game_audience(game.room_id))
+            active_game_sids.discard(game.room_id)
+            log.info('Game forfeited after reconnect grace', extra={'room_id': game.room_id, 'user_id': loser})
+        return forfeited
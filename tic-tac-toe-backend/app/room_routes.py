@@ -1,8 +1,14 @@
-from flask import Blueprint, request, jsonify
+import datetime
+import json
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from .models import db, Game, User
+from .models import db, Game, GameMove, ArchivedGame, ArchivedGameMove, User, load_usernames, move_dict
 from .utils import generate_room_code
-from . import socketio, ready_to_play_users, online_users_sids  # Import from __init__
+from .bot import LEVELS as BOT_LEVELS, DEFAULT_LEVEL as DEFAULT_BOT_LEVEL
+from .board import DEFAULT_SIZE, MAX_SIZE, default_win_length
+from . import socketio, lobby, sessions, live_games, matchmaker, bot, public_rooms  # Import from __init__
+from .sessions import user_room, spectator_room
 
 room_bp = Blueprint('rooms', __name__)
 
@@ -17,6 +23,20 @@ def create_room():
 
     data = request.get_json()
     is_public = data.get('is_public', True)  # Default to public
+    # vs_bot starts the game right away against the computer, which plays O
+    vs_bot = data.get('vs_bot', False)
+    bot_level = data.get('level', DEFAULT_BOT_LEVEL) if vs_bot else None
+    if vs_bot and bot_level not in BOT_LEVELS:
+        return jsonify({"msg": f"Invalid level. Must be one of: {', '.join(BOT_LEVELS)}."}), 400
+    # Board size N and marks in a row K, e.g. 15 and 5 for gomoku
+    size = data.get('size', DEFAULT_SIZE)
+    win_length = data.get('win_length') or (default_win_length(size) if isinstance(size, int) else None)
+    if not (isinstance(size, int) and 3 <= size <= MAX_SIZE):
+        return jsonify({"msg": f"Invalid size. Must be between 3 and {MAX_SIZE}."}), 400
+    if not (isinstance(win_length, int) and 3 <= win_length <= size):
+        return jsonify({"msg": "Invalid win_length. Must be between 3 and the board size."}), 400
+    if vs_bot and (size, win_length) != (3, 3):
+        return jsonify({"msg": "The bot only plays on a 3x3 board."}), 400
 
     room_id = generate_room_code()
     while Game.query.filter_by(
@@ -27,10 +47,21 @@ def create_room():
         room_id=room_id,
         player_x_id=current_user_id,  # Creator is Player X
         current_turn_player_id=current_user_id,
-        is_public=is_public,
+        is_public=is_public and not vs_bot,
+        board=' ' * (size * size),
+        size=size,
+        win_length=win_length,
         status='pending')
+    usernames = {user.id: user.username}
+    if vs_bot:
+        new_game.player_o_id = bot.user_id
+        new_game.bot_level = bot_level
+        new_game.status = 'active'
+        usernames[bot.user_id] = bot.username
     db.session.add(new_game)
     db.session.commit()
+    if new_game.is_public and new_game.status == 'pending':
+        public_rooms.add(new_game, usernames)
 
     return jsonify({
         "msg":
@@ -40,16 +71,26 @@ def create_room():
         "game_id":
         new_game.id,
         "game_details":
-        new_game.to_dict(current_user_id=current_user_id)
+        new_game.to_dict(current_user_id=current_user_id, usernames=usernames)
     }), 201
 
 
 @room_bp.route('/rooms/public', methods=['GET'])
 @jwt_required()
 def list_public_rooms():
-    # List public rooms that are 'pending' (waiting for a second player)
-    rooms = Game.query.filter_by(is_public=True, status='pending').all()
-    return jsonify([room.to_dict() for room in rooms]), 200
+    # Public rooms waiting for a second player, oldest first, from the room index:
+    # {"rooms": [...], "next": {"after", "after_id"} or null}.
+    # Next page: ?after=<next.after>&after_id=<next.after_id>&limit=50
+    after = request.args.get('after')
+    if after:
+        try:
+            after = datetime.datetime.fromisoformat(after)
+        except ValueError:
+            return jsonify({"msg": "Invalid after. Must be an ISO 8601 created_at."}), 400
+    after_id = request.args.get('after_id') or None
+    limit = request.args.get('limit', current_app.config.get('PUBLIC_ROOMS_PAGE_SIZE', 50), type=int)
+    return Response(public_rooms.page(after or None, after_id, min(max(limit, 1), 100)),
+                    mimetype='application/json'), 200
 
 
 @room_bp.route('/rooms/<string:room_id_param>/join', methods=['POST'])
@@ -72,11 +113,14 @@ def join_room_http(
             "Room is not available for joining (already active or finished)"
         }), 403
 
+    usernames = load_usernames(game.user_ids())
+    usernames[user.id] = user.username
+
     if game.player_x_id == current_user_id:
         # User is already player X, perhaps rejoining or checking status
         return jsonify({
             "msg": "You are already Player X in this room.",
-            "game_details": game.to_dict(current_user_id)
+            "game_details": game.to_dict(current_user_id, usernames)
         }), 200
 
     if game.player_o_id is not None and game.player_o_id != current_user_id:
@@ -88,40 +132,51 @@ def join_room_http(
         game.status = 'active'  # Game starts now
         # current_turn_player_id is already set to player_x_id on creation
         db.session.commit()
+        public_rooms.remove(game.room_id)
 
         # Notify Player X (the creator) that Player O has joined
         # This can also be handled via SocketIO more directly if Player X is already in the socket room
-        player_x_sid = online_users_sids.get(game.player_x_id)
-        if player_x_sid:
+        if game.player_x_id in sessions:
             socketio.emit(
                 'player_joined', {
-                    'game': game.to_dict(current_user_id=game.player_x_id),
+                    'game': game.to_dict(current_user_id=game.player_x_id,
+                                         usernames=usernames),
                     'joining_player_username': user.username
                 },
-                room=player_x_sid)
+                room=user_room(game.player_x_id))
+        # Anyone already watching the pending room sees the game start
+        socketio.emit('game_update', game.to_dict(usernames=usernames), room=spectator_room(game.room_id))
 
         # Notify the joining player (Player O)
         # The client joining will typically then connect to the socket room for this game
         return jsonify({
             "msg": "Joined room successfully as Player O. Game is active.",
-            "game_details": game.to_dict(current_user_id)
+            "game_details": game.to_dict(current_user_id, usernames)
         }), 200
 
     # If user is already player O
     if game.player_o_id == current_user_id:
         return jsonify({
             "msg": "You are already Player O in this room.",
-            "game_details": game.to_dict(current_user_id)
+            "game_details": game.to_dict(current_user_id, usernames)
         }), 200
 
     return jsonify({"msg": "Cannot join room"}), 400  # Should not reach here
 
 
+def find_archived_game(room_id):
+    """Latest archived game with this room code; codes are reused after archiving."""
+    return ArchivedGame.query.filter_by(room_id=room_id).order_by(ArchivedGame.id.desc()).first()
+
+
 @room_bp.route('/game/<string:room_id_param>', methods=['GET'])
 @jwt_required()
 def get_game_details(room_id_param):
     current_user_id = get_jwt_identity()
-    game = Game.query.filter_by(room_id=room_id_param).first()
+    # Live games hold moves that may not have been flushed to the DB yet
+    game = live_games.get_cached(room_id_param) or \
+        Game.query.filter_by(room_id=room_id_param).first() or \
+        find_archived_game(room_id_param)
     if not game:
         return jsonify({"msg": "Game not found"}), 404
     # Ensure the user is part of the game to view details, unless it's a public game query
@@ -129,6 +184,35 @@ def get_game_details(room_id_param):
     return jsonify(game.to_dict(current_user_id)), 200
 
 
+@room_bp.route('/game/<string:room_id_param>/moves', methods=['GET'])
+@jwt_required()
+def get_game_moves(room_id_param):
+    # Move history streamed as newline-delimited JSON, one {"ply", "cell", "symbol"} per line
+    game = Game.query.filter_by(room_id=room_id_param).first()
+    move_model = GameMove
+    if not game:
+        game = find_archived_game(room_id_param)
+        move_model = ArchivedGameMove
+    if not game:
+        return jsonify({"msg": "Game not found"}), 404
+    game_id = game.id
+    # Read before the log so a flush in between cannot drop moves
+    pending = live_games.pending_moves(game_id) if move_model is GameMove else []
+
+    def generate():
+        last_ply = 0
+        moves = move_model.query.filter_by(game_id=game_id).order_by(move_model.ply)
+        for move in moves.yield_per(100):
+            last_ply = move.ply
+            yield json.dumps(move.to_dict()) + '\n'
+        # Moves played since the last background flush
+        for move in pending:
+            if move['ply'] > last_ply:
+                yield json.dumps(move_dict(move['ply'], move['cell'])) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 # --- Public Matchmaking ---
 @room_bp.route('/play/ready', methods=['POST'])
 @jwt_required()
@@ -138,12 +222,9 @@ def set_ready_to_play():
     if not user:
         return jsonify({"msg": "User not found"}), 404
 
-    if current_user_id not in ready_to_play_users:
-        ready_to_play_users[current_user_id] = user.username
-        # Broadcast update to other users? (e.g., via a general 'lobby' socket room)
-        socketio.emit('available_players_update',
-                      get_all_available_players_list(),
-                      room='lobby')  # Assuming a general lobby room
+    if current_user_id not in lobby:
+        # Broadcast to the 'lobby' socket room as part of the next delta
+        lobby.add(current_user_id, user.username)
     return jsonify({"msg": f"{user.username} is now ready to play."}), 200
 
 
@@ -151,31 +232,30 @@ def set_ready_to_play():
 @jwt_required()
 def set_unready_to_play():
     current_user_id = get_jwt_identity()
-    if current_user_id in ready_to_play_users:
-        del ready_to_play_users[current_user_id]
-        socketio.emit('available_players_update',
-                      get_all_available_players_list(),
-                      room='lobby')
+    lobby.remove(current_user_id)
     return jsonify({"msg": "No longer marked as ready to play."}), 200
 
 
-def get_all_available_players_list():
-    """Returns the full list of users in ready_to_play_users."""
-    return [{
-        "id": uid,
-        "username": uname
-    } for uid, uname in ready_to_play_users.items()]
+@room_bp.route('/play/queue', methods=['POST'])
+@jwt_required()
+def join_matchmaking_queue():
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
 
+    # The match arrives over the socket as a 'match_found' event
+    matchmaker.enqueue(user.id, user.username, user.wins)
+    return jsonify({"msg": "Searching for an opponent..."}), 202
 
-def get_all_available_players_list_except(exclude_user_id):
-    # Return list of {"id": user_id, "username": username}
-    return [
-        {
-            "id": uid,
-            "username": uname
-        } for uid, uname in ready_to_play_users.items()
-        if uid != exclude_user_id  # Don't list self
-    ]
+
+@room_bp.route('/play/queue', methods=['DELETE'])
+@jwt_required()
+def leave_matchmaking_queue():
+    current_user_id = get_jwt_identity()
+    if not matchmaker.cancel(current_user_id):
+        return jsonify({"msg": "You are not in the matchmaking queue."}), 404
+    return jsonify({"msg": "Left the matchmaking queue."}), 200
 
 
 @room_bp.route('/play/available', methods=['GET'])
@@ -185,7 +265,7 @@ def get_all_available_players_list_except(exclude_user_id):
 @jwt_required()
 def list_available_players():
     current_user_id = get_jwt_identity()
-    return jsonify(get_all_available_players_list_except(current_user_id)), 200
+    return jsonify(lobby.players(exclude_user_id=current_user_id)), 200  # Don't list self
 
 
 @room_bp.route('/play/start_with/<int:opponent_id>', methods=['POST'])
@@ -201,7 +281,7 @@ def start_game_with_player(opponent_id):
     if challenger_id == opponent_id:
         return jsonify({"msg": "Cannot play against yourself"}), 400
 
-    if challenger_id not in ready_to_play_users and opponent_id not in ready_to_play_users:
+    if challenger_id not in lobby and opponent_id not in lobby:
         # Could also be that one initiated, so only the other needs to be ready
         return jsonify({
             "msg":
@@ -225,38 +305,36 @@ def start_game_with_player(opponent_id):
     db.session.commit()
 
     # Remove both players from ready list
-    if challenger_id in ready_to_play_users:
-        del ready_to_play_users[challenger_id]
-    if opponent_id in ready_to_play_users: del ready_to_play_users[opponent_id]
-    socketio.emit('available_players_update',
-                  get_all_available_players_list_except(),
-                  room='lobby')  # Update global list
+    lobby.remove(challenger_id)
+    lobby.remove(opponent_id)
+
+    usernames = {challenger.id: challenger.username, opponent.id: opponent.username}
 
     # Notify both players about the new game
     # Challenger (already has game details from this response)
     # Opponent (needs to be notified via WebSocket)
-    opponent_sid = online_users_sids.get(opponent_id)
-    if opponent_sid:
+    if opponent_id in sessions:
         socketio.emit(
             'game_invite', {
                 "msg": f"{challenger.username} has started a game with you!",
-                "game_details": new_game.to_dict(current_user_id=opponent_id)
+                "game_details": new_game.to_dict(current_user_id=opponent_id,
+                                                 usernames=usernames)
             },
-            room=opponent_sid)
+            room=user_room(opponent_id))
 
-    challenger_sid = online_users_sids.get(challenger_id)
-    if challenger_sid:  # Also notify challenger to join the socket room
+    if challenger_id in sessions:  # Also notify challenger to join the socket room
         socketio.emit(
             'game_started_direct',
             {  # A specific event for this type of start
                 "msg": f"Game with {opponent.username} started!",
-                "game_details": new_game.to_dict(current_user_id=challenger_id)
+                "game_details": new_game.to_dict(current_user_id=challenger_id,
+                                                 usernames=usernames)
             },
-            room=challenger_sid)
+            room=user_room(challenger_id))
 
     return jsonify({
         "msg":
         f"Game started with {opponent.username}",
         "game_details":
-        new_game.to_dict(current_user_id=challenger_id)
+        new_game.to_dict(current_user_id=challenger_id, usernames=usernames)
     }), 201
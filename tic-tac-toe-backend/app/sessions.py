@@ -0,0 +1,112 @@
+def user_room(user_id):
+    """Name of the personal SocketIO room joined by every socket of a user."""
+    return f'user_{user_id}'
+
+
+def spectator_room(room_id):
+    """Name of the SocketIO room of a game's spectators, see app/spectators.py."""
+    return f'spectate_{room_id}'
+
+
+def game_audience(room_id):
+    """Players' and spectators' rooms of a game, for emits both should get."""
+    return [room_id, spectator_room(room_id)]
+
+
+class SessionRegistry:
+    """
+    Maps authenticated socket sids to users and back.
+
+    A user may have several sockets (one per tab). Both indexes live in the
+    shared state store so every lookup is O(1) and, with a Redis store,
+    visible to all workers:
+        sessions:users        hash  {sid: user_id}
+        sessions:sids:<uid>   set   of sids
+    Updates for one user are serialized with a per-user store lock (a green
+    lock under eventlet/gevent monkey patching, a Redis lock across workers).
+    """
+
+    USERS = 'sessions:users'
+
+    def __init__(self, store):
+        self._store = store
+
+    @staticmethod
+    def _sids_key(user_id):
+        return f'sessions:sids:{user_id}'
+
+    def add(self, user_id, sid):
+        """Registers a socket for a user. Returns True if the user just came online."""
+        user_id = int(user_id)
+        previous = self.user_for(sid)
+        if previous is not None and previous != user_id:
+            self.remove(sid)
+        with self._store.lock(self._sids_key(user_id)):
+            self._store.hset(self.USERS, sid, str(user_id))
+            self._store.sadd(self._sids_key(user_id), sid)
+            return self._store.scard(self._sids_key(user_id)) == 1
+
+    def remove(self, sid):
+        """
+        Forgets a socket. Returns (user_id, went_offline), where went_offline
+        is True if that was the user's last socket. user_id is None for
+        unauthenticated sockets.
+        """
+        user_id = self.user_for(sid)
+        if user_id is None:
+            return None, False
+        with self._store.lock(self._sids_key(user_id)):
+            self._store.hdel(self.USERS, sid)
+            self._store.srem(self._sids_key(user_id), sid)
+            return user_id, self._store.scard(self._sids_key(user_id)) == 0
+
+    def user_for(self, sid):
+        """Returns the user_id owning the socket, or None."""
+        user_id = self._store.hget(self.USERS, sid)
+        return int(user_id) if user_id is not None else None
+
+    def sids_for(self, user_id):
+        return list(self._store.smembers(self._sids_key(int(user_id))))
+
+    def is_online(self, user_id):
+        return user_id is not None and self._store.scard(self._sids_key(int(user_id))) > 0
+
+    def __contains__(self, user_id):
+        return self.is_online(user_id)
+
+
+class GameRoomSids:
+    """
+    Sockets of the two players in each game room, kept in the state store as
+    one hash per room: games:sids:<room_id> {player_x_sid, player_o_sid}.
+    """
+
+    def __init__(self, store):
+        self._store = store
+
+    @staticmethod
+    def _key(room_id):
+        return f'games:sids:{room_id}'
+
+    def get(self, room_id):
+        return self._store.hgetall(self._key(room_id))
+
+    def __contains__(self, room_id):
+        return self._store.hlen(self._key(room_id)) > 0
+
+    def set(self, room_id, slot, sid):
+        """slot is 'player_x_sid' or 'player_o_sid'."""
+        self._store.hset(self._key(room_id), slot, sid)
+
+    def clear_sid(self, room_id, sid):
+        """Removes sid from the room. The room is dropped once both players have left."""
+        key = self._key(room_id)
+        with self._store.lock(key):
+            sids = self._store.hgetall(key)
+            slots = [slot for slot, value in sids.items() if value == sid]
+            if slots:
+                self._store.hdel(key, *slots)
+            return bool(slots)
+
+    def discard(self, room_id):
+        self._store.delete(self._key(room_id))
@@ -0,0 +1,254 @@
+"""
+Headless self-play with the server's rules, for tuning and benchmarking.
+
+    flask --app run.py simulate --games 1000000 -x random -o heuristic
+    flask --app run.py simulate --games 1000000 --engine numpy --size 15
+
+Games are split into batches that run on a process pool. Each batch plays
+its games on the same `Board` that live games use (or, with the numpy
+engine, a vectorized copy of the same rules for random play) and returns
+outcome counts and the time spent choosing moves ("policy") and applying
+and judging them ("rules"). simulate() merges the batches into one report.
+"""
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+from .board import Board, DRAW, DIRECTIONS, default_win_length
+from .bot import move_scores, solve
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for engine='numpy'
+    np = None
+
+
+class RandomPolicy:
+    """Any empty cell, uniformly."""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, board, symbol, empty):
+        return self.rng.choice(empty)
+
+
+class HeuristicPolicy:
+    """Wins if it can, blocks the opponent's win, else prefers cells near the centre."""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, board, symbol, empty):
+        other = 'O' if symbol == 'X' else 'X'
+        for player in (symbol, other):
+            for cell in empty:
+                if self._completes_line(board, player, cell):
+                    return cell
+        centre = (board.size - 1) / 2
+        return min(empty, key=lambda cell: (
+            abs(cell // board.size - centre) + abs(cell % board.size - centre), self.rng.random()))
+
+    @staticmethod
+    def _completes_line(board, symbol, cell):
+        trial = Board(board.x, board.o, board.size, board.win_length)
+        trial.play(cell, symbol)
+        return trial.outcome_after(cell) == symbol
+
+
+class TablePolicy:
+    """Perfect play from the bot's solved table (3x3 only)."""
+
+    _table = None  # Solved once per process
+
+    def __init__(self, rng):
+        self.rng = rng
+        if TablePolicy._table is None:
+            TablePolicy._table = memoryview(solve()).cast('b')
+
+    def choose(self, board, symbol, empty):
+        scores = move_scores(self._table, board, symbol)
+        best = max(scores.values())
+        return self.rng.choice([cell for cell, score in scores.items() if score == best])
+
+
+POLICIES = {'random': RandomPolicy, 'heuristic': HeuristicPolicy, 'table': TablePolicy}
+
+
+def play_batch(games, x_policy, o_policy, size, win_length, seed):
+    """Plays `games` games on Board. Returns the batch stats (see simulate())."""
+    rng = random.Random(seed)
+    policies = {'X': POLICIES[x_policy](rng), 'O': POLICIES[o_policy](rng)}
+    counts = {'X': 0, 'O': 0, DRAW: 0}
+    moves = 0
+    policy_time = rules_time = 0.0
+    clock = time.perf_counter
+    started = clock()
+    for _ in range(games):
+        board = Board(size=size, win_length=win_length)
+        empty = list(range(size * size))
+        symbol, outcome = 'X', None
+        while outcome is None:
+            t0 = clock()
+            cell = policies[symbol].choose(board, symbol, empty)
+            t1 = clock()
+            board.play(cell, symbol)
+            outcome = board.outcome_after(cell)
+            t2 = clock()
+            empty.remove(cell)
+            policy_time += t1 - t0
+            rules_time += t2 - t1
+            moves += 1
+            symbol = 'O' if symbol == 'X' else 'X'
+        counts[outcome] += 1
+    return {'games': games, 'moves': moves, 'counts': counts, 'policy': policy_time,
+            'rules': rules_time, 'elapsed': clock() - started}
+
+
+def _line_table(size, win_length):
+    """
+    (lines, through): every K-cell line as cell indexes, and for each cell the
+    ids of the lines through it, padded with a dummy line of empty cells.
+    """
+    lines = []
+    for row in range(size):
+        for col in range(size):
+            for dr, dc in DIRECTIONS:
+                end_row, end_col = row + dr * (win_length - 1), col + dc * (win_length - 1)
+                if 0 <= end_row < size and 0 <= end_col < size:
+                    lines.append([(row + dr * i) * size + col + dc * i for i in range(win_length)])
+    dummy = len(lines)
+    lines.append([size * size] * win_length)  # Extra board column that is always empty
+    through = [[] for _ in range(size * size)]
+    for line_id, cells in enumerate(lines[:-1]):
+        for cell in cells:
+            through[cell].append(line_id)
+    width = max(len(ids) for ids in through)
+    return np.array(lines), np.array([ids + [dummy] * (width - len(ids)) for ids in through])
+
+
+def play_batch_numpy(games, size, win_length, seed):
+    """
+    Random vs random, all games of the batch advanced one ply at a time as
+    arrays. Like outcome_after, only the lines through each new mark are checked.
+    """
+    rng = np.random.default_rng(seed)
+    cells = size * size
+    lines, through = _line_table(size, win_length)
+    boards = np.zeros((games, cells + 1), dtype=np.int8)  # 0 empty, 1 X, 2 O
+    result = np.zeros(games, dtype=np.int8)  # 0 playing, 1 X won, 2 O won, 3 draw
+    moves = 0
+    policy_time = rules_time = 0.0
+    clock = time.perf_counter
+    started = clock()
+    playing = np.arange(games)
+    for ply in range(cells):
+        if not playing.size:
+            break
+        symbol = 1 if ply % 2 == 0 else 2
+        t0 = clock()
+        noise = rng.random((playing.size, cells))
+        noise[boards[playing, :cells] != 0] = -1.0
+        chosen = noise.argmax(axis=1)
+        t1 = clock()
+        boards[playing, chosen] = symbol
+        line_cells = lines[through[chosen]]  # (games, lines through the cell, K)
+        won = (boards[playing[:, None, None], line_cells] == symbol).all(axis=2).any(axis=1)
+        result[playing[won]] = symbol
+        if ply == cells - 1:
+            result[playing[~won]] = 3
+        playing = playing[~won]
+        t2 = clock()
+        policy_time += t1 - t0
+        rules_time += t2 - t1
+        moves += won.size
+    counts = np.bincount(result, minlength=4)
+    return {'games': games, 'moves': moves,
+            'counts': {'X': int(counts[1]), 'O': int(counts[2]), DRAW: int(counts[3])},
+            'policy': policy_time, 'rules': rules_time, 'elapsed': clock() - started}
+
+
+def _run_batch(args):
+    engine, games, x_policy, o_policy, size, win_length, seed = args
+    if engine == 'numpy':
+        return play_batch_numpy(games, size, win_length, seed)
+    return play_batch(games, x_policy, o_policy, size, win_length, seed)
+
+
+def simulate(games, x_policy='random', o_policy='random', size=3, win_length=None,
+             engine='python', workers=None, batch_size=10000, seed=0):
+    """
+    Plays `games` games and returns a report:
+        games, seconds, games_per_sec, outcomes ({'X', 'O', 'draw'} fractions),
+        mean_moves, and stage timings in ns per move summed over all workers.
+    """
+    win_length = win_length or default_win_length(size)
+    if engine == 'numpy':
+        if np is None:
+            raise RuntimeError('The numpy engine needs numpy installed.')
+        if (x_policy, o_policy) != ('random', 'random'):
+            raise ValueError('The numpy engine only plays random vs random.')
+    if 'table' in (x_policy, o_policy) and (size, win_length) != (3, 3):
+        raise ValueError('The table policy only plays 3x3.')
+
+    batches = []
+    for i, start in enumerate(range(0, games, batch_size)):
+        batches.append((engine, min(batch_size, games - start), x_policy, o_policy,
+                        size, win_length, seed + i))
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    if workers == 1:
+        results = [_run_batch(batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_batch, batches))
+    seconds = time.perf_counter() - started
+
+    moves = sum(r['moves'] for r in results)
+    counts = {key: sum(r['counts'][key] for r in results) for key in ('X', 'O', DRAW)}
+    per_move = lambda total: total / moves * 1e9 if moves else 0.0
+    return {
+        'games': games,
+        'seconds': seconds,
+        'games_per_sec': games / seconds if seconds else 0.0,
+        'outcomes': {key: count / games for key, count in counts.items()} if games else counts,
+        'mean_moves': moves / games if games else 0.0,
+        'stages_ns_per_move': {
+            'policy': per_move(sum(r['policy'] for r in results)),
+            'rules': per_move(sum(r['rules'] for r in results)),
+            'batch': per_move(sum(r['elapsed'] for r in results)),
+        },
+    }
+
+
+def format_report(report):
+    outcomes = ", ".join(f"{key} {share:.1%}" for key, share in report['outcomes'].items())
+    stages = ", ".join(f"{key} {ns:.0f}" for key, ns in report['stages_ns_per_move'].items())
+    return (f"{report['games']} games in {report['seconds']:.2f}s "
+            f"({report['games_per_sec']:.0f} games/s), {report['mean_moves']:.1f} moves/game\n"
+            f"outcomes: {outcomes}\n"
+            f"ns per move: {stages}")
+
+
+@click.command('simulate')
+@click.option('--games', type=int, default=100000)
+@click.option('-x', '--x-policy', type=click.Choice(list(POLICIES)), default='random')
+@click.option('-o', '--o-policy', type=click.Choice(list(POLICIES)), default='random')
+@click.option('--size', type=int, default=3)
+@click.option('--win-length', type=int, default=None)
+@click.option('--engine', type=click.Choice(['python', 'numpy']), default='python')
+@click.option('--workers', type=int, default=None, help='Processes to use (default: one per CPU).')
+@click.option('--batch-size', type=int, default=10000)
+@click.option('--seed', type=int, default=0)
+def simulate_command(games, x_policy, o_policy, size, win_length, engine, workers, batch_size, seed):
+    """Play games between bot policies and report throughput and outcomes."""
+    try:
+        report = simulate(games, x_policy, o_policy, size, win_length, engine,
+                          workers, batch_size, seed)
+    except (RuntimeError, ValueError) as e:
+        raise click.UsageError(str(e))
+    click.echo(format_report(report))
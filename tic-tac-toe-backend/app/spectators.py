@@ -0,0 +1,99 @@
+"""
+Read-only spectators.
+
+Spectators of a game sit in their own Socket.IO room, spectator_room(room_id),
+next to the players' room. Game events go to both rooms in a single emit, so
+each one is encoded once and the same packet is written to every watcher.
+
+A spectator arriving mid-game gets a snapshot from SnapshotCache and then
+follows the same move_applied deltas as the players. The snapshot is
+serialized once per game version (seq and status) and sent as-is to every
+spectator asking for that version. Live games are read from the registry,
+so watching an active game never queries the DB; other games are loaded
+once and cached (finished games for good, pending ones for
+SPECTATOR_SNAPSHOT_TTL seconds).
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .models import Game
+from .export import FINISHED_STATUSES
+
+
+class Encoded(str):
+    """JSON text that goes into a Socket.IO packet as-is (see PacketJSON)."""
+
+
+class PacketJSON:
+    """
+    `json` module for the Socket.IO servers. Packets are encoded as
+    [event, *args]; Encoded arguments are spliced in instead of being
+    serialized again.
+    """
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        if isinstance(obj, list) and any(isinstance(item, Encoded) for item in obj):
+            return '[' + ','.join(item if isinstance(item, Encoded) else json.dumps(item, *args, **kwargs)
+                                  for item in obj) + ']'
+        return json.dumps(obj, *args, **kwargs)
+
+    loads = staticmethod(json.loads)
+
+
+class SnapshotCache:
+    """Pre-serialized game snapshots for spectators, per worker process."""
+
+    def __init__(self, registry):
+        self._registry = registry
+        self._entries = OrderedDict()  # {room_id: (version, expires_at, Encoded)}, LRU first
+        self._lock = threading.Lock()
+        self._max_size = 1000
+        self._ttl = 1.0
+        self.stats = {'hits': 0, 'builds': 0}
+
+    def init_app(self, app):
+        self._max_size = app.config.get('SPECTATOR_CACHE_SIZE', 1000)
+        self._ttl = app.config.get('SPECTATOR_SNAPSHOT_TTL', 1.0)
+
+    def cached(self, room_id):
+        """
+        Snapshot of room_id without touching the DB: built from the live game
+        if there is one, else a still valid cached entry. None otherwise.
+        """
+        live = self._registry.get_cached(room_id)
+        with self._lock:
+            entry = self._entries.get(room_id)
+            if entry and (entry[0] == (live.seq, live.status) if live else entry[1] > time.time()):
+                self._entries.move_to_end(room_id)
+                self.stats['hits'] += 1
+                return entry[2]
+        return self.put(live) if live else None
+
+    def put(self, game, usernames=None):
+        """Serializes and caches the snapshot of a Game row or live game."""
+        game = game.to_dict(usernames=usernames)
+        payload = Encoded(json.dumps({'game': game}, separators=(',', ':')))
+        expires_at = float('inf') if game['status'] in FINISHED_STATUSES else time.time() + self._ttl
+        with self._lock:
+            self._entries[game['room_id']] = ((game['seq'], game['status']), expires_at, payload)
+            self._entries.move_to_end(game['room_id'])
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+            self.stats['builds'] += 1
+        return payload
+
+    def get(self, room_id):
+        """Snapshot of room_id, loading the game once if it is not live. None if there is no such game."""
+        payload = self.cached(room_id)
+        if payload is not None:
+            return payload
+        game = Game.query.filter_by(room_id=room_id).first()
+        if not game:
+            return None
+        return self.put(self._registry.track(game) or game)
+
+    def __len__(self):
+        return len(self._entries)
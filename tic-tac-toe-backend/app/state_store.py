@@ -0,0 +1,363 @@
+"""
+Shared state used by the socket server (online sessions, lobby, live games).
+
+STATE_STORE_URL selects the backend:
+  memory://           in-process dicts, only valid with a single worker
+  redis://host:port/0 a Redis server (or anything speaking its protocol),
+                      so several workers can serve the same lobby and rooms
+
+Callers store strings only, so both backends behave the same.
+"""
+import bisect
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+
+class InMemoryBackend:
+    """Hashes, sets and sorted sets in process memory, guarded by one lock."""
+
+    shared = False
+    LOCK_STRIPES = 64
+
+    def __init__(self):
+        self._hashes = {}
+        self._sets = {}
+        self._zsets = {}
+        self._lock = threading.RLock()
+        # Named locks share a fixed set of stripes, so memory does not grow with
+        # every room and user. Callers never hold two named locks at once, so
+        # two names on one stripe only serialize, they cannot deadlock.
+        self._stripes = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def hget(self, key, field):
+        return self._hashes.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        h = self._hashes.get(key, {})
+        return [h.get(f) for f in fields]
+
+    def hset(self, key, field, value):
+        with self._lock:
+            self._hashes.setdefault(key, {})[field] = value
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            h = self._hashes.get(key)
+            if not h:
+                return 0
+            removed = sum(1 for f in fields if h.pop(f, None) is not None)
+            if not h:
+                del self._hashes[key]
+            return removed
+
+    def hexists(self, key, field):
+        return field in self._hashes.get(key, {})
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._hashes.get(key, {}))
+
+    def hlen(self, key):
+        return len(self._hashes.get(key, {}))
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            h = self._hashes.setdefault(key, {})
+            h[field] = str(int(h.get(field, 0)) + amount)
+            return int(h[field])
+
+    def hpopall(self, key):
+        """Returns and deletes a whole hash atomically."""
+        with self._lock:
+            return self._hashes.pop(key, {})
+
+    def hsetmany(self, key, mapping):
+        with self._lock:
+            self._hashes.setdefault(key, {}).update(mapping)
+
+    def sadd(self, key, *members):
+        with self._lock:
+            s = self._sets.setdefault(key, set())
+            before = len(s)
+            s.update(members)
+            return len(s) - before
+
+    def srem(self, key, *members):
+        with self._lock:
+            s = self._sets.get(key)
+            if not s:
+                return 0
+            before = len(s)
+            s.difference_update(members)
+            if not s:
+                del self._sets[key]
+            return before - len(s)
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._sets.get(key, ()))
+
+    def scard(self, key):
+        return len(self._sets.get(key, ()))
+
+    def spopall(self, key):
+        """Returns and deletes a whole set atomically."""
+        with self._lock:
+            return self._sets.pop(key, set())
+
+    # Sorted sets: a list of (score, member) kept sorted with bisect, plus
+    # {member: score}, so ranks and inserts cost a binary search. Equal scores
+    # are ordered by member, as in Redis (reversed for the zrev* reads).
+
+    def _zset(self, key):
+        return self._zsets.setdefault(key, ([], {}))
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            for member, score in mapping.items():
+                self._zset_put(key, member, score)
+
+    def _zset_put(self, key, member, score):
+        # Caller holds the lock
+        order, scores = self._zset(key)
+        if member in scores:
+            del order[bisect.bisect_left(order, (scores[member], member))]
+        scores[member] = score
+        bisect.insort(order, (score, member))
+
+    def zincrby(self, key, amount, member):
+        with self._lock:
+            score = self._zset(key)[1].get(member, 0) + amount
+            self._zset_put(key, member, score)
+            return score
+
+    def zscore(self, key, member):
+        return self._zsets.get(key, ([], {}))[1].get(member)
+
+    def zrevrank(self, key, member):
+        with self._lock:
+            order, scores = self._zsets.get(key, ([], {}))
+            if member not in scores:
+                return None
+            return len(order) - 1 - bisect.bisect_left(order, (scores[member], member))
+
+    def zrevrange(self, key, start, stop):
+        """[(member, score)] by descending score, stop inclusive like Redis (indexes >= 0)."""
+        with self._lock:
+            order = self._zsets.get(key, ([], {}))[0]
+            n = len(order)
+            return [(member, score) for score, member in reversed(order[max(0, n - 1 - stop):max(0, n - start)])]
+
+    def zrangebyscore(self, key, min_score, count, offset=0):
+        """
+        Up to `count` [(member, score)] with score >= min_score, by ascending
+        score then member, skipping the first `offset` of them.
+        """
+        with self._lock:
+            order = self._zsets.get(key, ([], {}))[0]
+            begin = bisect.bisect_left(order, min_score, key=lambda item: item[0]) + offset
+            return [(member, score) for score, member in order[begin:begin + count]]
+
+    def zrem(self, key, *members):
+        with self._lock:
+            order, scores = self._zsets.get(key, ([], {}))
+            removed = 0
+            for member in members:
+                if member in scores:
+                    del order[bisect.bisect_left(order, (scores.pop(member), member))]
+                    removed += 1
+            return removed
+
+    def zcard(self, key):
+        return len(self._zsets.get(key, ([], {}))[1])
+
+    def delete(self, key):
+        with self._lock:
+            self._hashes.pop(key, None)
+            self._sets.pop(key, None)
+            self._zsets.pop(key, None)
+
+    @contextmanager
+    def lock(self, name):
+        with self._stripes[hash(name) % len(self._stripes)]:
+            yield
+
+
+class RedisBackend:
+    """Hashes, sets and sorted sets on a Redis server. Requires the `redis` package."""
+
+    shared = True
+
+    def __init__(self, url, prefix='ttt:', client=None):
+        # `client`: an already connected client (decode_responses=True), e.g. fakeredis in tests
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "STATE_STORE_URL points at Redis but the 'redis' package is not installed") from e
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+
+    def _k(self, key):
+        return self.prefix + key
+
+    def hget(self, key, field):
+        return self.client.hget(self._k(key), field)
+
+    def hmget(self, key, fields):
+        return self.client.hmget(self._k(key), fields) if fields else []
+
+    def hset(self, key, field, value):
+        self.client.hset(self._k(key), field, value)
+
+    def hdel(self, key, *fields):
+        return self.client.hdel(self._k(key), *fields) if fields else 0
+
+    def hexists(self, key, field):
+        return self.client.hexists(self._k(key), field)
+
+    def hgetall(self, key):
+        return self.client.hgetall(self._k(key))
+
+    def hlen(self, key):
+        return self.client.hlen(self._k(key))
+
+    def hincrby(self, key, field, amount=1):
+        return self.client.hincrby(self._k(key), field, amount)
+
+    def hpopall(self, key):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hgetall(self._k(key))
+        pipe.delete(self._k(key))
+        return pipe.execute()[0]
+
+    def hsetmany(self, key, mapping):
+        if mapping:
+            self.client.hset(self._k(key), mapping=mapping)
+
+    def sadd(self, key, *members):
+        return self.client.sadd(self._k(key), *members) if members else 0
+
+    def srem(self, key, *members):
+        return self.client.srem(self._k(key), *members) if members else 0
+
+    def smembers(self, key):
+        return self.client.smembers(self._k(key))
+
+    def scard(self, key):
+        return self.client.scard(self._k(key))
+
+    def spopall(self, key):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.smembers(self._k(key))
+        pipe.delete(self._k(key))
+        return pipe.execute()[0]
+
+    def zadd(self, key, mapping):
+        if mapping:
+            self.client.zadd(self._k(key), mapping)
+
+    def zincrby(self, key, amount, member):
+        return self.client.zincrby(self._k(key), amount, member)
+
+    def zscore(self, key, member):
+        return self.client.zscore(self._k(key), member)
+
+    def zrevrank(self, key, member):
+        return self.client.zrevrank(self._k(key), member)
+
+    def zrevrange(self, key, start, stop):
+        return self.client.zrevrange(self._k(key), start, stop, withscores=True)
+
+    def zrangebyscore(self, key, min_score, count, offset=0):
+        return self.client.zrangebyscore(self._k(key), repr(min_score), '+inf',
+                                         start=offset, num=count, withscores=True)
+
+    def zrem(self, key, *members):
+        return self.client.zrem(self._k(key), *members) if members else 0
+
+    def zcard(self, key):
+        return self.client.zcard(self._k(key))
+
+    def delete(self, key):
+        self.client.delete(self._k(key))
+
+    @contextmanager
+    def lock(self, name):
+        with self.client.lock(self._k('lock:' + name), timeout=10, blocking_timeout=5):
+            yield
+
+
+def create_backend(url):
+    if not url or url.startswith('memory://'):
+        return InMemoryBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported STATE_STORE_URL: {url}")
+
+
+class StateStore:
+    """
+    Late-bound state store. Module-level registries hold a reference to this
+    object at import time; create_app() picks the backend via init_app().
+    """
+
+    def __init__(self):
+        self.backend = InMemoryBackend()
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config.get('STATE_STORE_URL'))
+
+    @property
+    def shared(self):
+        return self.backend.shared
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+class SharedDict(MutableMapping):
+    """
+    dict-like view of one hash in the state store, so module-level maps such
+    as ready_to_play_users keep their dict interface.
+    Keys and values are converted with `key_type`/`value_type` on the way out.
+    """
+
+    def __init__(self, store, key, key_type=str, value_type=str):
+        self._store = store
+        self._key = key
+        self._key_type = key_type
+        self._value_type = value_type
+
+    def __getitem__(self, k):
+        value = self._store.hget(self._key, str(self._key_type(k)))
+        if value is None:
+            raise KeyError(k)
+        return self._value_type(value)
+
+    def __setitem__(self, k, value):
+        self._store.hset(self._key, str(self._key_type(k)), str(value))
+
+    def __delitem__(self, k):
+        if not self._store.hdel(self._key, str(self._key_type(k))):
+            raise KeyError(k)
+
+    def __contains__(self, k):
+        try:
+            return self._store.hexists(self._key, str(self._key_type(k)))
+        except (TypeError, ValueError):
+            return False
+
+    def items(self):
+        # One round trip instead of one per key
+        return [(self._key_type(k), self._value_type(v))
+                for k, v in self._store.hgetall(self._key).items()]
+
+    def __iter__(self):
+        return iter([k for k, _ in self.items()])
+
+    def __len__(self):
+        return self._store.hlen(self._key)
@@ -0,0 +1,133 @@
+"""
+Timers for deadlines that are usually cancelled before they fire, such as
+reconnect grace periods.
+
+TimerWheel is a hashed timer wheel: a timer goes into one of `slots`
+buckets by the tick its deadline falls in, and each tick only looks at one
+bucket, so scheduling, cancelling and expiring cost O(1) per timer however
+many are pending. Timers more than one revolution ahead wait in their
+bucket until their tick comes round.
+
+Scheduler runs the wheel on a background task and hands the timers that
+expired in a tick to the handler of their kind as one batch, so expiries
+can be resolved with one query per tick rather than one per timer. The
+wheel is per process; handlers re-check shared state before acting.
+"""
+import logging
+import math
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    def __init__(self, tick=0.25, slots=512, now=None):
+        self.tick = tick
+        self._slots = [{} for _ in range(slots)]  # {key: due tick}
+        self._where = {}  # {key: slot index}
+        self._current = math.floor((time.time() if now is None else now) / tick)  # Last tick expired
+
+    def schedule(self, key, delay, now=None):
+        """(Re)schedules `key` to expire after `delay` seconds. Returns the deadline."""
+        now = time.time() if now is None else now
+        self.cancel(key)
+        due = max(math.ceil((now + delay) / self.tick), self._current + 1)
+        slot = due % len(self._slots)
+        self._slots[slot][key] = due
+        self._where[key] = slot
+        return due * self.tick
+
+    def cancel(self, key):
+        """Returns False if `key` was not pending."""
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    def advance(self, now=None):
+        """Expires every timer due by `now`. Returns their keys in deadline order."""
+        now = time.time() if now is None else now
+        target = math.floor(now / self.tick)
+        expired = []
+        # After a long stall every bucket is visited once, not once per missed tick
+        for tick in range(max(self._current + 1, target - len(self._slots) + 1), target + 1):
+            bucket = self._slots[tick % len(self._slots)]
+            due = [(at, key) for key, at in bucket.items() if at <= target]
+            for at, key in due:
+                del bucket[key]
+                del self._where[key]
+            expired.extend(due)
+        self._current = max(self._current, target)
+        expired.sort(key=lambda item: item[0])
+        return [key for _, key in expired]
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def __len__(self):
+        return len(self._where)
+
+
+class Scheduler:
+    """Expires the timers of a TimerWheel every tick and dispatches them by kind."""
+
+    def __init__(self):
+        self._wheel = TimerWheel()
+        self._handlers = {}  # {kind: callable taking the list of expired ids}
+        self._lock = threading.Lock()
+        self._app = None
+        self._started = False
+
+    def init_app(self, app):
+        self._app = app
+        if not self._started and not len(self._wheel):
+            self._wheel = TimerWheel(app.config.get('TIMER_TICK', 0.25), app.config.get('TIMER_SLOTS', 512))
+
+    def handler(self, kind, func):
+        """Registers func(ids) for the timers of `kind`; it runs in an app context."""
+        self._handlers[kind] = func
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            from . import socketio
+            socketio.start_background_task(self._run)
+
+    def schedule(self, kind, id, delay):
+        self._ensure_started()
+        with self._lock:
+            return self._wheel.schedule((kind, id), delay)
+
+    def cancel(self, kind, id):
+        with self._lock:
+            return self._wheel.cancel((kind, id))
+
+    def pending(self):
+        return len(self._wheel)
+
+    def _run(self):
+        from . import socketio
+        while True:
+            socketio.sleep(self._wheel.tick)
+            self.run_due()
+
+    def run_due(self, now=None):
+        """Runs the handlers of every timer due by `now`, one call per kind."""
+        from . import metrics
+        with self._lock:
+            expired = self._wheel.advance(now)
+        batches = {}
+        for kind, id in expired:
+            batches.setdefault(kind, []).append(id)
+        for kind, ids in batches.items():
+            try:
+                with self._app.app_context(), metrics.track('task', kind):
+                    self._handlers[kind](ids)
+            except Exception:
+                log.exception('Timer handler failed', extra={'kind': kind, 'timers': len(ids)})
@@ -0,0 +1,119 @@
+"""
+Cache of verified JWTs for socket authentication.
+
+After a deploy every client reconnects within a few seconds, and each
+connect used to verify the token signature and load the user. TokenCache
+keeps the resulting principal per token instead:
+  - an entry expires with the token's `exp` claim, or after TOKEN_CACHE_TTL
+    seconds if that comes first (or if the token has no `exp`, as with
+    JWT_ACCESS_TOKEN_EXPIRES=False), so a renamed or deleted user is picked up;
+  - beyond TOKEN_CACHE_SIZE entries the least recently used one is dropped;
+  - invalidate_user()/invalidate_token() drop entries early. Updates and
+    deletes of `User` rows call invalidate_user() through mapper events.
+Tokens are keyed by a digest, not stored. The cache is per process; other
+workers rely on the TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask_jwt_extended import decode_token
+from sqlalchemy import event
+
+from .models import db, User
+
+# What an authenticated socket is known by, kept in its socket session
+Principal = namedtuple('Principal', ['user_id', 'username'])
+
+
+class TokenCache:
+    def __init__(self):
+        self._entries = OrderedDict()  # {token digest: (principal, expires_at)}, LRU first
+        self._by_user = {}  # {user_id: set of token digests}
+        self._lock = threading.Lock()
+        self._max_size = 10000
+        self._ttl = 300
+        self._hooked = False
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def init_app(self, app):
+        self._max_size = app.config.get('TOKEN_CACHE_SIZE', 10000)
+        self._ttl = app.config.get('TOKEN_CACHE_TTL', 300)
+        if not self._hooked:
+            self._hooked = True
+            event.listen(User, 'after_update', self._on_user_changed)
+            event.listen(User, 'after_delete', self._on_user_changed)
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token):
+        """Cached principal for a token, or None."""
+        key = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            if entry:
+                self._drop(key)
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, token, principal, exp=None):
+        """Caches a verified token until `exp` (a Unix time, None if it never expires) or the TTL."""
+        key = self._digest(token)
+        expires_at = time.time() + self._ttl
+        if exp is not None:
+            expires_at = min(exp, expires_at)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (principal, expires_at)
+            self._by_user.setdefault(principal.user_id, set()).add(key)
+            while len(self._entries) > self._max_size:
+                self._drop(next(iter(self._entries)))
+
+    def resolve(self, token):
+        """
+        Principal for a token, verifying it and loading the user on a miss.
+        Raises the JWT errors of decode_token(); returns None for unknown users.
+        """
+        principal = self.get(token)
+        if principal:
+            return principal
+        decoded = decode_token(token)
+        user = db.session.get(User, int(decoded['sub']))
+        if not user:
+            return None
+        principal = Principal(user.id, user.username)
+        self.put(token, principal, decoded.get('exp'))
+        return principal
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._drop(key)
+
+    def invalidate_token(self, token):
+        with self._lock:
+            key = self._digest(token)
+            if key in self._entries:
+                self._drop(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        principal, _ = self._entries.pop(key)
+        keys = self._by_user.get(principal.user_id)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[principal.user_id]
+
+    def _on_user_changed(self, mapper, connection, user):
+        self.invalidate_user(user.id)
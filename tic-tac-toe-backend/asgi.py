@@ -0,0 +1,17 @@
+"""
+ASGI entry point, an alternative to run.py: Socket.IO events are served by
+python-socketio's AsyncServer with async DB access (see app/async_server.py),
+the REST API by the same Flask app.
+
+    pip install uvicorn a2wsgi aiosqlite   # or asyncpg for PostgreSQL
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+
+One process holds many idle sockets; for several processes use Redis for
+STATE_STORE_URL and SOCKETIO_MESSAGE_QUEUE, as with gunicorn.
+"""
+from app import create_app
+from app.async_server import create_asgi_app
+from app.config import AsgiConfig
+
+app = create_app(AsgiConfig)
+application = create_asgi_app(app)
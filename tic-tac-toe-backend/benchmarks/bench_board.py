@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: bitboard win/draw detection vs. the original string walk.
+
+Usage (from tic-tac-toe-backend/):
+    python benchmarks/bench_board.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.board import Board  # noqa: E402
+from app.utils import check_win, check_draw  # noqa: E402
+
+
+def legacy_check_win(board_str):
+    """The list-walking check_win this module replaced, kept as the baseline."""
+    board = list(board_str)
+    lines = [
+        [0, 1, 2], [3, 4, 5], [6, 7, 8],
+        [0, 3, 6], [1, 4, 7], [2, 5, 8],
+        [0, 4, 8], [2, 4, 6]
+    ]
+    for line in lines:
+        a, b, c = line
+        if board[a] != ' ' and board[a] == board[b] == board[c]:
+            return board[a]
+    return None
+
+
+def legacy_check_draw(board_str):
+    return ' ' not in board_str and legacy_check_win(board_str) is None
+
+
+def random_boards(count, seed=0):
+    """Boards reached by random play, like the ones make_move sees."""
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        cells = [' '] * 9
+        order = list(range(9))
+        rng.shuffle(order)
+        for ply in range(rng.randint(0, 9)):
+            cells[order[ply]] = 'X' if ply % 2 == 0 else 'O'
+        boards.append("".join(cells))
+    return boards
+
+
+def main(count=10000, repeat=5):
+    boards = random_boards(count)
+    bitboards = [Board.from_string(b) for b in boards]
+
+    def legacy():
+        for b in boards:
+            legacy_check_win(b) or legacy_check_draw(b)
+
+    def wrappers():
+        for b in boards:
+            check_win(b) or check_draw(b)
+
+    def bitboard():
+        for b in bitboards:
+            b.outcome()
+
+    cases = [
+        ('legacy check_win + check_draw (str)', legacy),
+        ('utils check_win + check_draw (str)', wrappers),
+        ('Board.outcome (bitboard)', bitboard),
+    ]
+    baseline = None
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=1, repeat=repeat))
+        per_call_ns = best / count * 1e9
+        baseline = baseline or per_call_ns
+        print(f"{name:40s} {per_call_ns:8.0f} ns/board  {baseline / per_call_ns:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
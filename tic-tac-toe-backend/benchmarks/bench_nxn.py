@@ -0,0 +1,59 @@
+"""
+Benchmark: per-move win detection cost as the board grows.
+
+Replays random games on N x N boards and times the check done after each
+move: Board.outcome_after (only the four lines through the last cell, O(K))
+against Board.outcome (a scan of the whole board, O(N^2 * K)).
+
+Usage (from tic-tac-toe-backend/):
+    python benchmarks/bench_nxn.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.board import Board, default_win_length  # noqa: E402
+
+
+def random_positions(size, win_length, count, seed=0):
+    """(board, last cell) pairs from random games, taken before any win."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = Board(size=size, win_length=win_length)
+        order = list(range(size * size))
+        rng.shuffle(order)
+        for ply, index in enumerate(order):
+            board.play(index, 'X' if ply % 2 == 0 else 'O')
+            if board.outcome_after(index):
+                break
+            positions.append((Board(board.x, board.o, size, win_length), index))
+    return positions[:count]
+
+
+def main(count=2000, repeat=5):
+    print(f"{'board':>9s} {'outcome_after':>15s} {'outcome (scan)':>16s}")
+    for size in (3, 7, 11, 15, 19):
+        win_length = default_win_length(size)
+        positions = random_positions(size, win_length, count)
+
+        def incremental():
+            for board, index in positions:
+                board.outcome_after(index)
+
+        def full_scan():
+            for board, _ in positions:
+                board.outcome()
+
+        incremental_ns = min(timeit.repeat(incremental, number=1, repeat=repeat)) / count * 1e9
+        # The full scan gets slow on big boards; fewer repeats keep the run short
+        scan_ns = min(timeit.repeat(full_scan, number=1, repeat=2)) / count * 1e9
+        label = f"{size}x{size}/{win_length}"
+        print(f"{label:>9s} {incremental_ns:12.0f} ns {scan_ns:13.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
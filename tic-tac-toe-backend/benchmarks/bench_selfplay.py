@@ -0,0 +1,44 @@
+"""
+Throughput benchmark for the rules engine, via headless self-play.
+
+Runs app.simulation on a few board sizes and policies, on one process and
+then on every CPU, and prints games/sec with the per-stage cost per move.
+
+Usage (from tic-tac-toe-backend/):
+    python benchmarks/bench_selfplay.py [games]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.simulation import simulate, np  # noqa: E402
+
+CASES = [
+    # (label, size, x policy, o policy, engine, share of the games)
+    ('3x3 random', 3, 'random', 'random', 'python', 1),
+    ('3x3 table vs random', 3, 'table', 'random', 'python', 1),
+    ('3x3 heuristic vs random', 3, 'heuristic', 'random', 'python', 1),
+    ('15x15 random', 15, 'random', 'random', 'python', 0.05),
+    ('3x3 random (numpy)', 3, 'random', 'random', 'numpy', 1),
+    ('15x15 random (numpy)', 15, 'random', 'random', 'numpy', 0.05),
+]
+
+
+def main(games=200000):
+    cpus = os.cpu_count() or 1
+    print(f"{'case':26s} {'workers':>7s} {'games/s':>10s} {'policy':>9s} {'rules':>9s}  (ns/move)")
+    for label, size, x_policy, o_policy, engine, share in CASES:
+        if engine == 'numpy' and np is None:
+            print(f"{label:26s} skipped, numpy is not installed")
+            continue
+        for workers in sorted({1, cpus}):
+            report = simulate(int(games * share), x_policy, o_policy, size,
+                              engine=engine, workers=workers)
+            stages = report['stages_ns_per_move']
+            print(f"{label:26s} {workers:7d} {report['games_per_sec']:10.0f} "
+                  f"{stages['policy']:9.0f} {stages['rules']:9.0f}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
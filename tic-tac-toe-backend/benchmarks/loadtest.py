@@ -0,0 +1,187 @@
+"""
+Load test: simulated players driving the REST API and Socket.IO on localhost.
+
+Each pair of players registers and logs in through /auth, then plays games
+back to back: X creates a private room through /api/rooms, O joins it, both
+sockets join the game room and they take turns sending random `make_move`
+events. Move latency is the time from a player's `make_move` to the
+`move_applied` event coming back on that player's socket.
+
+Needs aiohttp (python-socketio's asyncio client uses it). Start the server
+against a scratch database first, e.g. with SQLite:
+
+    export DATABASE_URL=sqlite:////tmp/loadtest.db
+    flask --app run.py db upgrade && python run.py
+
+then, from tic-tac-toe-backend/:
+
+    python benchmarks/loadtest.py --players 100 --games 5
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import aiohttp
+import socketio
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []  # Seconds, one per acknowledged move
+        self.events = 0
+        self.errors = {}  # {kind: count}
+        self.games = 0
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Player:
+    """One simulated user: an HTTP session plus a Socket.IO client."""
+
+    def __init__(self, name, args, http, stats):
+        self.name = name
+        self.args = args
+        self.http = http
+        self.stats = stats
+        self.token = None
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.events = asyncio.Queue()  # (event, data) of game events for this player
+        self.sio.on('*', self._on_event)
+
+    async def _on_event(self, event, data=None):
+        self.stats.events += 1
+        if event in ('move_applied', 'game_joined_successfully', 'error'):
+            await self.events.put((event, data))
+
+    async def request(self, method, path, **kwargs):
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+        async with self.http.request(method, self.args.url + path, headers=headers, **kwargs) as resp:
+            return resp.status, await resp.json(content_type=None)
+
+    async def login(self):
+        credentials = {'username': self.name, 'password': 'loadtest'}
+        status, _ = await self.request('POST', '/auth/register', json=credentials)
+        if status not in (201, 409):  # 409: left over from an earlier run
+            self.stats.error(f'register {status}')
+        status, body = await self.request('POST', '/auth/login', json=credentials)
+        if status != 200:
+            raise RuntimeError(f'login failed for {self.name}: {status}')
+        self.token = body['access_token']
+        await self.sio.connect(self.args.url, auth={'token': self.token},
+                               transports=[self.args.transport])
+
+    async def expect(self, wanted, room_id, seq=None):
+        """Waits for `wanted` in room_id (with this seq for move_applied). Returns its data."""
+        deadline = time.perf_counter() + self.args.timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            event, data = await asyncio.wait_for(self.events.get(), remaining)
+            if event == 'error':
+                self.stats.error(f"event: {data.get('message')}")
+                return None
+            if event != wanted:
+                continue
+            if wanted == 'move_applied' and (data['room_id'] != room_id or data['seq'] < seq):
+                continue  # Left over from an earlier move or game
+            if wanted == 'game_joined_successfully' and data['game']['room_id'] != room_id:
+                continue
+            return data
+
+
+async def play_game(x, o, stats, args):
+    status, body = await x.request('POST', '/api/rooms', json={'is_public': False})
+    if status != 201:
+        stats.error(f'create room {status}')
+        return
+    room_id = body['room_id']
+    status, _ = await o.request('POST', f'/api/rooms/{room_id}/join')
+    if status != 200:
+        stats.error(f'join room {status}')
+        return
+    for player in (x, o):
+        await player.sio.emit('join_game_room', {'room_id': room_id})
+        if not await player.expect('game_joined_successfully', room_id):
+            return
+
+    board = [' '] * 9
+    seq, mover, waiting = 0, x, o
+    while True:
+        cell = random.choice([i for i, value in enumerate(board) if value == ' '])
+        if args.think:
+            await asyncio.sleep(random.uniform(0, args.think))
+        sent = time.perf_counter()
+        await mover.sio.emit('make_move', {'room_id': room_id, 'index': cell})
+        delta = await mover.expect('move_applied', room_id, seq + 1)
+        if not delta:
+            return
+        stats.latencies.append(time.perf_counter() - sent)
+        board[delta['index']] = delta['symbol']
+        seq = delta['seq']
+        if delta['status'] != 'active':
+            stats.games += 1
+            return
+        mover, waiting = waiting, mover
+
+
+async def run_pair(x, o, stats, args):
+    for _ in range(args.games):
+        try:
+            await play_game(x, o, stats, args)
+        except asyncio.TimeoutError:
+            stats.error('timeout')
+
+
+async def main(args):
+    stats = Stats()
+    run_id = uuid.uuid4().hex[:6]
+    connector = aiohttp.TCPConnector(limit=args.http_connections)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        players = [Player(f'load_{run_id}_{i}', args, http, stats) for i in range(args.players)]
+
+        started = time.perf_counter()
+        # Log in in waves so the server is not hit by every handshake at once
+        for i in range(0, len(players), args.ramp):
+            await asyncio.gather(*(p.login() for p in players[i:i + args.ramp]))
+        print(f"{len(players)} players logged in and connected in {time.perf_counter() - started:.1f}s")
+
+        stats.events = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(run_pair(players[i], players[i + 1], stats, args)
+                               for i in range(0, len(players) - 1, 2)))
+        elapsed = time.perf_counter() - started
+
+        await asyncio.gather(*(p.sio.disconnect() for p in players))
+
+    moves = len(stats.latencies)
+    print(f"{stats.games} games, {moves} moves in {elapsed:.1f}s "
+          f"({moves / elapsed:.0f} moves/s, {stats.events / elapsed:.0f} events/s received)")
+    print(f"move latency: p50 {stats.percentile(50) * 1000:.1f} ms, "
+          f"p99 {stats.percentile(99) * 1000:.1f} ms, max {max(stats.latencies, default=0) * 1000:.1f} ms")
+    print(f"errors: {sum(stats.errors.values())}")
+    for kind, count in sorted(stats.errors.items(), key=lambda item: -item[1]):
+        print(f"  {count:6d}  {kind}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--players', type=int, default=20, help='Simulated users, paired up')
+    parser.add_argument('--games', type=int, default=3, help='Games each pair plays in a row')
+    parser.add_argument('--think', type=float, default=0.0,
+                        help='Max random delay before each move, in seconds')
+    parser.add_argument('--ramp', type=int, default=50, help='Players logging in at once')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Seconds to wait for a reply')
+    parser.add_argument('--transport', choices=['websocket', 'polling'], default='websocket')
+    parser.add_argument('--http-connections', type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
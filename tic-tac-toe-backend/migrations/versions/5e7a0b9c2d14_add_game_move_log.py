@@ -0,0 +1,30 @@
+"""Add game_move table holding the move history of each game.
+
+Revision ID: 5e7a0b9c2d14
+Revises: 8f2b6c4d1a93
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7a0b9c2d14'
+down_revision = '8f2b6c4d1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('game_move',
+    sa.Column('game_id', sa.Integer(), nullable=False),
+    sa.Column('ply', sa.SmallInteger(), nullable=False),
+    sa.Column('cell', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['game_id'], ['game.id'], ),
+    sa.PrimaryKeyConstraint('game_id', 'ply')
+    )
+
+
+def downgrade():
+    op.drop_table('game_move')
@@ -0,0 +1,28 @@
+"""Add covering indexes on friendship for friend list lookups.
+
+Revision ID: 8f2b6c4d1a93
+Revises: 3c1d9a7e5b42
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2b6c4d1a93'
+down_revision = '3c1d9a7e5b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('friendship', schema=None) as batch_op:
+        batch_op.create_index('ix_friendship_requester_status', ['requester_id', 'status', 'addressee_id'], unique=False)
+        batch_op.create_index('ix_friendship_addressee_status', ['addressee_id', 'status', 'requester_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('friendship', schema=None) as batch_op:
+        batch_op.drop_index('ix_friendship_addressee_status')
+        batch_op.drop_index('ix_friendship_requester_status')
@@ -0,0 +1,32 @@
+"""Add user.is_bot and game.bot_level for games against the bot.
+
+Revision ID: a41d7e3f9c25
+Revises: 5e7a0b9c2d14
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d7e3f9c25'
+down_revision = '5e7a0b9c2d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_bot', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('bot_level', sa.String(length=10), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.drop_column('bot_level')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('is_bot')
@@ -0,0 +1,30 @@
+"""Add game.turn_started_at, game.time_left_x and game.time_left_o for turn clocks.
+
+Revision ID: b62f0d9e4c17
+Revises: e91c3a5d7b48
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b62f0d9e4c17'
+down_revision = 'e91c3a5d7b48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('turn_started_at', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('time_left_x', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('time_left_o', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.drop_column('time_left_o')
+        batch_op.drop_column('time_left_x')
+        batch_op.drop_column('turn_started_at')
@@ -0,0 +1,36 @@
+"""Add game.size and game.win_length and widen game.board for N x N boards.
+
+Revision ID: c7e2f5a8b316
+Revises: a41d7e3f9c25
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2f5a8b316'
+down_revision = 'a41d7e3f9c25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('size', sa.SmallInteger(), nullable=False, server_default='3'))
+        batch_op.add_column(sa.Column('win_length', sa.SmallInteger(), nullable=False, server_default='3'))
+        batch_op.alter_column('board',
+               existing_type=sa.String(length=9),
+               type_=sa.String(length=400),
+               existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.alter_column('board',
+               existing_type=sa.String(length=400),
+               type_=sa.String(length=9),
+               existing_nullable=True)
+        batch_op.drop_column('win_length')
+        batch_op.drop_column('size')
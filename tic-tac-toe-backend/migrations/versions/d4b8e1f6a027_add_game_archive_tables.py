@@ -0,0 +1,64 @@
+"""Add game_archive and game_move_archive tables and an index on game.status, game.created_at.
+
+Revision ID: d4b8e1f6a027
+Revises: c7e2f5a8b316
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e1f6a027'
+down_revision = 'c7e2f5a8b316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('game_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('room_id', sa.String(length=10), nullable=False),
+    sa.Column('player_x_id', sa.Integer(), nullable=True),
+    sa.Column('player_o_id', sa.Integer(), nullable=True),
+    sa.Column('board', sa.String(length=400), nullable=False),
+    sa.Column('size', sa.SmallInteger(), nullable=False),
+    sa.Column('win_length', sa.SmallInteger(), nullable=False),
+    sa.Column('current_turn_player_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=30), nullable=False),
+    sa.Column('is_public', sa.Boolean(), nullable=True),
+    sa.Column('winner_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('bot_level', sa.String(length=10), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['current_turn_player_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['player_o_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['player_x_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['winner_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('game_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_game_archive_room_id'), ['room_id'], unique=False)
+
+    op.create_table('game_move_archive',
+    sa.Column('game_id', sa.Integer(), nullable=False),
+    sa.Column('ply', sa.SmallInteger(), nullable=False),
+    sa.Column('cell', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['game_id'], ['game_archive.id'], ),
+    sa.PrimaryKeyConstraint('game_id', 'ply')
+    )
+
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.create_index('ix_game_status_created_at', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.drop_index('ix_game_status_created_at')
+
+    op.drop_table('game_move_archive')
+    with op.batch_alter_table('game_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_game_archive_room_id'))
+
+    op.drop_table('game_archive')
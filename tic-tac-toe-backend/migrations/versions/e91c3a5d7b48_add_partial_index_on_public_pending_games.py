@@ -0,0 +1,28 @@
+"""Add a partial index on public pending games by created_at.
+
+Revision ID: e91c3a5d7b48
+Revises: d4b8e1f6a027
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91c3a5d7b48'
+down_revision = 'd4b8e1f6a027'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.create_index('ix_game_public_pending', ['is_public', 'status', 'created_at'], unique=False,
+                              postgresql_where=sa.text("is_public AND status = 'pending'"),
+                              sqlite_where=sa.text("is_public = 1 AND status = 'pending'"))
+
+
+def downgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.drop_index('ix_game_public_pending')
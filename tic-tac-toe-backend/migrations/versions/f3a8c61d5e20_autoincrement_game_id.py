@@ -0,0 +1,36 @@
+"""Make game.id AUTOINCREMENT on SQLite so ids of archived games are never reused.
+
+Revision ID: f3a8c61d5e20
+Revises: b62f0d9e4c17
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c61d5e20'
+down_revision = 'b62f0d9e4c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # game_archive keeps the id a game had in `game`. Without AUTOINCREMENT SQLite
+    # hands out max(id) + 1 again once the newest game is archived. Other backends
+    # use sequences, which never go back.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('game', recreate='always', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+    # Continue after every id handed out so far, archived ones included
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'game'")
+    op.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'game', coalesce(max(id), 0) FROM "
+               "(SELECT max(id) AS id FROM game UNION ALL SELECT max(id) FROM game_archive)")
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('game', recreate='always', table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
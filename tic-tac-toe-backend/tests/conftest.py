@@ -0,0 +1,67 @@
+import fakeredis
+import pytest
+
+from app import create_app, db
+from app.config import Config
+from app.models import User, Game
+from app.state_store import InMemoryBackend, RedisBackend
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SOCKETIO_ASYNC_MODE = 'threading'
+    STATE_STORE_URL = 'memory://'
+    # Background loops stay asleep; tests call flush() and friends themselves
+    GAME_FLUSH_INTERVAL = 3600
+    MAINTENANCE_INTERVAL = 0
+    TURN_SECONDS = 0
+    GAME_CLOCK_SECONDS = 0
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    TestConfig.GAME_JOURNAL_PATH = str(tmp_path_factory.mktemp('journal') / 'moves.journal')
+    TestConfig.BOT_TABLE_PATH = str(tmp_path_factory.mktemp('bot') / 'bot_table.bin')
+    return create_app(TestConfig)
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def make_backend(kind):
+    if kind == 'memory':
+        return InMemoryBackend()
+    # A server per backend, so tests never see each other's keys
+    return RedisBackend(None, client=fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True))
+
+
+@pytest.fixture
+def new_backend():
+    """make_backend(), for tests that need a specific backend or two workers on one store."""
+    return make_backend
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def backend(request):
+    """Every test using this runs once per state store backend."""
+    return make_backend(request.param)
+
+
+@pytest.fixture
+def active_game(app_context):
+    """An active 3x3 game between two users: (game, x_id, o_id)."""
+    x, o = User(username='xavier', password_hash='-'), User(username='olga', password_hash='-')
+    db.session.add_all([x, o])
+    db.session.commit()
+    game = Game(room_id='ROOM01', player_x_id=x.id, player_o_id=o.id, current_turn_player_id=x.id,
+                board=' ' * 9, status='active', is_public=True)
+    db.session.add(game)
+    db.session.commit()
+    return game, x.id, o.id
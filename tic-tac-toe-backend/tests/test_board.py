@@ -0,0 +1,65 @@
+"""Board: the string format and outcomes on N x N boards with K in a row."""
+import pytest
+
+from app.board import Board, DRAW, default_win_length, outcome_of
+
+
+def play(board, moves):
+    """Plays (cell, symbol) moves; returns outcome_after() of the last one."""
+    outcome = None
+    for cell, symbol in moves:
+        board.play(cell, symbol)
+        outcome = board.outcome_after(cell)
+    return outcome
+
+
+def test_string_round_trip():
+    board_str = 'XO  ' ' X  ' '  O ' '   X'
+    board = Board.from_string(board_str)
+    assert (board.size, board.win_length, board.ply()) == (4, 4, 5)
+    assert board.to_string() == board_str
+    assert not board.is_empty(0) and board.is_empty(2)
+    assert Board.from_string(board_str, win_length=3) != board
+
+
+def test_default_win_length():
+    assert [default_win_length(n) for n in (3, 4, 5, 6, 15)] == [3, 4, 5, 5, 5]
+
+
+@pytest.mark.parametrize('cells', [
+    (6, 7, 8, 9),      # Row
+    (2, 7, 12, 17),    # Column
+    (0, 6, 12, 18),    # Diagonal
+    (9, 13, 17, 21),   # Anti-diagonal
+])
+def test_k_in_a_row_wins_in_every_direction(cells):
+    board = Board(size=5, win_length=4)
+    *first, last = cells
+    assert play(board, [(cell, 'O') for cell in first]) is None  # One short
+    board.play(last, 'O')
+    # The winning cell may be anywhere in the line, not only at its end
+    assert board.outcome_after(last) == 'O'
+    assert board.outcome_after(cells[1]) == 'O'
+    assert board.outcome() == 'O'
+
+
+def test_lines_do_not_wrap_around_the_edge():
+    board = Board(size=5, win_length=4)
+    assert play(board, [(3, 'X'), (4, 'X'), (5, 'X'), (6, 'X')]) is None  # End of row 0, start of row 1
+    assert play(Board(size=5, win_length=4), [(3, 'X'), (9, 'X'), (15, 'X'), (21, 'X')]) is None
+    assert board.outcome() is None
+
+
+def test_full_board_without_a_line_is_a_draw():
+    board_str = 'XXOO' 'OOXX' 'XXOO' 'OOXX'
+    board = Board.from_string(board_str)
+    assert board.outcome() == DRAW
+    assert board.outcome_after(15) == DRAW
+
+
+def test_classic_board_uses_the_table():
+    assert outcome_of('XXXOO    ') == 'X'
+    assert outcome_of('XOXXOOOXX') == DRAW
+    assert outcome_of('XO       ') is None
+    board = Board.from_string('O X O X O')
+    assert board.outcome_after(8) == board.outcome() == 'O'
@@ -0,0 +1,69 @@
+"""The bot opponent: its user row and its moves."""
+import random
+
+import pytest
+
+from app.board import Board, DRAW
+from app.bot import OpponentBot
+from app.models import db, User
+
+
+@pytest.fixture
+def opponent(app_context):
+    opponent = OpponentBot()
+    opponent.init_app(app_context)
+    return opponent
+
+
+def test_bot_user_is_created_once(opponent):
+    bot_id = opponent.user_id
+    assert db.session.get(User, bot_id).is_bot
+    assert OpponentBot().user_id == bot_id  # Another worker finds the same row
+    assert User.query.filter_by(is_bot=True).count() == 1
+
+
+def test_bot_name_taken_by_a_player(opponent):
+    db.session.add_all([User(username='TicTacBot', password_hash='-'),
+                        User(username='TicTacBot 2', password_hash='-')])
+    db.session.commit()
+    bot = db.session.get(User, opponent.user_id)
+    assert (bot.username, bot.is_bot) == ('TicTacBot 3', True)
+    assert opponent.username == 'TicTacBot 3'
+
+
+def test_register_reserves_the_bot_name(app_context):
+    client = app_context.test_client()
+    response = client.post('/auth/register', json={'username': 'tictacbot', 'password': 'secret'})
+    assert response.status_code == 409
+    assert client.post('/auth/register', json={'username': 'alice', 'password': 'secret'}).status_code == 201
+
+
+def test_table_scores(opponent):
+    assert opponent.score(Board()) == 0  # Perfect play draws
+    assert opponent.score(Board.from_string('XX OO    ')) > 0  # X to move and win
+    # O lost to a diagonal after 5 moves: the later the loss, the better the score
+    assert opponent.score(Board.from_string('XO  X O X')) == -(10 - 5)
+
+
+def test_hard_takes_a_win_and_blocks_one(opponent):
+    assert opponent.choose_move(Board.from_string('XX OO    '), 'X') == 2
+    assert opponent.choose_move(Board.from_string('XX O     '), 'O') == 2
+    assert opponent.choose_move(Board.from_string('XOXXOOOXX'), 'X') is None
+
+
+def test_hard_against_itself_always_draws(opponent):
+    for _ in range(5):
+        board, symbol = Board(), 'X'
+        while board.outcome() is None:
+            board.play(opponent.choose_move(board, symbol), symbol)
+            symbol = 'O' if symbol == 'X' else 'X'
+        assert board.outcome() == DRAW
+
+
+def test_levels_mix_in_random_moves(opponent, monkeypatch):
+    board = Board.from_string('XX OO    ')  # Only cell 2 wins for X
+    monkeypatch.setattr(random, 'random', lambda: 0.5)
+    monkeypatch.setattr(random, 'choice', lambda cells: cells[-1])
+    assert opponent.choose_move(board, 'X', 'easy') == 8  # 0.5 < 0.6: any legal move
+    assert opponent.choose_move(board, 'X', 'medium') == 2
+    assert opponent.choose_move(board, 'X', 'hard') == 2
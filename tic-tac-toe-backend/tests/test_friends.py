@@ -0,0 +1,60 @@
+"""GET /api/friends: paging and the version-based ETag."""
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import presence
+from app.models import db, Friendship, User
+
+
+@pytest.fixture
+def friends(app_context):
+    """Alice with accepted friends carol, Bob and dave (and a pending request from erin)."""
+    users = [User(username=name, password_hash='-') for name in ('alice', 'carol', 'Bob', 'dave', 'erin')]
+    db.session.add_all(users)
+    db.session.commit()
+    alice, carol, bob, dave, erin = users
+    db.session.add_all([
+        Friendship(requester_id=alice.id, addressee_id=carol.id, status='accepted'),
+        Friendship(requester_id=bob.id, addressee_id=alice.id, status='accepted'),
+        Friendship(requester_id=dave.id, addressee_id=alice.id, status='accepted'),
+        Friendship(requester_id=erin.id, addressee_id=alice.id, status='pending'),
+    ])
+    db.session.commit()
+    presence.invalidate(*(user.id for user in users))  # Ids are reused across tests
+    return {user.username: user.id for user in users}
+
+
+def get(client, user_id, query='', etag=None):
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+    if etag:
+        headers['If-None-Match'] = etag
+    return client.get(f'/api/friends{query}', headers=headers)
+
+
+def test_pages_are_ordered_by_username(app_context, friends):
+    client = app_context.test_client()
+    response = get(client, friends['alice'], '?offset=1&limit=1')
+    assert [friend['username'] for friend in response.json] == ['carol']
+    assert response.headers['X-Total-Count'] == '3'
+    response = get(client, friends['alice'])
+    assert [friend['username'] for friend in response.json] == ['Bob', 'carol', 'dave']
+    assert not any(friend['online'] for friend in response.json)
+
+
+def test_etag_follows_the_friend_list_version(app_context, friends):
+    client = app_context.test_client()
+    etag = get(client, friends['alice']).headers['ETag']
+    assert get(client, friends['alice'], etag=etag).status_code == 304
+
+    # A friend coming online changes the list's online flags
+    presence.announce(friends['carol'], 'carol', True)
+    response = get(client, friends['alice'], etag=etag)
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    etag = response.headers['ETag']
+
+    request_id = Friendship.query.filter_by(requester_id=friends['erin']).one().id
+    response = client.post(f'/api/friends/respond_request/{request_id}', json={'status': 'accepted'},
+                           headers={'Authorization': f'Bearer {create_access_token(identity=str(friends["alice"]))}'})
+    assert response.status_code == 200
+    response = get(client, friends['alice'], etag=etag)
+    assert response.status_code == 200 and response.headers['X-Total-Count'] == '4'
@@ -0,0 +1,169 @@
+"""GameRegistry write-behind persistence, with a local store (journal) and a shared one (Redis)."""
+import time
+
+import pytest
+
+import app
+from app.game_engine import GameRegistry, MoveError
+from app.leaderboard import Leaderboard
+from app.models import db, Game, GameMove, User
+from app.timers import Scheduler
+
+# X takes the top row
+X_WINS = [(0, 'x'), (3, 'o'), (1, 'x'), (4, 'o'), (2, 'x')]
+
+
+@pytest.fixture
+def make_registry(app_context, tmp_path):
+    app_context.config['GAME_JOURNAL_PATH'] = str(tmp_path / 'moves.journal')
+
+    def make(store):
+        scheduler = Scheduler()
+        scheduler.init_app(app_context)
+        registry = GameRegistry(store, scheduler)
+        registry.init_app(app_context)
+        return registry
+    return make
+
+
+def play(registry, game, x_id, o_id, moves):
+    players = {'x': x_id, 'o': o_id}
+    for cell, player in moves:
+        registry.apply_move(game.room_id, players[player], cell)
+
+
+def reloaded(game):
+    db.session.expire_all()
+    return db.session.get(Game, game.id)
+
+
+def test_flush_writes_moves_and_wins_then_evicts(backend, make_registry, active_game):
+    game, x_id, o_id = active_game
+    registry = make_registry(backend)
+    play(registry, game, x_id, o_id, X_WINS)
+    assert registry.pending_moves(game.id)[-1] == {'game_id': game.id, 'ply': 5, 'cell': 2}
+    assert reloaded(game).status == 'active'  # Nothing written before the flush
+
+    assert registry.flush() == 1
+    row = reloaded(game)
+    assert (row.status, row.board, row.winner_id) == ('finished_x_wins', 'XXXOO    ', x_id)
+    assert [(m.ply, m.cell) for m in GameMove.query.order_by(GameMove.ply)] == \
+        [(1, 0), (2, 3), (3, 1), (4, 4), (5, 2)]
+    assert db.session.get(User, x_id).wins == 1
+    # Finished games leave the registry once flushed
+    assert registry.get_cached(game.room_id) is None and registry.count() == 0
+    assert registry.flush() == 0
+
+
+def test_failed_flush_is_retried(backend, make_registry, active_game, monkeypatch):
+    game, x_id, o_id = active_game
+    registry = make_registry(backend)
+    play(registry, game, x_id, o_id, X_WINS)
+
+    def fail():
+        raise RuntimeError('database went away')
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, 'commit', fail)
+        with pytest.raises(RuntimeError):
+            registry.flush()
+
+    assert registry.get_cached(game.room_id).status == 'finished_x_wins'
+    assert registry.flush() == 1
+    assert reloaded(game).status == 'finished_x_wins'
+    assert GameMove.query.count() == 5 and db.session.get(User, x_id).wins == 1
+
+
+@pytest.mark.parametrize('ranked_first', [False, True])
+def test_recovered_wins_reach_the_leaderboard(make_registry, active_game, new_backend, monkeypatch,
+                                              ranked_first):
+    game, x_id, o_id = active_game
+    ranking = Leaderboard(new_backend('memory'))
+    monkeypatch.setattr(app, 'leaderboard', ranking)
+    crashed = make_registry(new_backend('memory'))
+    play(crashed, game, x_id, o_id, X_WINS)  # Journaled, never flushed
+
+    if ranked_first:
+        assert ranking.rank(x_id)[1] == 0  # Read before the journal is replayed
+    make_registry(new_backend('memory')).start()
+    assert ranking.rank(x_id) == (1, 1) and ranking.rank(o_id) == (2, 0)
+
+def test_move_on_game_evicted_by_another_worker(backend, make_registry, active_game):
+    game, x_id, o_id = active_game
+    registry = make_registry(backend)
+    live = registry.get(game.room_id)
+    # Another worker finishes and evicts the game between get() and the room lock
+    registry.get = lambda room_id: live
+    if backend.shared:
+        backend.hdel(GameRegistry.LIVE, game.room_id)
+    else:
+        registry._games.pop(game.room_id)
+    with pytest.raises(MoveError, match='Game is not active.'):
+        registry.apply_move(game.room_id, x_id, 0)
+    assert registry.forfeit(game.room_id, x_id) is None
+
+
+def test_shared_state_survives_a_worker_restart(make_registry, active_game, new_backend):
+    game, x_id, o_id = active_game
+    store = new_backend('redis')
+    play(make_registry(store), game, x_id, o_id, X_WINS[:3])
+
+    # A fresh worker on the same store sees the game and flushes the first worker's moves
+    restarted = make_registry(store)
+    assert restarted.get_cached(game.room_id).board_str == 'XX O     '
+    restarted.apply_move(game.room_id, o_id, 4)
+    assert restarted.flush() == 1
+    assert reloaded(game).board == 'XX OO    '
+    assert GameMove.query.count() == 4
+
+
+def test_local_journal_is_recovered_after_a_crash(make_registry, active_game, new_backend):
+    game, x_id, o_id = active_game
+    crashed = make_registry(new_backend('memory'))
+    play(crashed, game, x_id, o_id, X_WINS)  # Journaled, never flushed
+
+    recovered = make_registry(new_backend('memory'))
+    recovered.get(game.room_id)  # First use replays the journal
+    row = reloaded(game)
+    assert (row.status, row.board) == ('finished_x_wins', 'XXXOO    ')
+    assert GameMove.query.count() == 5 and db.session.get(User, x_id).wins == 1
+
+
+
+@pytest.mark.parametrize('crash', [False, True])
+def test_reloaded_game_resumes_its_turn_clock(app_context, make_registry, active_game, new_backend,
+                                              monkeypatch, crash):
+    game, x_id, o_id = active_game
+    monkeypatch.setitem(app_context.config, 'TURN_SECONDS', 30)
+    monkeypatch.setitem(app_context.config, 'GAME_CLOCK_SECONDS', 60)
+    registry = make_registry(new_backend('memory'))
+    live, _ = registry.apply_move(game.room_id, x_id, 4)
+    started, deadline, clock = live.turn_started_at, live.turn_deadline, dict(live.clock)
+    if not crash:
+        registry.flush()  # Otherwise only the journal has it
+
+    # After a restart the turn continues from when it started, not from the reload
+    restarted = make_registry(new_backend('memory'))
+    live = restarted.get(game.room_id)
+    assert (live.turn_started_at, live.turn_deadline, live.clock) == (started, deadline, clock)
+
+
+def test_sweep_runs_the_clocks_of_games_nobody_loaded(app_context, make_registry, active_game, backend,
+                                                      new_backend, monkeypatch):
+    game, x_id, o_id = active_game  # Activated without being loaded, like an HTTP join
+    monkeypatch.setitem(app_context.config, 'TURN_SECONDS', 30)
+    registry = make_registry(backend)
+    start = time.time()
+
+    assert registry.sweep_clocks(start) == ([], [])  # The turn starts now
+    assert reloaded(game).turn_started_at == start
+    # Due before the next sweep: loaded, so its own timer ends it on time
+    assert registry.sweep_clocks(start + 26) == ([], [game.room_id])
+    assert registry.get_cached(game.room_id).turn_deadline == round(start + 30, 3)
+
+    # A worker that never loaded it ends it once it is overdue, crediting the winner
+    other = make_registry(new_backend('memory'))
+    assert other.sweep_clocks(start + 31) == ([game.room_id], [])
+    row = reloaded(game)
+    assert (row.status, row.winner_id) == ('finished_o_wins', o_id)
+    assert db.session.get(User, o_id).wins == 1
+    assert other.sweep_clocks(start + 40) == ([], [])
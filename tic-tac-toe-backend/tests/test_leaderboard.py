@@ -0,0 +1,46 @@
+"""Leaderboard: rebuilding from the DB, counting wins, ranks and pages."""
+import pytest
+
+from app.leaderboard import Leaderboard
+from app.models import db, User
+
+
+@pytest.fixture
+def players(app_context):
+    users = [User(username='ann', password_hash='-', wins=5),
+             User(username='ben', password_hash='-', wins=2),
+             User(username='cat', password_hash='-', wins=9),
+             User(username='TicTacBot', password_hash='!', wins=40, is_bot=True)]
+    db.session.add_all(users)
+    db.session.commit()
+    return {user.username: user.id for user in users}
+
+
+def test_first_read_rebuilds_from_the_db(backend, players):
+    board = Leaderboard(backend)
+    assert [(entry['username'], entry['wins']) for entry in board.page()] == [('cat', 9), ('ann', 5), ('ben', 2)]
+    assert board.rank(players['ann']) == (2, 5)
+    assert board.rank(players['TicTacBot']) == (None, None)  # The bot is not ranked
+
+
+def test_wins_move_players_up(backend, players):
+    board = Leaderboard(backend)
+    board.add_win(players['ben'], 4)
+    board.add_win(players['TicTacBot'])
+    board.add_win(None)
+    assert board.rank(players['ben']) == (2, 6)
+    assert board.rank(players['ann']) == (3, 5)
+    assert board.rank(players['TicTacBot']) == (None, None)
+
+    board.add_user(99, 'dan')
+    assert board.rank(99) == (4, 0)
+    board.add_win(99, 10)
+    assert board.page(offset=0, limit=2) == [{'rank': 1, 'username': 'dan', 'wins': 10},
+                                            {'rank': 2, 'username': 'cat', 'wins': 9}]
+    assert board.page(offset=3, limit=5) == [{'rank': 4, 'username': 'ann', 'wins': 5}]
+
+
+def test_a_store_with_a_ranking_is_not_rebuilt(backend, players):
+    Leaderboard(backend).add_win(players['ben'], 10)
+    # Another worker on the same store reads the ranking as it is
+    assert Leaderboard(backend).rank(players['ben']) == (1, 12)
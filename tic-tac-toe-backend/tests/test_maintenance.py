@@ -0,0 +1,52 @@
+"""Maintenance passes: expiring old pending rooms and archiving old finished games."""
+import datetime
+
+from app import maintenance
+from app.models import db, ArchivedGame, ArchivedGameMove, Game, GameMove, User
+from app.room_routes import find_archived_game
+
+NOW = datetime.datetime(2026, 10, 17, 12, 0)
+OLD = NOW - datetime.timedelta(days=2)
+
+
+def add_game(room_id, status, created_at, host_id, moves=()):
+    game = Game(room_id=room_id, player_x_id=host_id, status=status, is_public=True,
+                created_at=created_at, board='X' * len(moves) + ' ' * (9 - len(moves)))
+    db.session.add(game)
+    db.session.commit()
+    db.session.add_all([GameMove(game_id=game.id, ply=ply, cell=cell) for ply, cell in enumerate(moves, 1)])
+    db.session.commit()
+    return game.id
+
+
+def test_pass_expires_pending_rooms_and_archives_finished_games(app_context):
+    host = User(username='host', password_hash='-')
+    db.session.add(host)
+    db.session.commit()
+    add_game('STALE1', 'pending', OLD, host.id)
+    add_game('FRESH1', 'pending', NOW, host.id)
+    add_game('ACTIV1', 'active', OLD, host.id)
+    done = add_game('DONE01', 'draw', OLD, host.id, moves=[4, 0])
+
+    assert maintenance.run_pass(NOW) == (1, 1)
+    assert sorted(room_id for room_id, in db.session.query(Game.room_id)) == ['ACTIV1', 'FRESH1']
+    archived = find_archived_game('DONE01')
+    assert (archived.id, archived.status) == (done, 'draw')
+    assert [(m.ply, m.cell) for m in ArchivedGameMove.query.filter_by(game_id=done)] == [(1, 4), (2, 0)]
+    assert GameMove.query.count() == 0
+    assert maintenance.run_pass(NOW) == (0, 0)
+
+
+def test_archived_ids_are_not_reused(app_context):
+    host = User(username='host', password_hash='-')
+    db.session.add(host)
+    db.session.commit()
+    first = add_game('ROOM01', 'draw', OLD, host.id)
+    maintenance.run_pass(NOW)  # Archives the newest game
+
+    # The same room code comes back with a new game, archived in turn
+    second = add_game('ROOM01', 'finished_x_wins', OLD, host.id, moves=[0])
+    assert second > first
+    assert maintenance.run_pass(NOW) == (0, 1)
+    assert ArchivedGame.query.count() == 2
+    assert find_archived_game('ROOM01').id == second
@@ -0,0 +1,87 @@
+"""Matchmaking ticks racing with cancels and re-enqueues, on both state store backends."""
+import pytest
+
+from app.matchmaking import Matchmaker
+from app.models import db, Game, User
+
+
+@pytest.fixture
+def players(app_context):
+    users = [User(username=f'player{i}', password_hash='-') for i in range(3)]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+@pytest.fixture
+def matchmaker(backend, app_context):
+    matchmaker = Matchmaker(backend)
+    matchmaker.init_app(app_context)
+    matchmaker._started = True  # Ticks are run by the tests
+    return matchmaker
+
+
+def during_pairing(matchmaker, monkeypatch, action):
+    """Runs action() while the next tick is pairing its claimed entries."""
+    pair = matchmaker.pair
+
+    def pair_then_act(entries, now):
+        result = pair(entries, now)
+        action()
+        return result
+    monkeypatch.setattr(matchmaker, 'pair', pair_then_act)
+
+
+def games_of(user_id):
+    return Game.query.filter((Game.player_x_id == user_id) | (Game.player_o_id == user_id)).count()
+
+
+def test_tick_pairs_and_keeps_the_odd_one_out(matchmaker, players):
+    for user_id in players:
+        matchmaker.enqueue(user_id, f'u{user_id}', 0)
+    assert matchmaker.tick() == 1
+    assert Game.query.count() == 1
+    waiting = [user_id for user_id in players if user_id in matchmaker]
+    assert len(waiting) == 1 and games_of(waiting[0]) == 0
+
+
+def test_cancel_during_a_tick_takes_effect(matchmaker, players, monkeypatch):
+    a, b, _ = players
+    matchmaker.enqueue(a, 'a', 0)
+    matchmaker.enqueue(b, 'b', 0)
+    cancelled = []
+    during_pairing(matchmaker, monkeypatch, lambda: cancelled.append(matchmaker.cancel(a)))
+
+    assert matchmaker.tick() == 0
+    assert cancelled == [True]
+    assert games_of(a) == 0 and a not in matchmaker
+    assert b in matchmaker  # Back in the queue for the next tick
+
+
+def test_enqueue_during_a_tick_is_not_overwritten(matchmaker, players, monkeypatch):
+    a = players[0]
+    matchmaker.enqueue(a, 'a', 0)
+    during_pairing(matchmaker, monkeypatch, lambda: matchmaker.enqueue(a, 'a', 42))
+
+    assert matchmaker.tick() == 0
+    queued = matchmaker._store.hgetall(Matchmaker.QUEUE)
+    assert list(queued) == [str(a)] and '"wins": 42' in queued[str(a)]
+
+
+def test_pairs_go_back_to_the_queue_when_their_games_fail_to_commit(matchmaker, players, monkeypatch):
+    a, b, _ = players
+    matchmaker.enqueue(a, 'a', 0)
+    matchmaker.enqueue(b, 'b', 0)
+
+    def fail():
+        raise RuntimeError('room code taken meanwhile')
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, 'commit', fail)
+        with pytest.raises(RuntimeError):
+            matchmaker.tick()
+
+    assert Game.query.count() == 0
+    assert a in matchmaker and b in matchmaker
+    assert matchmaker._store.hgetall(Matchmaker.CLAIMED) == {}
+    assert matchmaker.tick() == 1 and games_of(a) == games_of(b) == 1
+    assert a not in matchmaker and b not in matchmaker
@@ -0,0 +1,34 @@
+"""PublicRoomIndex keyset pages, on both state store backends."""
+import datetime
+import json
+
+from app.models import db, Game, User
+from app.public_rooms import PublicRoomIndex
+
+
+def test_pages_include_rooms_created_at_the_same_time(app_context, backend):
+    host = User(username='host', password_hash='-')
+    db.session.add(host)
+    db.session.commit()
+    # Rooms sharing a created_at straddle page boundaries
+    same = datetime.datetime(2026, 10, 17, 12, 0, 0, 250000)
+    created = {'R5': same, 'R1': same, 'R3': same, 'R4': same - datetime.timedelta(seconds=1),
+               'R2': same + datetime.timedelta(seconds=1)}
+    db.session.add_all([Game(room_id=room_id, player_x_id=host.id, status='pending', is_public=True,
+                             created_at=created_at) for room_id, created_at in created.items()])
+    db.session.commit()
+    index = PublicRoomIndex(backend)
+    assert index.rebuild() == 5
+
+    seen, after, after_id = [], None, None
+    while True:
+        page = json.loads(index.page(after, after_id, limit=2))
+        seen += [room['room_id'] for room in page['rooms']]
+        if not page['next']:
+            break
+        after, after_id = datetime.datetime.fromisoformat(page['next']['after']), page['next']['after_id']
+    assert seen == ['R4', 'R1', 'R3', 'R5', 'R2']
+
+    snapshot = json.loads(index.snapshot(limit=3))
+    assert [room['room_id'] for room in snapshot['rooms']] == ['R4', 'R1', 'R3']
+    assert snapshot['next'] == {'after': same.isoformat(), 'after_id': 'R3'}
@@ -0,0 +1,85 @@
+"""ReconnectGrace: holding, resuming and forfeiting the games of players who left."""
+import time
+
+import pytest
+
+from app import live_games, sessions
+from app.models import db, Game, User
+from app.reconnect import ReconnectGrace
+from app.timers import Scheduler
+
+
+@pytest.fixture
+def grace(app_context, new_backend):
+    scheduler = Scheduler()
+    scheduler._started = True  # Timers are expired by the tests
+    scheduler.init_app(app_context)
+    grace = ReconnectGrace(new_backend('memory'), scheduler)
+    grace.init_app(app_context)
+    return grace
+
+
+@pytest.fixture
+def players(app_context):
+    users = [User(username=name, password_hash='-') for name in ('xavier', 'olga', 'pat')]
+    db.session.add_all(users)
+    db.session.commit()
+    yield [user.id for user in users]
+    for user in users:
+        sessions.remove(f'sid-{user.id}')
+
+
+def add_game(room_id, x_id, o_id, bot_level=None):
+    db.session.add(Game(room_id=room_id, player_x_id=x_id, player_o_id=o_id, current_turn_player_id=x_id,
+                        board=' ' * 9, status='active', is_public=False, bot_level=bot_level))
+    db.session.commit()
+
+
+def status(room_id):
+    live = live_games.get_cached(room_id)
+    return live.status if live else db.session.query(Game.status).filter_by(room_id=room_id).scalar()
+
+
+def test_resume_cancels_the_forfeit(grace):
+    grace.hold(7, ['ROOM01'])
+    assert 7 in grace and grace._scheduler.pending() == 1
+    assert grace.resume(7) == ['ROOM01']
+    assert 7 not in grace and grace._scheduler.pending() == 0
+    assert grace.resume(7) is None
+
+
+def test_expired_grace_forfeits_only_the_held_rooms(grace, players):
+    x, o, p = players
+    add_game('RCHELD', x, o)
+    add_game('RCOTHR', x, p)  # Left from another tab; not held
+    sessions.add(o, f'sid-{o}')
+    sessions.add(p, f'sid-{p}')
+    grace.hold(x, ['RCHELD'])
+    assert grace.forfeit_expired([x]) == 0 and x in grace  # Not due yet
+
+    grace.grace = 0
+    grace.hold(x, ['RCHELD'])
+    grace._scheduler.run_due(time.time() + 1)
+    assert x not in grace
+    assert status('RCHELD') == 'finished_o_wins'
+    assert status('RCOTHR') == 'active'
+
+
+def test_no_forfeit_when_both_players_are_away(grace, players):
+    x, o, _ = players
+    add_game('RCBOTH', x, o)
+    grace.grace = 0
+    grace.hold(x, ['RCBOTH'])
+    grace.hold(o, ['RCBOTH'])
+    grace._scheduler.run_due(time.time() + 1)
+    assert x not in grace and o not in grace
+    assert status('RCBOTH') == 'active'
+
+
+def test_games_against_the_bot_are_still_forfeited(grace, players):
+    x, o, _ = players  # o stands in for the bot, which never has a socket
+    add_game('RCBOT1', x, o, bot_level='easy')
+    grace.grace = 0
+    grace.hold(x, ['RCBOT1'])
+    grace._scheduler.run_due(time.time() + 1)
+    assert status('RCBOT1') == 'finished_o_wins'
@@ -0,0 +1,122 @@
+"""Both state store backends must behave the same; every test runs on each."""
+import threading
+
+import pytest
+
+from app.sessions import SessionRegistry
+from app.state_store import SharedDict
+
+
+def test_hashes(backend):
+    backend.hset('h', 'a', '1')
+    backend.hsetmany('h', {'b': '2', 'c': '3'})
+    assert backend.hget('h', 'a') == '1'
+    assert backend.hmget('h', ['a', 'missing', 'c']) == ['1', None, '3']
+    assert backend.hincrby('h', 'a', 4) == 5
+    assert backend.hexists('h', 'b') and not backend.hexists('h', 'missing')
+    assert backend.hdel('h', 'b', 'missing') == 1
+    assert backend.hgetall('h') == {'a': '5', 'c': '3'}
+    assert backend.hlen('h') == 2
+    assert backend.hpopall('h') == {'a': '5', 'c': '3'}
+    assert backend.hgetall('h') == {} and backend.hpopall('h') == {}
+
+
+def test_sets(backend):
+    assert backend.sadd('s', 'a', 'b', 'a') == 2
+    assert backend.srem('s', 'a', 'missing') == 1
+    assert backend.smembers('s') == {'b'} and backend.scard('s') == 1
+    assert backend.spopall('s') == {'b'}
+    assert backend.scard('s') == 0 and backend.spopall('s') == set()
+
+
+def test_hpopall_and_spopall_lose_nothing_to_concurrent_writers(backend):
+    writers, per_writer = 4, 250
+    popped_fields, popped_members = {}, set()
+    done = threading.Event()
+
+    def write(n):
+        for i in range(per_writer):
+            backend.hset('h', f'{n}:{i}', '1')
+            backend.sadd('s', f'{n}:{i}')
+
+    def drain():
+        while not done.is_set():
+            popped_fields.update(backend.hpopall('h'))
+            popped_members.update(backend.spopall('s'))
+
+    drainer = threading.Thread(target=drain)
+    drainer.start()
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    drainer.join()
+    popped_fields.update(backend.hpopall('h'))
+    popped_members.update(backend.spopall('s'))
+
+    # Every write lands in exactly one pop: none lost between the read and the delete
+    assert len(popped_fields) == len(popped_members) == writers * per_writer
+
+
+def test_sorted_sets(backend):
+    backend.zadd('z', {'a': 3, 'b': 1, 'c': 2, 'd': 3})
+    assert backend.zincrby('z', 2, 'b') == 3
+    assert backend.zscore('z', 'b') == 3 and backend.zscore('z', 'missing') is None
+    # Equal scores are ordered by member; reversed for the zrev* reads
+    assert backend.zrevrange('z', 0, 10) == [('d', 3), ('b', 3), ('a', 3), ('c', 2)]
+    assert backend.zrevrange('z', 1, 2) == [('b', 3), ('a', 3)]
+    assert [backend.zrevrank('z', m) for m in 'dbac'] == [0, 1, 2, 3]
+    assert backend.zrevrank('z', 'missing') is None
+    assert backend.zcard('z') == 4
+    assert backend.zrem('z', 'a', 'missing') == 1
+    assert backend.zrevrange('z', 0, 10) == [('d', 3), ('b', 3), ('c', 2)]
+
+
+def test_zrangebyscore(backend):
+    backend.zadd('z', {'a': 1.5, 'b': 2.0, 'c': 2.0, 'd': 3.25, 'e': 10})
+    assert backend.zrangebyscore('z', float('-inf'), 2) == [('a', 1.5), ('b', 2.0)]
+    assert backend.zrangebyscore('z', 1.5, 3) == [('a', 1.5), ('b', 2.0), ('c', 2.0)]
+    assert backend.zrangebyscore('z', 2.0, 10) == [('b', 2.0), ('c', 2.0), ('d', 3.25), ('e', 10)]
+    assert backend.zrangebyscore('z', 2.0, 2, offset=1) == [('c', 2.0), ('d', 3.25)]
+    assert backend.zrangebyscore('z', 10, 5) == [('e', 10)]
+    assert backend.zrangebyscore('z', 10.5, 5) == []
+    assert backend.zrangebyscore('missing', float('-inf'), 5) == []
+
+
+def test_delete(backend):
+    backend.hset('k', 'f', 'v')
+    backend.delete('k')
+    assert backend.hgetall('k') == {}
+
+
+def test_shared_dict(backend):
+    players = SharedDict(backend, 'lobby:ready', key_type=int)
+    players[1] = 'alice'
+    players['2'] = 'bob'
+    assert players[2] == 'bob' and 1 in players and '1' in players
+    assert 3 not in players and 'not a number' not in players
+    assert sorted(players.items()) == [(1, 'alice'), (2, 'bob')]
+    assert sorted(players) == [1, 2] and len(players) == 2
+    del players[1]
+    assert list(players) == [2]
+    with pytest.raises(KeyError):
+        del players[1]
+
+
+def test_session_registry(backend):
+    sessions = SessionRegistry(backend)
+    assert sessions.add(7, 'sid-a') is True  # First tab: came online
+    assert sessions.add(7, 'sid-b') is False
+    assert sessions.user_for('sid-a') == 7 and 7 in sessions
+    assert sorted(sessions.sids_for(7)) == ['sid-a', 'sid-b']
+
+    # A socket re-authenticating as someone else leaves its old user
+    assert sessions.add(8, 'sid-b') is True
+    assert sessions.sids_for(7) == ['sid-a']
+
+    assert sessions.remove('sid-a') == (7, True)  # Last tab: went offline
+    assert 7 not in sessions and sessions.user_for('sid-a') is None
+    assert sessions.remove('sid-a') == (None, False)
+    assert sessions.remove('sid-b') == (8, True)
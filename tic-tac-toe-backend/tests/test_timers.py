@@ -0,0 +1,37 @@
+"""TimerWheel scheduling, cancelling and expiry."""
+from app.timers import TimerWheel
+
+
+def test_timers_expire_at_their_tick_in_deadline_order():
+    wheel = TimerWheel(tick=1, slots=4, now=0)
+    assert wheel.schedule('a', 2.5, now=0) == 3
+    wheel.schedule('b', 1.2, now=0)
+    wheel.schedule('c', 0, now=0)  # Never in the tick already expired
+    assert len(wheel) == 3 and 'a' in wheel
+    assert wheel.advance(now=0.9) == []
+    assert wheel.advance(now=2) == ['c', 'b']
+    assert wheel.advance(now=3.5) == ['a']
+    assert len(wheel) == 0
+
+
+def test_timers_beyond_one_revolution_wait_for_their_turn():
+    wheel = TimerWheel(tick=1, slots=4, now=0)
+    wheel.schedule('far', 10, now=0)  # Same bucket as tick 2 and 6
+    assert wheel.advance(now=6) == []
+    assert wheel.advance(now=10) == ['far']
+
+
+def test_reschedule_and_cancel():
+    wheel = TimerWheel(tick=1, slots=4, now=0)
+    wheel.schedule('a', 1, now=0)
+    wheel.schedule('a', 3, now=0)  # Moves the timer
+    assert wheel.advance(now=2) == []
+    assert wheel.cancel('a') and not wheel.cancel('a')
+    assert wheel.advance(now=5) == []
+
+
+def test_a_long_stall_expires_everything_once():
+    wheel = TimerWheel(tick=1, slots=4, now=0)
+    for n in range(1, 9):
+        wheel.schedule(n, n, now=0)
+    assert wheel.advance(now=100) == list(range(1, 9))
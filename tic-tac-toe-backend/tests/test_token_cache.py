@@ -0,0 +1,75 @@
+"""TokenCache: expiry, invalidation and tokens without an exp claim."""
+import importlib
+import time
+import types
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.models import db, User
+from app.token_cache import Principal, TokenCache
+
+# The module; `app.token_cache` is the app's cache
+cache_module = importlib.import_module('app.token_cache')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the cache's clock: set clock.now to move time."""
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache_module, 'time', types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def cache():
+    cache = TokenCache()  # Without init_app: no mapper events, TTL of 300 seconds
+    return cache
+
+
+def test_entries_expire_with_exp_or_the_ttl(cache, clock):
+    alice = Principal(1, 'alice')
+    cache.put('short', alice, exp=1010)
+    cache.put('long', alice, exp=5000)
+    cache.put('no-exp', alice)
+    clock.now = 1011
+    assert cache.get('short') is None
+    assert cache.get('long') == alice and cache.get('no-exp') == alice
+    clock.now = 1301  # Past the TTL
+    assert cache.get('long') is None and cache.get('no-exp') is None
+    assert len(cache) == 0 and cache.stats == {'hits': 2, 'misses': 3}
+
+
+def test_invalidation_and_size_limit(cache):
+    cache._max_size = 2
+    cache.put('a1', Principal(1, 'alice'))
+    cache.put('b1', Principal(2, 'bob'))
+    assert cache.get('a1')
+    cache.put('a2', Principal(1, 'alice'))  # Drops b1, the least recently used
+    assert cache.get('b1') is None and cache.get('a1') and cache.get('a2')
+    cache.invalidate_token('a1')
+    assert cache.get('a1') is None and cache.get('a2')
+    cache.invalidate_user(1)
+    assert len(cache) == 0
+
+
+def test_resolve_accepts_tokens_without_exp(app_context, cache):
+    user = User(username='alice', password_hash='-')
+    db.session.add(user)
+    db.session.commit()
+    token = create_access_token(identity=str(user.id), expires_delta=False)
+    assert cache.resolve(token) == Principal(user.id, 'alice')
+    assert cache.resolve(token) == Principal(user.id, 'alice') and cache.stats['hits'] == 1
+    assert cache._entries[cache._digest(token)][1] <= time.time() + 300
+
+
+def test_user_changes_invalidate_the_app_cache(app_context):
+    from app import token_cache
+    user = User(username='alice', password_hash='-')
+    db.session.add(user)
+    db.session.commit()
+    token = create_access_token(identity=str(user.id))
+    assert token_cache.resolve(token).username == 'alice'
+    user.username = 'alicia'
+    db.session.commit()
+    assert token_cache.resolve(token).username == 'alicia'
@@ -57,6 +57,7 @@ function AppContent() {
                     <Route element={<ProtectedRoute />}>
                         <Route path="/" element={<HomePage />} />
                         <Route path="/game/:roomId" element={<GamePage />} />
+                        <Route path="/watch/:roomId" element={<GamePage spectate />} />
                         <Route path="/scoreboard" element={<ScoreboardPage />} />
                         <Route path="/friends" element={<FriendsPage />} />
                         <Route path="/create-room" element={<CreateRoomPage />} />
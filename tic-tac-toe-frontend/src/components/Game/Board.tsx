@@ -4,14 +4,25 @@ import styles from "./Board.module.css";
 import { Game } from "../../types"; // Assuming Game type has 'board' as string[]
 
 interface BoardProps {
-    board: string[]; // Array of 9: 'X', 'O', or ' '
+    board: string[]; // Array of size * size: 'X', 'O', or ' '
     onCellClick: (index: number) => void;
     disabled: boolean; // True if it's not player's turn or game over
 }
 
 const Board: React.FC<BoardProps> = ({ board, onCellClick, disabled }) => {
+    const size = Math.round(Math.sqrt(board.length));
+    // 100px cells on 3x3, shrinking so bigger boards stay around 480px wide
+    const cellSize = size <= 3 ? 100 : Math.max(24, Math.floor(480 / size));
+    const gap = size <= 3 ? 5 : 2;
+    const style = {
+        gridTemplateColumns: `repeat(${size}, ${cellSize}px)`,
+        gridTemplateRows: `repeat(${size}, ${cellSize}px)`,
+        gap: `${gap}px`,
+        width: `${size * cellSize + (size - 1) * gap}px`,
+        "--cell-size": `${cellSize}px`,
+    } as React.CSSProperties;
     return (
-        <div className={styles.board}>
+        <div className={styles.board} style={style}>
             {board.map((cellValue, index) => (
                 <Cell key={index} value={cellValue as "X" | "O" | " "} onClick={() => onCellClick(index)} disabled={disabled || cellValue !== " "} />
             ))}
@@ -3,7 +3,7 @@ import { useState, useEffect, useCallback } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import { useSocket } from "../contexts/SocketContext";
 import { useAuth } from "../contexts/AuthContext";
-import { Game, GameUpdatePayload, GameOverPayload } from "../types";
+import { Game, GameUpdatePayload, GameOverPayload, MoveAppliedPayload } from "../types";
 import { getGameDetailsApi } from "../services/api";
 
 interface UseGameStateReturn {
@@ -17,7 +17,8 @@ interface UseGameStateReturn {
     statusMessage: string;
 }
 
-export const useGameState = (): UseGameStateReturn => {
+// With `spectate` the game is watched read-only: no join, no moves
+export const useGameState = (spectate = false): UseGameStateReturn => {
     const { roomId } = useParams<{ roomId: string }>();
     const { socket, isConnected } = useSocket();
     const { user } = useAuth();
@@ -54,8 +55,12 @@ export const useGameState = (): UseGameStateReturn => {
     useEffect(() => {
         if (!socket || !isConnected || !roomId || !user) return;
 
-        console.log(`useGameState: Emitting join_game_room for ${roomId}`);
-        socket.emit("join_game_room", { room_id: roomId });
+        if (spectate) {
+            socket.emit("spectate_game", { room_id: roomId });
+        } else {
+            console.log(`useGameState: Emitting join_game_room for ${roomId}`);
+            socket.emit("join_game_room", { room_id: roomId });
+        }
 
         const handleGameUpdate = (updatedGame: GameUpdatePayload) => {
             if (updatedGame.room_id === roomId) {
@@ -64,12 +69,46 @@ export const useGameState = (): UseGameStateReturn => {
             }
         };
 
+        const handleMoveApplied = (delta: MoveAppliedPayload) => {
+            if (delta.room_id !== roomId) return;
+            setGame((current) => {
+                if (!current || delta.seq <= current.seq) return current; // Already applied
+                if (delta.seq !== current.seq + 1) {
+                    // Missed a move: ask for the full state instead of guessing
+                    socket.emit(spectate ? "spectate_game" : "request_game_snapshot", { room_id: roomId });
+                    return current;
+                }
+                const board = [...current.board];
+                board[delta.index] = delta.symbol;
+                const nextTurnUsername =
+                    delta.next_turn_player_id === current.player_x_id ? current.player_x_username : current.player_o_username;
+                return {
+                    ...current,
+                    board,
+                    seq: delta.seq,
+                    status: delta.status,
+                    winner_id: delta.winner_id,
+                    current_turn_player_id: delta.next_turn_player_id,
+                    current_turn_username: nextTurnUsername,
+                    turn_deadline: delta.turn_deadline,
+                    time_left: delta.time_left,
+                };
+            });
+            setMessage("");
+        };
+
+        const handleGameSnapshot = (data: { game: Game }) => {
+            if (data.game.room_id === roomId) {
+                setGame(data.game);
+            }
+        };
+
         const handleGameOver = (data: GameOverPayload) => {
             if (data.game.room_id === roomId) {
                 setGame(data.game);
                 if (data.winner) {
                     const winnerUsername = data.winner === "X" ? data.game.player_x_username : data.game.player_o_username;
-                    setMessage(`${winnerUsername} (${data.winner}) wins!`);
+                    setMessage(`${winnerUsername} (${data.winner}) wins${data.timeout ? " on time" : ""}!`);
                 } else if (data.draw) {
                     setMessage("It's a draw!");
                 }
@@ -82,6 +121,18 @@ export const useGameState = (): UseGameStateReturn => {
             }
         };
 
+        const handleOpponentDisconnected = (data: { room_id: string; user_id: number; grace_seconds: number }) => {
+            if (data.room_id === roomId && data.user_id !== user.id) {
+                setMessage(`Opponent disconnected. They have ${data.grace_seconds} seconds to come back.`);
+            }
+        };
+
+        const handleOpponentReconnected = (data: { room_id: string; user_id: number }) => {
+            if (data.room_id === roomId && data.user_id !== user.id) {
+                setMessage("");
+            }
+        };
+
         const handleSocketError = (err: { message: string }) => {
             console.error("Socket error in useGameState:", err.message);
             // setError(err.message); // Can be too aggressive for generic errors
@@ -89,22 +140,38 @@ export const useGameState = (): UseGameStateReturn => {
         };
 
         socket.on("game_update", handleGameUpdate);
+        socket.on("move_applied", handleMoveApplied);
+        socket.on("game_snapshot", handleGameSnapshot);
+        socket.on("spectate_snapshot", handleGameSnapshot);
         socket.on("game_over", handleGameOver);
         socket.on("game_joined_successfully", handleGameJoinedSuccessfully);
+        socket.on("game_resumed", handleGameSnapshot);
+        socket.on("opponent_disconnected", handleOpponentDisconnected);
+        socket.on("opponent_reconnected", handleOpponentReconnected);
         socket.on("error", handleSocketError);
 
         return () => {
-            console.log(`useGameState: Emitting leave_game_room for ${roomId}`);
-            socket.emit("leave_game_room", { room_id: roomId });
+            if (spectate) {
+                socket.emit("stop_spectating", { room_id: roomId });
+            } else {
+                console.log(`useGameState: Emitting leave_game_room for ${roomId}`);
+                socket.emit("leave_game_room", { room_id: roomId });
+            }
             socket.off("game_update", handleGameUpdate);
+            socket.off("move_applied", handleMoveApplied);
+            socket.off("game_snapshot", handleGameSnapshot);
+            socket.off("spectate_snapshot", handleGameSnapshot);
             socket.off("game_over", handleGameOver);
             socket.off("game_joined_successfully", handleGameJoinedSuccessfully);
+            socket.off("game_resumed", handleGameSnapshot);
+            socket.off("opponent_disconnected", handleOpponentDisconnected);
+            socket.off("opponent_reconnected", handleOpponentReconnected);
             socket.off("error", handleSocketError);
         };
-    }, [socket, isConnected, roomId, user, fetchGame]);
+    }, [socket, isConnected, roomId, user, fetchGame, spectate]);
 
     const handleCellClick = (index: number) => {
-        if (!socket || !game || !roomId || !user) return;
+        if (spectate || !socket || !game || !roomId || !user) return;
         if (game.status !== "active" || game.current_turn_player_id !== user.id) {
             return;
         }
@@ -125,8 +192,12 @@ export const useGameState = (): UseGameStateReturn => {
                 statusMessage += ` Share room code: ${game.room_id}`;
             }
         } else if (game.status === "active") {
-            statusMessage = isMyTurn ? "Your turn" : `Waiting for ${game.current_turn_username || "opponent"}'s turn`;
-            statusMessage += `. You are Player ${playerSymbol}.`;
+            if (spectate || !playerSymbol) {
+                statusMessage = `${game.current_turn_username || "A player"}'s turn. You are watching.`;
+            } else {
+                statusMessage = isMyTurn ? "Your turn" : `Waiting for ${game.current_turn_username || "opponent"}'s turn`;
+                statusMessage += `. You are Player ${playerSymbol}.`;
+            }
         } else if (game.status.startsWith("finished") || game.status === "draw") {
             if (game.winner_id === user?.id) statusMessage = "You won!";
             else if (game.winner_id) statusMessage = `${game.winner_username} won!`;
@@ -1,11 +1,22 @@
 import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { createRoomApi } from "../services/api";
-import { Game } from "../types";
+import { BotLevel, Game } from "../types";
 import styles from "./FormPage.module.css"; // A generic style for form pages
 
+// [size, win_length]
+const BOARD_PRESETS: [number, number][] = [
+    [3, 3],
+    [4, 4],
+    [7, 5],
+    [15, 5],
+];
+
 const CreateRoomPage: React.FC = () => {
     const [isPublic, setIsPublic] = useState(true);
+    const [vsBot, setVsBot] = useState(false);
+    const [botLevel, setBotLevel] = useState<BotLevel>("hard");
+    const [preset, setPreset] = useState(0);
     const [error, setError] = useState<string | null>(null);
     const [isLoading, setIsLoading] = useState(false);
     const navigate = useNavigate();
@@ -15,7 +26,12 @@ const CreateRoomPage: React.FC = () => {
         setIsLoading(true);
         setError(null);
         try {
-            const response = await createRoomApi({ is_public: isPublic });
+            const [size, winLength] = BOARD_PRESETS[preset];
+            const response = await createRoomApi(
+                vsBot
+                    ? { is_public: false, vs_bot: true, level: botLevel }
+                    : { is_public: isPublic, size, win_length: winLength }
+            );
             const gameDetails: Game = response.data.game_details;
             navigate(`/game/${gameDetails.room_id}`);
         } catch (err: any) {
@@ -31,10 +47,35 @@ const CreateRoomPage: React.FC = () => {
             <form onSubmit={handleSubmit}>
                 <div className={styles.formGroup}>
                     <label>
-                        <input type="checkbox" checked={isPublic} onChange={(e) => setIsPublic(e.target.checked)} />
+                        <input type="checkbox" checked={isPublic} disabled={vsBot} onChange={(e) => setIsPublic(e.target.checked)} />
                         Public Room (visible to others)
                     </label>
                 </div>
+                <div className={styles.formGroup}>
+                    <label>
+                        Board{" "}
+                        <select value={preset} disabled={vsBot} onChange={(e) => setPreset(Number(e.target.value))}>
+                            {BOARD_PRESETS.map(([size, winLength], i) => (
+                                <option key={i} value={i}>
+                                    {size}x{size}, {winLength} in a row
+                                </option>
+                            ))}
+                        </select>
+                    </label>
+                </div>
+                <div className={styles.formGroup}>
+                    <label>
+                        <input type="checkbox" checked={vsBot} onChange={(e) => setVsBot(e.target.checked)} />
+                        Play against the computer
+                    </label>
+                    {vsBot && (
+                        <select value={botLevel} onChange={(e) => setBotLevel(e.target.value as BotLevel)}>
+                            <option value="easy">Easy</option>
+                            <option value="medium">Medium</option>
+                            <option value="hard">Hard</option>
+                        </select>
+                    )}
+                </div>
                 <button type="submit" disabled={isLoading} className={styles.submitButton}>
                     {isLoading ? "Creating..." : "Create Room"}
                 </button>
@@ -1,10 +1,21 @@
-import React from "react";
+import React, { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import Board from "../components/Game/Board";
 import { useGameState } from "../hooks/useGameState"; // Import the custom hook
 import styles from "./GamePage.module.css";
 
-const GamePage: React.FC = () => {
+// Whole seconds until a Unix-time deadline, refreshed every second
+const useSecondsLeft = (deadline: number | null | undefined): number | null => {
+    const [now, setNow] = useState(() => Date.now() / 1000);
+    useEffect(() => {
+        if (!deadline) return;
+        const timer = setInterval(() => setNow(Date.now() / 1000), 1000);
+        return () => clearInterval(timer);
+    }, [deadline]);
+    return deadline ? Math.max(0, Math.ceil(deadline - now)) : null;
+};
+
+const GamePage: React.FC<{ spectate?: boolean }> = ({ spectate = false }) => {
     const navigate = useNavigate();
     const {
         game,
@@ -14,7 +25,8 @@ const GamePage: React.FC = () => {
         isMyTurn,
         // playerSymbol, // Not directly used in render here, but available
         statusMessage,
-    } = useGameState(); // Use the hook
+    } = useGameState(spectate); // Use the hook
+    const secondsLeft = useSecondsLeft(game?.status === "active" ? game.turn_deadline : null);
 
     if (loading) return <div className={styles.centerStatus}>Loading game...</div>;
     if (error)
@@ -38,7 +50,8 @@ const GamePage: React.FC = () => {
                 <p>Player O: {game.player_o_username || (game.status === "pending" && game.player_x_id ? "Waiting..." : "N/A")}</p>
             </div>
             <p className={styles.statusMessage}>{statusMessage}</p>
-            <Board board={game.board} onCellClick={handleCellClick} disabled={game.status !== "active" || !isMyTurn} />
+            {secondsLeft !== null && <p className={styles.turnClock}>Time to move: {secondsLeft}s</p>}
+            <Board board={game.board} onCellClick={handleCellClick} disabled={spectate || game.status !== "active" || !isMyTurn} />
             {game.status !== "active" && game.status !== "pending" && (
                 <button onClick={() => navigate("/")} className={styles.homeButton}>
                     Back to Home
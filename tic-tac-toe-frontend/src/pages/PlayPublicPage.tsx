@@ -1,9 +1,9 @@
-import React, { useEffect, useState, useCallback } from "react";
+import React, { useEffect, useState, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { useSocket } from "../contexts/SocketContext";
 import { useAuth } from "../contexts/AuthContext";
 import { fetchAvailablePlayersApi, setReadyToPlayApi, setUnreadyToPlayApi, startGameWithPlayerApi } from "../services/api";
-import { AvailablePlayer, Game } from "../types";
+import { AvailablePlayer, AvailablePlayersDeltaPayload, AvailablePlayersSnapshotPayload, Game } from "../types";
 import styles from "./ListPage.module.css"; // Reuse ListPage styles
 
 const PlayPublicPage: React.FC = () => {
@@ -16,6 +16,7 @@ const PlayPublicPage: React.FC = () => {
     const [isLoading, setIsLoading] = useState(false);
     const [error, setError] = useState<string | null>(null);
     const [statusMessage, setStatusMessage] = useState("");
+    const lobbyVersion = useRef<number | null>(null); // Version of the last applied lobby snapshot/delta
 
     const loadAvailablePlayers = useCallback(async () => {
         setIsLoading(true);
@@ -41,15 +42,27 @@ const PlayPublicPage: React.FC = () => {
     useEffect(() => {
         if (!socket || !isConnected) return;
 
-        const handleAvailablePlayersUpdate = (allPlayers: AvailablePlayer[]) => {
-            console.log("All available players update received:", allPlayers);
-            if (user && user.id) {
-                const filteredPlayers = allPlayers.filter((player) => player.id !== user.id);
-                setAvailablePlayers(filteredPlayers);
-            } else {
-                console.warn("User context not available for filtering player list.");
-                setAvailablePlayers(allPlayers);
+        const withoutSelf = (players: AvailablePlayer[]) => (user && user.id ? players.filter((player) => player.id !== user.id) : players);
+
+        const handleAvailablePlayersSnapshot = (snapshot: AvailablePlayersSnapshotPayload) => {
+            lobbyVersion.current = snapshot.version;
+            setAvailablePlayers(withoutSelf(snapshot.players));
+        };
+
+        const handleAvailablePlayersDelta = (delta: AvailablePlayersDeltaPayload) => {
+            if (lobbyVersion.current === null || delta.version <= lobbyVersion.current) return; // Covered by the snapshot
+            if (delta.version !== lobbyVersion.current + 1) {
+                // Missed a delta: resync from a full snapshot
+                lobbyVersion.current = null;
+                socket.emit("request_lobby_snapshot");
+                return;
             }
+            lobbyVersion.current = delta.version;
+            const removed = new Set(delta.removed);
+            setAvailablePlayers((current) => {
+                const kept = current.filter((player) => !removed.has(player.id) && !delta.added.some((p) => p.id === player.id));
+                return [...kept, ...withoutSelf(delta.added)];
+            });
         };
 
         const handleGameInvite = (data: { msg: string; game_details: Game }) => {
@@ -64,12 +77,15 @@ const PlayPublicPage: React.FC = () => {
             navigate(`/game/${data.game_details.room_id}`);
         };
 
-        socket.on("available_players_update", handleAvailablePlayersUpdate);
+        socket.on("available_players_snapshot", handleAvailablePlayersSnapshot);
+        socket.on("available_players_delta", handleAvailablePlayersDelta);
+        socket.emit("request_lobby_snapshot");
         socket.on("game_invite", handleGameInvite); // For the challenged player
         socket.on("game_started_direct", handleGameStartedDirect); // For the challenger
 
         return () => {
-            socket.off("available_players_update", handleAvailablePlayersUpdate);
+            socket.off("available_players_snapshot", handleAvailablePlayersSnapshot);
+            socket.off("available_players_delta", handleAvailablePlayersDelta);
             socket.off("game_invite", handleGameInvite);
             socket.off("game_started_direct", handleGameStartedDirect);
         };
@@ -88,7 +104,7 @@ const PlayPublicPage: React.FC = () => {
                 setIsReady(true);
                 setStatusMessage("You are now ready to play! Waiting for matches or select a player.");
             }
-            // The socket event 'available_players_update' should refresh the list
+            // The socket event 'available_players_delta' should refresh the list
         } catch (err: any) {
             setError(err.response?.data?.msg || "Failed to update ready status.");
         } finally {
@@ -1,31 +1,101 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { useNavigate } from "react-router-dom";
+import { useSocket } from "../contexts/SocketContext";
 import { fetchPublicRoomsApi, joinRoomApi } from "../services/api";
-import { Game } from "../types";
+import { Game, PublicRoomsCursor, PublicRoomsDeltaPayload, PublicRoomsPage, PublicRoomsSnapshotPayload } from "../types";
 import styles from "./ListPage.module.css"; // A generic style for list pages
 
+const PAGE_SIZE = 50;
+
 const PublicRoomsPage: React.FC = () => {
+    const { socket, isConnected } = useSocket();
     const [publicRooms, setPublicRooms] = useState<Game[]>([]);
+    const [hasMore, setHasMore] = useState(false); // Rooms older than the newest listed may not be loaded yet
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
+    const roomsVersion = useRef<number | null>(null); // Version of the last applied snapshot/delta
+    const hasMoreRef = useRef(false);
+    const nextCursor = useRef<PublicRoomsCursor | null>(null); // Where the next page starts
     const navigate = useNavigate();
 
+    const setNextPage = (cursor: PublicRoomsCursor | null) => {
+        nextCursor.current = cursor;
+        hasMoreRef.current = cursor !== null;
+        setHasMore(hasMoreRef.current);
+    };
+
+    const showFirstPage = (page: PublicRoomsPage) => {
+        setPublicRooms(page.rooms);
+        setNextPage(page.next);
+    };
+
+    const loadFirstPage = async () => {
+        setIsLoading(true);
+        try {
+            const response = await fetchPublicRoomsApi(undefined, PAGE_SIZE);
+            showFirstPage(response.data);
+            setError(null);
+        } catch (err: any) {
+            setError(err.response?.data?.msg || "Failed to fetch public rooms.");
+            setPublicRooms([]);
+        } finally {
+            setIsLoading(false);
+        }
+    };
+
     useEffect(() => {
-        const loadPublicRooms = async () => {
-            setIsLoading(true);
-            try {
-                const response = await fetchPublicRoomsApi();
-                setPublicRooms(response.data);
-                setError(null);
-            } catch (err: any) {
-                setError(err.response?.data?.msg || "Failed to fetch public rooms.");
-                setPublicRooms([]);
-            } finally {
-                setIsLoading(false);
+        // Without a socket the list is loaded once over HTTP
+        if (!socket || !isConnected) {
+            loadFirstPage();
+            return;
+        }
+
+        const handleSnapshot = (snapshot: PublicRoomsSnapshotPayload) => {
+            roomsVersion.current = snapshot.version;
+            showFirstPage(snapshot);
+            setIsLoading(false);
+        };
+
+        const handleDelta = (delta: PublicRoomsDeltaPayload) => {
+            if (roomsVersion.current === null || delta.version <= roomsVersion.current) return; // Covered by the snapshot
+            if (delta.version !== roomsVersion.current + 1) {
+                // Missed a delta: resync from a fresh snapshot
+                roomsVersion.current = null;
+                socket.emit("subscribe_public_rooms");
+                return;
             }
+            roomsVersion.current = delta.version;
+            const removed = new Set(delta.removed);
+            setPublicRooms((current) => {
+                const kept = current.filter((room) => !removed.has(room.room_id) && !delta.added.some((r) => r.room_id === room.room_id));
+                // New rooms are the newest, they arrive with a later page if the list is not complete
+                return hasMoreRef.current ? kept : [...kept, ...delta.added];
+            });
+        };
+
+        socket.on("public_rooms_snapshot", handleSnapshot);
+        socket.on("public_rooms_delta", handleDelta);
+        socket.emit("subscribe_public_rooms");
+
+        return () => {
+            socket.off("public_rooms_snapshot", handleSnapshot);
+            socket.off("public_rooms_delta", handleDelta);
+            socket.emit("unsubscribe_public_rooms");
+            roomsVersion.current = null;
         };
-        loadPublicRooms();
-    }, []);
+    }, [socket, isConnected]);
+
+    const loadMore = async () => {
+        if (!nextCursor.current) return;
+        try {
+            const response = await fetchPublicRoomsApi(nextCursor.current, PAGE_SIZE);
+            const rooms = response.data.rooms;
+            setPublicRooms((current) => [...current, ...rooms.filter((room) => !current.some((r) => r.room_id === room.room_id))]);
+            setNextPage(response.data.next);
+        } catch (err: any) {
+            setError(err.response?.data?.msg || "Failed to fetch public rooms.");
+        }
+    };
 
     const handleJoinRoom = async (roomId: string) => {
         try {
@@ -34,9 +104,11 @@ const PublicRoomsPage: React.FC = () => {
             navigate(`/game/${gameDetails.room_id}`);
         } catch (err: any) {
             setError(err.response?.data?.msg || `Failed to join room ${roomId}. It might be full or already started.`);
-            // Optionally re-fetch rooms if one becomes invalid
-            const updatedRooms = await fetchPublicRoomsApi();
-            setPublicRooms(updatedRooms.data);
+            // Subscribed lists are updated by the next delta
+            if (!socket || !isConnected) {
+                const updatedRooms = await fetchPublicRoomsApi(undefined, PAGE_SIZE);
+                showFirstPage(updatedRooms.data);
+            }
         }
     };
 
@@ -62,6 +134,11 @@ const PublicRoomsPage: React.FC = () => {
                     ))}
                 </ul>
             )}
+            {hasMore && (
+                <button onClick={loadMore} className={styles.actionButton}>
+                    Load more
+                </button>
+            )}
         </div>
     );
 };
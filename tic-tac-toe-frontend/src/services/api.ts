@@ -1,5 +1,5 @@
 import axios from "axios";
-import { AuthResponse, User } from "../types"; // We'll define these later
+import { AuthResponse, BotLevel, PublicRoomsCursor, PublicRoomsPage, User } from "../types"; // We'll define these later
 
 const API_URL = process.env.REACT_APP_API_URL || "http://localhost:5001";
 
@@ -31,8 +31,17 @@ export const fetchCurrentUser = () => apiClient.get<User>("/auth/me");
 export const fetchScoreboard = () => apiClient.get("/auth/scoreboard");
 
 // Room services
-export const createRoomApi = (data: { is_public: boolean }) => apiClient.post("/api/rooms", data);
-export const fetchPublicRoomsApi = () => apiClient.get("/api/rooms/public");
+export const createRoomApi = (data: {
+    is_public: boolean;
+    vs_bot?: boolean;
+    level?: BotLevel;
+    size?: number;
+    win_length?: number;
+}) =>
+    apiClient.post("/api/rooms", data);
+// Oldest first; the next page starts after the created_at of the last room
+export const fetchPublicRoomsApi = (cursor?: PublicRoomsCursor | null, limit?: number) =>
+    apiClient.get<PublicRoomsPage>("/api/rooms/public", { params: { ...cursor, limit } });
 export const joinRoomApi = (roomId: string) => apiClient.post(`/api/rooms/${roomId}/join`);
 export const getGameDetailsApi = (roomId: string) => apiClient.get(`/api/game/${roomId}`);
 
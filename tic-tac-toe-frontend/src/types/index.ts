@@ -17,7 +17,9 @@ export interface Game {
     player_x_username?: string | null;
     player_o_id: number | null;
     player_o_username?: string | null;
-    board: string[]; // Array of 'X', 'O', or ' '
+    board: string[]; // Array of 'X', 'O', or ' ', size * size cells row by row
+    size: number; // Board is size x size
+    win_length: number; // Marks in a row needed to win
     current_turn_player_id: number | null;
     current_turn_username?: string | null;
     current_player_symbol?: "X" | "O" | null; // Symbol for the viewing user
@@ -25,9 +27,17 @@ export interface Game {
     is_public: boolean;
     winner_id: number | null;
     winner_username?: string | null;
+    bot_level?: BotLevel | null; // Set when player O is the bot
     created_at: string;
+    seq: number; // Number of moves applied, matches MoveAppliedPayload.seq
+    turn_deadline: number | null; // Unix time (seconds) the player to move loses on
+    time_left: GameClock | null; // Game clock of each player as of the current turn's start
 }
 
+export type GameClock = { X: number; O: number }; // Seconds left
+
+export type BotLevel = "easy" | "medium" | "hard";
+
 export interface ScoreboardEntry {
     username: string;
     wins: number;
@@ -58,10 +68,23 @@ export interface PlayerJoinedPayload {
     joining_player_username: string;
 }
 
+export interface MoveAppliedPayload {
+    room_id: string;
+    seq: number;
+    index: number;
+    symbol: "X" | "O";
+    next_turn_player_id: number | null;
+    status: Game["status"];
+    winner_id: number | null;
+    turn_deadline: number | null;
+    time_left: GameClock | null;
+}
+
 export interface GameOverPayload {
     game: Game;
     winner?: "X" | "O";
     draw?: boolean;
+    timeout?: boolean; // The loser ran out of time
 }
 
 export interface FriendStatusUpdatePayload {
@@ -83,3 +106,34 @@ export interface AvailablePlayer {
     id: number;
     username: string;
 }
+
+export interface AvailablePlayersSnapshotPayload {
+    version: number;
+    players: AvailablePlayer[];
+}
+
+export interface AvailablePlayersDeltaPayload {
+    version: number;
+    added: AvailablePlayer[];
+    removed: number[];
+}
+
+export interface PublicRoomsCursor {
+    after: string; // created_at of the last room
+    after_id: string; // Its room_id, orders rooms created at the same time
+}
+
+export interface PublicRoomsPage {
+    rooms: Game[]; // Oldest first
+    next: PublicRoomsCursor | null; // null on the last page
+}
+
+export interface PublicRoomsSnapshotPayload extends PublicRoomsPage {
+    version: number; // rooms is the first page
+}
+
+export interface PublicRoomsDeltaPayload {
+    version: number;
+    added: Game[];
+    removed: string[]; // room_ids
+}